@@ -1,19 +1,41 @@
 # api.py
 
-import json
+import asyncio
 import logging
 import os
-import sqlite3
+import time
 from datetime import datetime
 
 from config import *
-
-SWITCH_DB_PATH = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-    "data",
-    "Switch",
+from logger import truncate_event
+import codec
+import echo
+from outbox import outbox
+from coalesce import coalescer
+from cache import api_cache
+from singleflight import single_flight
+from metrics import metrics
+from switch_store import switch_store
+
+# 等待回应的默认超时时间（秒）
+DEFAULT_CALL_TIMEOUT = 10
+
+# call() 从发出请求到收到回应的耗时和超时次数，按动作统计
+API_CALL_TIME = metrics.histogram("bot_api_call_seconds", "API 往返耗时", ("action",))
+API_CALL_TIMEOUTS = metrics.counter(
+    "bot_api_call_timeouts_total", "API 超时次数", ("action",)
 )
 
+# 发消息的动作，经发送队列按群限速发出
+MESSAGE_ACTIONS = {
+    "send_private_msg",
+    "send_group_msg",
+    "send_msg",
+    "send_forward_msg",
+    "send_group_forward_msg",
+    "send_private_forward_msg",
+}
+
 
 # 检查是否是群主
 def is_group_owner(role):
@@ -32,28 +54,86 @@ def is_authorized(role, user_id):
     return (is_admin or is_owner) or (user_id in owner_id)
 
 
-# 初始化开关数据库
-def init_switch_database(group_id):
-    if not os.path.exists(SWITCH_DB_PATH):
-        os.makedirs(SWITCH_DB_PATH)
-
-    db_path = os.path.join(SWITCH_DB_PATH, f"switch.db")
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # 创建表
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS switches (
-                group_id TEXT NOT NULL UNIQUE,
-                switch_name TEXT NOT NULL,
-                status INTEGER NOT NULL
-            )
-        """
-    )
+# 初始化开关数据库，建表和导入旧版 JSON 开关都由 switch_store 完成
+def init_switch_database(group_id=None):
+    switch_store.connect()
 
-    conn.commit()
-    conn.close()
+
+# 把发消息的动作放进发送队列，按目标群（私聊按QQ号）限速，返回发出后完成的 future
+# 发给root管理员的私聊和 priority 为 True 的系统消息优先发送
+def enqueue_message(websocket, message, priority=False):
+    params = message.get("params") or {}
+    group_id = params.get("group_id")
+    if group_id and params.get("message_type", "group") == "group":
+        key = f"group_{group_id}"
+        # 先发出该群还在合并窗口里的消息，且和这条消息同样优先，保证消息顺序
+        coalescer.flush(websocket, group_id, priority)
+    else:
+        user_id = params.get("user_id")
+        key = f"private_{user_id}"
+        priority = priority or str(user_id) in owner_id
+    return outbox.send(websocket, codec.dumps_text(message), key, priority)
+
+
+# 发送合并窗口结束时缓存的群消息，forward 为 True 时作为合并转发消息发送
+# priority 为 True 时是被一条优先消息提前发出的，同样优先发送
+# 自定义转发节点同时带上 go-cqhttp 的 name/uin 和 NapCat 的 nickname/user_id
+def send_coalesced_group_msg(websocket, group_id, contents, forward, priority=False):
+    if forward:
+        sender = {
+            "user_id": coalescer.self_id,
+            "nickname": coalesce_forward_name,
+            "uin": coalescer.self_id,
+            "name": coalesce_forward_name,
+        }
+        message = {
+            "action": "send_forward_msg",
+            "params": {
+                "group_id": group_id,
+                "message": [
+                    {"type": "node", "data": {**sender, "content": content}}
+                    for content in contents
+                ],
+            },
+            "echo": "send_forward_msg",
+        }
+    else:
+        message = {
+            "action": "send_group_msg",
+            "params": {"group_id": group_id, "message": "\n".join(contents)},
+            "echo": "send_group_msg_coalesced",
+        }
+    enqueue_message(websocket, message, priority)
+    logging.info(f"[API]已合并发送 {len(contents)} 条群消息到群 {group_id}")
+
+
+# 调用 API 并等待回应，返回完整的回应字典
+# 回应由 bot.connect_to_bot 的读循环通过 echo 分发，这里不会自己 recv
+async def call(websocket, action, params=None, timeout=DEFAULT_CALL_TIMEOUT):
+    request_echo = echo.new_echo(action)
+    future = echo.register(request_echo)
+    message = {
+        "action": action,
+        "params": params or {},
+        "echo": request_echo,
+    }
+    try:
+        if action in MESSAGE_ACTIONS:
+            if not await enqueue_message(websocket, message):
+                raise ConnectionError(f"{action} 未能发出")
+        else:
+            await websocket.send(codec.dumps_text(message))
+        # 消息动作的耗时不含在发送队列中的等待
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            API_CALL_TIMEOUTS.inc(action)
+            raise
+        API_CALL_TIME.observe(time.perf_counter() - started, action)
+        return response
+    finally:
+        echo.discard(request_echo)
 
 
 # 发送私聊消息，解析cq码
@@ -63,7 +143,7 @@ async def send_private_msg(websocket, user_id, content):
         "params": {"user_id": user_id, "message": content},
         "echo": "send_private_msg",
     }
-    await websocket.send(json.dumps(message))
+    enqueue_message(websocket, message)
     logging.info(f"[API]已发送消息到用户 {user_id}")
 
 
@@ -74,39 +154,39 @@ async def send_private_msg_no_cq(websocket, user_id, content, auto_escape=True):
         "params": {"user_id": user_id, "message": content, "auto_escape": auto_escape},
         "echo": "send_private_msg_no_cq",
     }
-    await websocket.send(json.dumps(message))
+    enqueue_message(websocket, message)
     logging.info(f"[API]已发送消息到用户 {user_id}")
 
 
 # 发送私聊消息，并获取消息ID
 async def send_private_msg_with_reply(websocket, user_id, content):
     try:
-        message = {
-            "action": "send_private_msg",
-            "params": {"user_id": user_id, "message": content},
-            "echo": "send_private_msg_with_reply",
-        }
-        await websocket.send(json.dumps(message))
-        while True:
-            response = await websocket.recv()
-            response_data = json.loads(response)
-            if response_data.get("echo") == "send_private_msg_with_reply":
-                message_id = response_data.get("data", {}).get("message_id")
-                logging.info(f"[API]已发送消息到用户 {user_id}，消息ID: {message_id}")
-                return message_id
+        response_data = await call(
+            websocket,
+            "send_private_msg",
+            {"user_id": user_id, "message": content},
+        )
+        message_id = (response_data.get("data") or {}).get("message_id")
+        logging.info(f"[API]已发送消息到用户 {user_id}，消息ID: {message_id}")
+        return message_id
     except Exception as e:
         logging.error(f"[API]发送私聊消息失败: {e}")
 
 
-# 发送群消息
-async def send_group_msg(websocket, group_id, content):
+# 发送群消息，priority 为 True 时作为系统消息优先发送
+async def send_group_msg(websocket, group_id, content, priority=False):
     try:
+        # 开启消息合并时，文本消息先缓存，窗口结束时合并发送
+        if coalescer.add(
+            websocket, group_id, content, send_coalesced_group_msg, priority
+        ):
+            return
         message = {
             "action": "send_group_msg",
             "params": {"group_id": group_id, "message": content},
             "echo": f"send_group_msg_{content}",
         }
-        await websocket.send(json.dumps(message))
+        enqueue_message(websocket, message, priority)
         logging.info(f"[API]已发送群消息到群 {group_id}")
     except Exception as e:
         logging.error(f"[API]发送群消息失败: {e}")
@@ -123,26 +203,16 @@ async def send_group_msg_no_cq(websocket, group_id, content, auto_escape=True):
         },
         "echo": "send_group_msg_no_cq",
     }
-    await websocket.send(json.dumps(message))
+    enqueue_message(websocket, message)
     logging.info(f"[API]已发送无CQ码的群消息到群 {group_id}")
 
 
 # 给群分享推荐好友
 async def send_ArkSharePeer_group(websocket, user_id, group_id):
     try:
-        message = {
-            "action": "ArkSharePeer",
-            "params": {"user_id": str(user_id)},
-            "echo": "send_ArkSharePeer_group",
-        }
-        await websocket.send(json.dumps(message))
-        while True:
-            response = await websocket.recv()
-            response_data = json.loads(response)
-            if response_data.get("echo") == "send_ArkSharePeer_group":
-                data = response_data.get("data", {}).get("arkMsg")
-                await send_json_msg_group(websocket, group_id, data)
-                break
+        response_data = await call(websocket, "ArkSharePeer", {"user_id": str(user_id)})
+        data = (response_data.get("data") or {}).get("arkMsg")
+        await send_json_msg_group(websocket, group_id, data)
     except Exception as e:
         logging.error(f"[API]发送推荐好友失败: {e}")
 
@@ -150,19 +220,11 @@ async def send_ArkSharePeer_group(websocket, user_id, group_id):
 # 给群分享加群卡片
 async def send_ArkShareGroupEx_group(websocket, group_id, target_group_id):
     try:
-        message = {
-            "action": "ArkShareGroupEx",
-            "params": {"group_id": str(group_id)},
-            "echo": "send_ArkShareGroupEx_group",
-        }
-        await websocket.send(json.dumps(message))
-        while True:
-            response = await websocket.recv()
-            response_data = json.loads(response)
-            if response_data.get("echo") == "send_ArkShareGroupEx_group":
-                data = response_data.get("data")
-                await send_json_msg_group(websocket, target_group_id, data)
-                break
+        response_data = await call(
+            websocket, "ArkShareGroupEx", {"group_id": str(group_id)}
+        )
+        data = response_data.get("data")
+        await send_json_msg_group(websocket, target_group_id, data)
     except Exception as e:
         logging.error(f"[API]发送加群卡片失败: {e}")
 
@@ -170,19 +232,11 @@ async def send_ArkShareGroupEx_group(websocket, group_id, target_group_id):
 # 给私聊分享加群卡片
 async def send_ArkShareGroupEx_private(websocket, user_id):
     try:
-        message = {
-            "action": "ArkShareGroupEx",
-            "params": {"user_id": str(user_id)},
-            "echo": "send_ArkShareGroupEx_private",
-        }
-        await websocket.send(json.dumps(message))
-        while True:
-            response = await websocket.recv()
-            response_data = json.loads(response)
-            if response_data.get("echo") == "send_ArkShareGroupEx_private":
-                data = response_data.get("data")
-                await send_json_msg_private(websocket, user_id, data)
-                break
+        response_data = await call(
+            websocket, "ArkShareGroupEx", {"user_id": str(user_id)}
+        )
+        data = response_data.get("data")
+        await send_json_msg_private(websocket, user_id, data)
     except Exception as e:
         logging.error(f"[API]发送加群卡片失败: {e}")
 
@@ -190,19 +244,9 @@ async def send_ArkShareGroupEx_private(websocket, user_id):
 # 给私聊分享推荐好友
 async def send_ArkSharePeer_private(websocket, user_id):
     try:
-        message = {
-            "action": "ArkSharePeer",
-            "params": {"user_id": str(user_id)},
-            "echo": "send_ArkSharePeer_private",
-        }
-        await websocket.send(json.dumps(message))
-        while True:
-            response = await websocket.recv()
-            response_data = json.loads(response)
-            if response_data.get("echo") == "send_ArkSharePeer_private":
-                data = response_data.get("data", {}).get("arkMsg")
-                await send_json_msg_private(websocket, user_id, data)
-                break
+        response_data = await call(websocket, "ArkSharePeer", {"user_id": str(user_id)})
+        data = (response_data.get("data") or {}).get("arkMsg")
+        await send_json_msg_private(websocket, user_id, data)
     except Exception as e:
         logging.error(f"[API]发送推荐好友失败: {e}")
 
@@ -245,8 +289,9 @@ async def send_msg(websocket, message_type, user_id, group_id, message):
         },
         "echo": "send_msg",
     }
-    await websocket.send(json.dumps(message))
-    logging.info(f"[API]已发送消息: {message}")
+    enqueue_message(websocket, message)
+    if logging.root.isEnabledFor(logging.INFO):
+        logging.info("[API]已发送消息: %s", truncate_event(message))
 
 
 # 发送合并转发消息
@@ -256,7 +301,7 @@ async def send_forward_msg(websocket, group_id, content):
         "params": {"group_id": group_id, "message": content},
         "echo": "send_forward_msg",
     }
-    await websocket.send(json.dumps(message))
+    enqueue_message(websocket, message)
     logging.info(f"[API]已发送合并转发消息到群 {group_id}")
 
 
@@ -267,7 +312,7 @@ async def delete_msg(websocket, message_id):
         "params": {"message_id": message_id},
         "echo": "delete_msg",
     }
-    await websocket.send(json.dumps(delete_msg))
+    await websocket.send(codec.dumps_text(delete_msg))
 
 
 # 获取消息
@@ -277,7 +322,7 @@ async def get_msg(websocket, message_id):
         "params": {"message_id": message_id},
         "echo": "get_msg",
     }
-    await websocket.send(json.dumps(get_msg))
+    await websocket.send(codec.dumps_text(get_msg))
     logging.info(f"[API]已获取消息 {message_id}。")
 
 
@@ -288,7 +333,7 @@ async def get_forward_msg(websocket, id):
         "params": {"message_id": id},
         "echo": "get_forward_msg",
     }
-    await websocket.send(json.dumps(get_forward_msg))
+    await websocket.send(codec.dumps_text(get_forward_msg))
     logging.info(f"[API]已获取合并转发消息 {id}。")
 
 
@@ -299,7 +344,7 @@ async def send_like(websocket, user_id, times):
         "params": {"user_id": user_id, "times": times},
         "echo": "send_like",
     }
-    await websocket.send(json.dumps(like_msg))
+    await websocket.send(codec.dumps_text(like_msg))
     logging.info(f"[API]已发送好友赞 {user_id} {times} 次。")
 
 
@@ -310,7 +355,7 @@ async def set_group_kick(websocket, group_id, user_id):
         "params": {"group_id": group_id, "user_id": user_id},
         "echo": "set_group_kick",
     }
-    await websocket.send(json.dumps(kick_msg))
+    await websocket.send(codec.dumps_text(kick_msg))
 
 
 # 群组单人禁言
@@ -320,7 +365,7 @@ async def set_group_ban(websocket, group_id, user_id, duration):
         "params": {"group_id": group_id, "user_id": user_id, "duration": duration},
         "echo": "set_group_ban",
     }
-    await websocket.send(json.dumps(ban_msg))
+    await websocket.send(codec.dumps_text(ban_msg))
     if duration == 0:
         logging.info(f"[API]执行解除 [CQ:at,qq={user_id}] 禁言。")
     else:
@@ -334,7 +379,7 @@ async def set_group_anonymous_ban(websocket, group_id, anonymous_flag, duration)
         "params": {"group_id": group_id, "flag": anonymous_flag, "duration": duration},
         "echo": "set_group_anonymous_ban",
     }
-    await websocket.send(json.dumps(anonymous_ban_msg))
+    await websocket.send(codec.dumps_text(anonymous_ban_msg))
     if duration == 0:
         logging.info(f"[API]已解除 [CQ:anonymous,flag={anonymous_flag}] 禁言。")
         message = f"已解除 [CQ:anonymous,flag={anonymous_flag}] 禁言。"
@@ -351,7 +396,7 @@ async def set_group_whole_ban(websocket, group_id, enable):
         "params": {"group_id": group_id, "enable": enable},
         "echo": "set_group_whole_ban",
     }
-    await websocket.send(json.dumps(whole_ban_msg))
+    await websocket.send(codec.dumps_text(whole_ban_msg))
     logging.info(f"[API]已{'开启' if enable else '解除'}群 {group_id} 的全员禁言。")
     await send_group_msg(
         websocket,
@@ -367,7 +412,7 @@ async def set_group_admin(websocket, group_id, user_id, enable):
         "params": {"group_id": group_id, "user_id": user_id, "enable": enable},
         "echo": "set_group_admin",
     }
-    await websocket.send(json.dumps(admin_msg))
+    await websocket.send(codec.dumps_text(admin_msg))
     logging.info(
         f"已{'授予' if enable else '解除'}群 {group_id} 的管理员 {user_id} 的权限。"
     )
@@ -380,7 +425,7 @@ async def set_group_anonymous(websocket, group_id, enable):
         "params": {"group_id": group_id, "enable": enable},
         "echo": "set_group_anonymous",
     }
-    await websocket.send(json.dumps(anonymous_msg))
+    await websocket.send(codec.dumps_text(anonymous_msg))
     logging.info(f"[API]已{'开启' if enable else '关闭'}群 {group_id} 的匿名。")
 
 
@@ -391,7 +436,7 @@ async def set_group_card(websocket, group_id, user_id, card):
         "params": {"group_id": group_id, "user_id": user_id, "card": card},
         "echo": "set_group_card",
     }
-    await websocket.send(json.dumps(card_msg))
+    await websocket.send(codec.dumps_text(card_msg))
     logging.info(f"[API]已设置群 {group_id} 的用户 {user_id} 的群名片为 {card}。")
 
 
@@ -402,7 +447,7 @@ async def set_group_name(websocket, group_id, group_name):
         "params": {"group_id": group_id, "group_name": group_name},
         "echo": "set_group_name",
     }
-    await websocket.send(json.dumps(name_msg))
+    await websocket.send(codec.dumps_text(name_msg))
     logging.info(f"[API]已设置群 {group_id} 的群名为 {group_name}。")
 
 
@@ -413,7 +458,7 @@ async def set_group_leave(websocket, group_id, is_dismiss):
         "params": {"group_id": group_id, "is_dismiss": is_dismiss},
         "echo": "set_group_leave",
     }
-    await websocket.send(json.dumps(leave_msg))
+    await websocket.send(codec.dumps_text(leave_msg))
     logging.info(f"[API]已退出群 {group_id}。")
 
 
@@ -431,7 +476,7 @@ async def set_group_special_title(
         },
         "echo": "set_group_special_title",
     }
-    await websocket.send(json.dumps(special_title_msg))
+    await websocket.send(codec.dumps_text(special_title_msg))
     logging.info(
         f"[API]已设置群 {group_id} 的用户 {user_id} 的专属头衔为 {special_title}。"
     )
@@ -444,7 +489,7 @@ async def set_friend_add_request(websocket, flag, approve):
         "params": {"flag": flag, "approve": approve},
         "echo": "set_friend_add_request",
     }
-    await websocket.send(json.dumps(request_msg))
+    await websocket.send(codec.dumps_text(request_msg))
     logging.info(f"[API]已{'同意' if approve else '拒绝'}好友请求。")
 
 
@@ -455,7 +500,7 @@ async def set_group_add_request(websocket, flag, type, approve, reason):
         "params": {"flag": flag, "type": type, "approve": approve, "reason": reason},
         "echo": "set_group_add_request",
     }
-    await websocket.send(json.dumps(request_msg))
+    await websocket.send(codec.dumps_text(request_msg))
     logging.info(f"[API]已{'同意' if approve else '拒绝'}群 {type} 请求。")
 
 
@@ -466,7 +511,7 @@ async def get_group_msg_history(websocket, group_id, count, user_id):
         "params": {"group_id": group_id, "count": count},
         "echo": f"get_group_msg_history_{group_id}_{user_id}",
     }
-    await websocket.send(json.dumps(history_msg))
+    await websocket.send(codec.dumps_text(history_msg))
 
 
 # 获取登录号信息
@@ -476,25 +521,37 @@ async def get_login_info(websocket):
         "params": {},
         "echo": "get_login_info",
     }
-    await websocket.send(json.dumps(login_info_msg))
+    await websocket.send(codec.dumps_text(login_info_msg))
     logging.info("已获取登录号信息。")
 
 
 # 获取陌生人信息
+# 结果会缓存一段时间，no_cache 为 True 时跳过缓存重新获取
+# 同一个用户的查询还没返回时，并发的调用方共用这一次查询的结果
 async def get_stranger_info(websocket, user_id, no_cache=False):
+    key = str(user_id)
+    if not no_cache:
+        cached = api_cache.stranger_info.get(key)
+        if cached is not None:
+            return cached
+    return await single_flight.do(
+        ("get_stranger_info", key, no_cache),
+        lambda: _fetch_stranger_info(websocket, user_id, key, no_cache),
+    )
+
+
+async def _fetch_stranger_info(websocket, user_id, key, no_cache):
     try:
-        stranger_info_msg = {
-            "action": "get_stranger_info",
-            "params": {"user_id": user_id, "no_cache": no_cache},
-            "echo": "get_stranger_info",
-        }
-        await websocket.send(json.dumps(stranger_info_msg))
-        while True:
-            response = await websocket.recv()
-            response_data = json.loads(response)
-            if response_data.get("echo") == "get_stranger_info":
-                logging.info(f"[API]已获取陌生人 {user_id} 信息。")
-                return response_data.get("data", {})
+        response_data = await call(
+            websocket,
+            "get_stranger_info",
+            {"user_id": user_id, "no_cache": no_cache},
+        )
+        logging.info(f"[API]已获取陌生人 {user_id} 信息。")
+        data = response_data.get("data") or {}
+        if data:
+            api_cache.stranger_info.set(key, data)
+        return data
     except Exception as e:
         logging.error(f"获取陌生人信息失败: {e}")
         return {}
@@ -507,7 +564,7 @@ async def get_friend_list(websocket):
         "params": {},
         "echo": "get_friend_list",
     }
-    await websocket.send(json.dumps(friend_list_msg))
+    await websocket.send(codec.dumps_text(friend_list_msg))
     logging.info("已获取好友列表。")
 
 
@@ -518,10 +575,42 @@ async def get_group_info(websocket, group_id):
         "params": {"group_id": group_id},
         "echo": "get_group_info",
     }
-    await websocket.send(json.dumps(group_info_msg))
+    await websocket.send(codec.dumps_text(group_info_msg))
     logging.info(f"[API]已获取群 {group_id} 信息。")
 
 
+# 获取群信息并等待回应，返回群信息字典，失败时返回空字典
+# 结果会缓存一段时间，no_cache 为 True 时跳过缓存重新获取
+# 同一个群的查询还没返回时，并发的调用方共用这一次查询的结果
+async def get_group_info_cached(websocket, group_id, no_cache=False):
+    key = str(group_id)
+    if not no_cache:
+        cached = api_cache.group_info.get(key)
+        if cached is not None:
+            return cached
+    return await single_flight.do(
+        ("get_group_info", key, no_cache),
+        lambda: _fetch_group_info(websocket, group_id, key, no_cache),
+    )
+
+
+async def _fetch_group_info(websocket, group_id, key, no_cache):
+    try:
+        response_data = await call(
+            websocket,
+            "get_group_info",
+            {"group_id": group_id, "no_cache": no_cache},
+        )
+        logging.info(f"[API]已获取群 {group_id} 信息。")
+        data = response_data.get("data") or {}
+        if data:
+            api_cache.group_info.set(key, data)
+        return data
+    except Exception as e:
+        logging.error(f"[API]获取群 {group_id} 信息失败: {e}")
+        return {}
+
+
 # 获取群列表
 async def get_group_list(websocket):
     group_list_msg = {
@@ -529,24 +618,95 @@ async def get_group_list(websocket):
         "params": {},
         "echo": "get_group_list",
     }
-    await websocket.send(json.dumps(group_list_msg))
+    await websocket.send(codec.dumps_text(group_list_msg))
     logging.info("已获取群列表。")
 
 
 # 获取群成员信息
+# 结果会缓存一段时间，no_cache 为 True 时跳过缓存重新获取
+# 同一个成员的查询还没返回时，并发的调用方共用这一次查询的结果
 async def get_group_member_info(websocket, group_id, user_id, no_cache=False):
-    group_member_info_msg = {
-        "action": "get_group_member_info",
-        "params": {"group_id": group_id, "user_id": user_id, "no_cache": no_cache},
-        "echo": "get_group_member_info",
-    }
-    await websocket.send(json.dumps(group_member_info_msg))
-    while True:
-        response = await websocket.recv()
-        response_data = json.loads(response)
-        if response_data.get("echo") == "get_group_member_info":
-            logging.info(f"[API]已获取群 {group_id} 的用户 {user_id} 信息。")
-            return response_data
+    key = (str(group_id), str(user_id))
+    if not no_cache:
+        cached = api_cache.member_info.get(key)
+        if cached is not None:
+            return cached
+    return await single_flight.do(
+        ("get_group_member_info", key, no_cache),
+        lambda: _fetch_group_member_info(websocket, group_id, user_id, key, no_cache),
+    )
+
+
+async def _fetch_group_member_info(websocket, group_id, user_id, key, no_cache):
+    try:
+        response_data = await call(
+            websocket,
+            "get_group_member_info",
+            {"group_id": group_id, "user_id": user_id, "no_cache": no_cache},
+        )
+        logging.info(f"[API]已获取群 {group_id} 的用户 {user_id} 信息。")
+        if response_data.get("data"):
+            api_cache.member_info.set(key, response_data)
+        return response_data
+    except Exception as e:
+        logging.error(f"[API]获取群 {group_id} 的用户 {user_id} 信息失败: {e}")
+        return {}
+
+
+# 批量获取群成员信息，pairs 为 (群号, QQ号) 序列，以异步迭代器的形式按完成顺序返回 (群号, QQ号, 成员信息)
+# 成员信息与 get_group_member_info 的返回值相同，失败或超时时为空字典
+# use_member_list 为 True 时先获取各群的成员列表，已经在列表中的成员直接用列表里的数据，不再逐个查询
+# 例如：async for group_id, user_id, info in iter_group_member_info(websocket, pairs):
+async def iter_group_member_info(
+    websocket,
+    pairs,
+    concurrency=batch_lookup_concurrency,
+    timeout=batch_lookup_timeout,
+    use_member_list=True,
+):
+    pairs = list(pairs)
+
+    if use_member_list:
+        group_ids = list({str(group_id) for group_id, _ in pairs})
+        member_lists = await asyncio.gather(
+            *(get_group_member_list(websocket, group_id) for group_id in group_ids)
+        )
+        members = {}
+        for group_id, member_list in zip(group_ids, member_lists):
+            for member in member_list:
+                members[(group_id, str(member.get("user_id")))] = member
+        remaining = []
+        for group_id, user_id in pairs:
+            member = members.get((str(group_id), str(user_id)))
+            if member is None:
+                remaining.append((group_id, user_id))
+            else:
+                yield group_id, user_id, {"status": "ok", "retcode": 0, "data": member}
+        pairs = remaining
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(group_id, user_id):
+        async with semaphore:
+            try:
+                info = await asyncio.wait_for(
+                    get_group_member_info(websocket, group_id, user_id), timeout
+                )
+            except asyncio.TimeoutError:
+                logging.error(f"[API]获取群 {group_id} 的用户 {user_id} 信息超时")
+                info = {}
+            return group_id, user_id, info
+
+    tasks = [
+        asyncio.ensure_future(fetch(group_id, user_id)) for group_id, user_id in pairs
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 调用方提前退出迭代时取消还没完成的查询
+        for task in tasks:
+            task.cancel()
 
 
 # 获取群成员入群时间戳并转换为日期时间
@@ -561,19 +721,35 @@ def get_group_member_join_time(group_id, user_id, group_member_info):
 
 
 # 获取群成员列表
+# 结果会缓存一段时间，no_cache 为 True 时跳过缓存重新获取
+# 同一个群的查询还没返回时，并发的调用方共用这一次查询的结果
 async def get_group_member_list(websocket, group_id, no_cache=False):
-    group_member_list_msg = {
-        "action": "get_group_member_list",
-        "params": {"group_id": group_id},
-        "echo": "get_group_member_list",
-    }
-    await websocket.send(json.dumps(group_member_list_msg))
-    while True:
-        response = await websocket.recv()
-        response_data = json.loads(response)
-        if response_data.get("echo") == "get_group_member_list":
-            logging.info(f"[API]已获取群 {group_id} 的成员列表。")
-            return response_data.get("data", [])
+    key = str(group_id)
+    if not no_cache:
+        cached = api_cache.member_list.get(key)
+        if cached is not None:
+            return cached
+    return await single_flight.do(
+        ("get_group_member_list", key, no_cache),
+        lambda: _fetch_group_member_list(websocket, group_id, key, no_cache),
+    )
+
+
+async def _fetch_group_member_list(websocket, group_id, key, no_cache):
+    try:
+        response_data = await call(
+            websocket,
+            "get_group_member_list",
+            {"group_id": group_id, "no_cache": no_cache},
+        )
+        logging.info(f"[API]已获取群 {group_id} 的成员列表。")
+        data = response_data.get("data") or []
+        if data:
+            api_cache.member_list.set(key, data)
+        return data
+    except Exception as e:
+        logging.error(f"[API]获取群 {group_id} 的成员列表失败: {e}")
+        return []
 
 
 # 获取群成员列表返回QQ号数组
@@ -590,14 +766,14 @@ async def get_group_honor_info(websocket, group_id, type):
         "params": {"group_id": group_id, "type": type},
         "echo": "get_group_honor_info",
     }
-    await websocket.send(json.dumps(honor_info_msg))
+    await websocket.send(codec.dumps_text(honor_info_msg))
     logging.info(f"[API]已获取群 {group_id} 的 {type} 荣誉信息。")
 
 
 # 获取 Cookies
 async def get_cookies(websocket):
     cookies_msg = {"action": "get_cookies", "params": {}, "echo": "get_cookies"}
-    await websocket.send(json.dumps(cookies_msg))
+    await websocket.send(codec.dumps_text(cookies_msg))
     logging.info("已获取 Cookies。")
 
 
@@ -608,7 +784,7 @@ async def get_csrf_token(websocket):
         "params": {},
         "echo": "get_csrf_token",
     }
-    await websocket.send(json.dumps(csrf_token_msg))
+    await websocket.send(codec.dumps_text(csrf_token_msg))
     logging.info("已获取 CSRF Token。")
 
 
@@ -619,7 +795,7 @@ async def get_credentials(websocket):
         "params": {},
         "echo": "get_credentials",
     }
-    await websocket.send(json.dumps(credentials_msg))
+    await websocket.send(codec.dumps_text(credentials_msg))
     logging.info("已获取 QQ 相关接口凭证。")
 
 
@@ -630,7 +806,7 @@ async def get_record(websocket, file, out_format, full_path):
         "params": {"file": file, "out_format": out_format, "full_path": full_path},
         "echo": "get_record",
     }
-    await websocket.send(json.dumps(record_msg))
+    await websocket.send(codec.dumps_text(record_msg))
     logging.info(f"[API]已获取语音 {file}。")
 
 
@@ -641,7 +817,7 @@ async def get_image(websocket, file, out_format, full_path):
         "params": {"file": file, "out_format": out_format, "full_path": full_path},
         "echo": "get_image",
     }
-    await websocket.send(json.dumps(image_msg))
+    await websocket.send(codec.dumps_text(image_msg))
     logging.info(f"[API]已获取图片 {file}。")
 
 
@@ -652,7 +828,7 @@ async def can_send_image(websocket):
         "params": {},
         "echo": "can_send_image",
     }
-    await websocket.send(json.dumps(can_send_image_msg))
+    await websocket.send(codec.dumps_text(can_send_image_msg))
     logging.info("已检查是否可以发送图片。")
 
 
@@ -663,14 +839,14 @@ async def can_send_record(websocket):
         "params": {},
         "echo": "can_send_record",
     }
-    await websocket.send(json.dumps(can_send_record_msg))
+    await websocket.send(codec.dumps_text(can_send_record_msg))
     logging.info("已检查是否可以发送语音。")
 
 
 # 获取运行状态
 async def get_status(websocket):
     status_msg = {"action": "get_status", "params": {}, "echo": "get_status"}
-    await websocket.send(json.dumps(status_msg))
+    await websocket.send(codec.dumps_text(status_msg))
     logging.info("已获取运行状态。")
 
 
@@ -681,7 +857,7 @@ async def get_version_info(websocket):
         "params": {},
         "echo": "get_version_info",
     }
-    await websocket.send(json.dumps(version_info_msg))
+    await websocket.send(codec.dumps_text(version_info_msg))
     logging.info("已获取版本信息。")
 
 
@@ -692,14 +868,14 @@ async def set_restart(websocket, delay=0):
         "params": {"delay": delay},
         "echo": "set_restart",
     }
-    await websocket.send(json.dumps(restart_onebot_msg))
+    await websocket.send(codec.dumps_text(restart_onebot_msg))
     logging.info("已重启 OneBot 实现。")
 
 
 # 清理缓存
 async def clean_cache(websocket):
     clean_cache_msg = {"action": "clean_cache", "params": {}, "echo": "clean_cache"}
-    await websocket.send(json.dumps(clean_cache_msg))
+    await websocket.send(codec.dumps_text(clean_cache_msg))
     logging.info("已清理缓存。")
 
 
@@ -714,5 +890,5 @@ async def set_msg_emoji_like(websocket, message_id, emoji_id, set=True):
         "params": {"message_id": message_id, "emoji_id": emoji_id, "set": set},
         "echo": "set_msg_emoji_like",
     }
-    await websocket.send(json.dumps(set_msg_emoji_like_msg))
+    await websocket.send(codec.dumps_text(set_msg_emoji_like_msg))
     logging.info(f"[API]已发送表情回应 {message_id} {emoji_id}。")
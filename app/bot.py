@@ -13,9 +13,61 @@ from dingtalk import dingtalk
 from handler_events import handle_message
 
 from api import send_group_msg
+from dispatcher import EventDispatcher
+import codec
+import echo
+import events
+from outbox import outbox
+from coalesce import coalescer
+from scheduler import scheduler
+from metrics import metrics
 
+# 事件分发工作池，跨重连复用以便累计统计数据
+dispatcher = EventDispatcher(
+    handle_message,
+    workers=dispatch_workers,
+    queue_size=dispatch_queue_size,
+    put_timeout=dispatch_put_timeout,
+    busy_put_timeout=dispatch_busy_put_timeout,
+)
 
-async def connect_to_bot():
+metrics.gauge("bot_dispatch_queue_depth", "事件队列长度", dispatcher.queue_depth)
+
+
+# 唯一的读循环：API 回应按 echo 交给等待方，其余消息交给事件处理
+async def receive_messages(websocket):
+    dispatcher.start(websocket)
+    scheduler.websocket = websocket
+    try:
+        async for message in websocket:
+            try:
+                msg = codec.loads(message)
+            except codec.DecodeError as e:
+                logging.error(f"无法解析ws消息: {e}")
+                continue
+            if not isinstance(msg, dict):
+                logging.warning(f"收到的ws消息不是对象，已忽略: {message!r:.200}")
+                continue
+            if echo.resolve(msg):
+                continue
+            # 事件包装成事件对象，各处理函数共用同一个对象
+            msg = events.from_dict(msg)
+            # 记下机器人的QQ号，合并转发消息的节点需要用到
+            self_id = msg.get("self_id")
+            if self_id is not None:
+                coalescer.self_id = str(self_id)
+            # 处理ws消息，所属分片满时在这里等待；有在途 API 调用时只等待有限的时间
+            await dispatcher.submit(msg, busy=echo.pending_count)
+    finally:
+        scheduler.websocket = None
+        echo.fail_all(ConnectionError("连接已断开"))
+        await dispatcher.stop()
+        coalescer.discard(websocket)
+        outbox.discard(websocket)
+
+
+# on_connected 为连接建立后的回调，用于记录连接状态
+async def connect_to_bot(on_connected=None):
     logging.info("正在连接到机器人...")
     logging.info(f"连接地址: {ws_url}")
 
@@ -25,22 +77,28 @@ async def connect_to_bot():
         async with websockets.connect(ws_url, extra_headers=headers) as websocket:
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             logging.info(f"已连接到机器人。当前时间: {current_time}")
+            if on_connected is not None:
+                await on_connected()
             await send_group_msg(
-                websocket, report_group_id, f"机器人已连接。当前时间: {current_time}"
+                websocket,
+                report_group_id,
+                f"机器人已连接。当前时间: {current_time}",
+                priority=True,
             )
-            async for message in websocket:
-                # 处理ws消息
-                asyncio.create_task(handle_message(websocket, message))
+            await receive_messages(websocket)
     else:
         async with websockets.connect(ws_url) as websocket:
             current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             logging.info(f"已连接到机器人。当前时间: {current_time}")
+            if on_connected is not None:
+                await on_connected()
             await send_group_msg(
-                websocket, report_group_id, f"机器人已连接。当前时间: {current_time}"
+                websocket,
+                report_group_id,
+                f"机器人已连接。当前时间: {current_time}",
+                priority=True,
             )
-            async for message in websocket:
-                # 处理ws消息
-                asyncio.create_task(handle_message(websocket, message))
+            await receive_messages(websocket)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+# cache.py
+# API 查询结果缓存：群成员信息、群成员列表、群信息、陌生人信息各一个带过期时间的 LRU 缓存
+# 群成员变动、管理员变动、群名片变动的通知到达时删除相关缓存
+# 缓存的值直接返回给调用方，调用方不要修改
+# 全局单例，按顶层模块名导入（见 dev.md 的“全局单例”一节）
+
+import time
+from collections import OrderedDict
+
+from config import api_cache_ttl, api_cache_max_size
+from metrics import metrics
+
+_MISSING = object()
+
+# 会让群成员缓存过期的通知类型
+INVALIDATING_NOTICES = ("group_increase", "group_decrease", "group_admin", "group_card")
+
+
+class TTLCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size  # 最多缓存的条数，超过时淘汰最久未使用的
+        self.ttl = ttl  # 过期时间（秒）
+        self._data = OrderedDict()  # 键 -> (过期时间, 值)
+
+        # 统计数据
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # 读取缓存，不存在或已过期时返回 default
+    def get(self, key, default=None):
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        if entry[0] <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    # 删除满足条件的键
+    def delete_where(self, predicate):
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    # 统计信息
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class ApiCache:
+    def __init__(self, ttl, max_size):
+        self.member_info = TTLCache(max_size["member_info"], ttl["member_info"])
+        self.member_list = TTLCache(max_size["member_list"], ttl["member_list"])
+        self.group_info = TTLCache(max_size["group_info"], ttl["group_info"])
+        self.stranger_info = TTLCache(max_size["stranger_info"], ttl["stranger_info"])
+
+    # 群成员变动时删除相关缓存
+    def invalidate_member(self, group_id, user_id=None):
+        group_id = str(group_id)
+        if user_id is None:
+            self.member_info.delete_where(lambda key: key[0] == group_id)
+        else:
+            self.member_info.delete((group_id, str(user_id)))
+        self.member_list.delete(group_id)
+
+    # 根据通知事件删除过期的缓存，在通知分发给处理函数之前调用
+    def invalidate_for_notice(self, msg):
+        notice_type = msg.get("notice_type")
+        if notice_type not in INVALIDATING_NOTICES:
+            return
+        group_id = msg.get("group_id")
+        if group_id is None:
+            return
+        self.invalidate_member(group_id, msg.get("user_id"))
+        # 群人数变化
+        if notice_type in ("group_increase", "group_decrease"):
+            self.group_info.delete(str(group_id))
+            # 机器人自己被踢出或退群时，整个群的缓存都没用了
+            if msg.get("user_id") == msg.get("self_id"):
+                self.invalidate_member(group_id)
+
+    def clear(self):
+        self.member_info.clear()
+        self.member_list.clear()
+        self.group_info.clear()
+        self.stranger_info.clear()
+
+    # 统计信息
+    def stats(self):
+        return {
+            "member_info": self.member_info.stats(),
+            "member_list": self.member_list.stats(),
+            "group_info": self.group_info.stats(),
+            "stranger_info": self.stranger_info.stats(),
+        }
+
+
+api_cache = ApiCache(api_cache_ttl, api_cache_max_size)
+
+metrics.gauge(
+    "bot_api_cache_hit_rate",
+    "API 缓存命中率",
+    lambda: {name: stats["hit_rate"] for name, stats in api_cache.stats().items()},
+    ("cache",),
+)
@@ -0,0 +1,101 @@
+# coalesce.py
+# 群消息合并：短时间内发往同一个群的多条文本消息先缓存起来，窗口结束时合并发送
+# 合并后不超过长度阈值时作为一条普通消息发送，超过时作为合并转发消息发送
+# 优先发送的消息（如系统命令的回复）和引用回复的消息不缓存，先发出该群已缓存的消息再直接发送
+# 默认关闭，在 config.py 中用 coalesce_enabled 开启
+# 全局单例，按顶层模块名导入（见 dev.md 的“全局单例”一节）
+
+import asyncio
+
+from config import (
+    coalesce_enabled,
+    coalesce_window,
+    coalesce_max_messages,
+    coalesce_forward_threshold,
+)
+
+
+# 只有纯文本消息可以合并；引用回复的 CQ 码只在消息开头才生效，合并后会落到中间，这类消息直接发送
+def mergeable(content):
+    return isinstance(content, str) and "[CQ:reply," not in content
+
+
+class MessageCoalescer:
+    def __init__(self, window, max_messages, forward_threshold, enabled=True):
+        self.enabled = enabled
+        self.window = window  # 缓存窗口（秒）
+        self.max_messages = max_messages  # 缓存达到该条数时立即发送
+        self.forward_threshold = forward_threshold  # 合并后超过该字数时改用合并转发
+        self.self_id = (
+            None  # 机器人的QQ号，作为合并转发节点的发送者，由读循环从事件中记下
+        )
+
+        # (websocket, group_id) -> [待合并的消息, 发送函数, 定时器]
+        self._buffers = {}
+
+        # 统计数据
+        self.buffered = 0
+        self.flushed = 0
+        self.forwarded = 0
+
+    # 缓存一条群消息，返回 False 表示这条消息不能合并，需要调用方直接发送
+    # flush 为发送函数，签名为 flush(websocket, group_id, contents, forward, priority)
+    def add(self, websocket, group_id, content, flush, priority=False):
+        if not self.enabled:
+            return False
+        if priority or not mergeable(content):
+            # 已缓存的消息先发出，且和这条消息一样优先，避免被它插队
+            self.flush(websocket, group_id, priority)
+            return False
+        key = (websocket, str(group_id))
+        entry = self._buffers.get(key)
+        if entry is None:
+            timer = asyncio.get_running_loop().call_later(
+                self.window, self.flush, websocket, group_id
+            )
+            entry = self._buffers[key] = [[], flush, timer]
+        entry[0].append(content)
+        self.buffered += 1
+        if len(entry[0]) >= self.max_messages:
+            self.flush(websocket, group_id)
+        return True
+
+    # 发送某个群缓存的消息，priority 为 True 时随后的优先消息一起优先发送
+    def flush(self, websocket, group_id, priority=False):
+        entry = self._buffers.pop((websocket, str(group_id)), None)
+        if entry is None:
+            return
+        contents, flush, timer = entry
+        timer.cancel()
+        # 还不知道机器人的QQ号时无法构造合并转发节点，只能作为普通消息发送
+        forward = (
+            self.self_id is not None
+            and len(contents) > 1
+            and sum(len(content) for content in contents) > self.forward_threshold
+        )
+        self.flushed += 1
+        if forward:
+            self.forwarded += 1
+        flush(websocket, group_id, contents, forward, priority)
+
+    # 连接断开时丢弃该连接缓存的消息
+    def discard(self, websocket):
+        for key in [key for key in self._buffers if key[0] is websocket]:
+            self._buffers.pop(key)[2].cancel()
+
+    # 统计信息
+    def stats(self):
+        return {
+            "pending_groups": len(self._buffers),
+            "buffered": self.buffered,
+            "flushed": self.flushed,
+            "forwarded": self.forwarded,
+        }
+
+
+coalescer = MessageCoalescer(
+    window=coalesce_window,
+    max_messages=coalesce_max_messages,
+    forward_threshold=coalesce_forward_threshold,
+    enabled=coalesce_enabled,
+)
@@ -0,0 +1,44 @@
+# codec.py
+# JSON 编解码：安装了 orjson 或 msgspec 时使用它们，否则使用标准库 json
+# 解析失败时抛出 DecodeError；dumps 直接编码为 UTF-8 字节，
+# OneBot 只接受文本帧，发送到 websocket 时用 dumps_text
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+if orjson is not None:
+    BACKEND = "orjson"
+    loads = orjson.loads
+    dumps = orjson.dumps
+    DecodeError = orjson.JSONDecodeError
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+    loads = _decoder.decode
+    dumps = _encoder.encode
+    DecodeError = (ValueError, msgspec.DecodeError)
+else:
+    BACKEND = "json"
+    loads = json.loads
+    DecodeError = ValueError
+
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+
+
+# 编码为文本帧
+def dumps_text(obj):
+    return dumps(obj).decode("utf-8")
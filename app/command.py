@@ -0,0 +1,97 @@
+# command.py
+# 命令匹配器：把所有注册的命令一次性编译成前缀树和一个合并的正则
+# 前缀树用于快速排除不是命令的消息，合并正则一次匹配同时得到命令和参数
+
+import re
+
+
+class CommandMatch:
+    __slots__ = ("name", "args", "text")
+
+    def __init__(self, name, args, text):
+        self.name = name  # 命令名（即命令的固定前缀）
+        self.args = args  # 参数正则中各捕获组的值
+        self.text = text  # 去掉首尾空白后的原始消息
+
+    def __repr__(self):
+        return f"CommandMatch(name={self.name!r}, args={self.args!r})"
+
+
+class CommandMatcher:
+    def __init__(self):
+        self._commands = {}  # 命令名 -> 参数正则
+        self._compiled = False
+        self._trie = {}
+        self._regex = None
+        self._groups = {}  # 合并正则中的分组名 -> (命令名, 参数起始下标, 参数个数)
+
+    # 注册命令：name 为固定前缀，pattern 为紧跟在前缀后面的参数正则
+    # 参数正则为空表示消息必须与命令完全相同
+    def register(self, name, pattern=""):
+        if self._commands.get(name, pattern) != pattern:
+            raise ValueError(f"命令 {name} 已注册为不同的参数格式")
+        self._commands[name] = pattern
+        self._compiled = False
+
+    # 批量注册，commands 可以是命令名列表，也可以是 {命令名: 参数正则} 字典
+    def update(self, commands):
+        if isinstance(commands, dict):
+            for name, pattern in commands.items():
+                self.register(name, pattern or "")
+        else:
+            for name in commands:
+                self.register(name)
+
+    def names(self):
+        return list(self._commands)
+
+    def compile(self):
+        trie = {}
+        for name in self._commands:
+            node = trie
+            for char in name:
+                node = node.setdefault(char, {})
+            node[""] = name  # 空字符串键标记一个命令前缀的结尾
+
+        parts = []
+        groups = {}
+        index = 1
+        # 固定前缀长的命令放在前面，避免被较短的前缀抢先匹配
+        for number, name in enumerate(sorted(self._commands, key=len, reverse=True)):
+            pattern = self._commands[name]
+            group = f"c{number}"
+            arg_count = re.compile(pattern).groups
+            parts.append(f"(?P<{group}>{re.escape(name)}{pattern})")
+            groups[group] = (name, index, arg_count)
+            index += 1 + arg_count
+
+        self._trie = trie
+        self._regex = re.compile("|".join(parts), re.DOTALL) if parts else None
+        self._groups = groups
+        self._compiled = True
+
+    # 判断消息是否以某个命令前缀开头，不是命令的消息在这里就直接返回
+    def _has_prefix(self, text):
+        node = self._trie
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                return False
+            if "" in node:
+                return True
+        return False
+
+    # 匹配消息，返回 CommandMatch，不是命令时返回 None
+    def match(self, text):
+        if not self._compiled:
+            self.compile()
+        if not isinstance(text, str) or self._regex is None:
+            return None
+        text = text.strip()
+        if not text or text[0] not in self._trie or not self._has_prefix(text):
+            return None
+        matched = self._regex.fullmatch(text)
+        if matched is None:
+            return None
+        name, start, count = self._groups[matched.lastgroup]
+        return CommandMatch(name, matched.groups()[start : start + count], text)
@@ -10,3 +10,95 @@ ws_url = "ws://127.0.0.1:3001"  # 本地环境的 WebSocket API 地址
 
 
 token = None  # 如果需要认证，请填写认证 token
+
+
+# 事件分发
+dispatch_workers = 16  # 同时处理事件的 worker 数量
+dispatch_queue_size = 1000  # 待处理事件队列上限，队列满时暂停读取 ws 消息
+dispatch_put_timeout = 10  # 队列持续满载超过该秒数时丢弃消息，None 表示一直等待
+dispatch_busy_put_timeout = 0.5  # 有在途 API 调用时分片满载最多等待的秒数
+
+
+# 群组开关
+switch_flush_interval = 5  # 开关修改写回文件的间隔（秒），退出时也会写回
+
+
+# 日志
+log_queue_size = 10000  # 待写入日志的队列上限，队列满时丢弃新日志并计数
+log_max_bytes = 1024 * 1024  # 单个日志文件的大小上限，超过后新建文件
+log_index_interval = 64 * 1024  # 日志目录索引中每隔多少字节记录一个 (时间, 偏移) 索引点
+log_buffer_size = (
+    2000  # 内存中每个日志级别保存的最近日志条数，供 logs/errorlog/debuglog 命令使用
+)
+event_log_enabled = True  # 是否记录收到的事件和回应
+event_log_max_field_length = 200  # 事件日志中单个字段的最大长度，超出部分截断
+event_log_max_items = 10  # 事件日志中列表（如消息段）最多记录的项数
+# 各类事件的日志抽样比例，1.0 为全部记录，0.0 为不记录，response 为 API 回应
+event_log_sample_rates = {
+    "message": 1.0,
+    "notice": 1.0,
+    "request": 1.0,
+    "meta_event": 0.0,
+    "response": 1.0,
+}
+
+
+# 钉钉通知
+dingtalk_coalesce_window = 60  # 同一告警在该秒数内重复出现时合并成一条汇总发送
+dingtalk_rate_limit = 20  # 每分钟最多发送的通知条数（钉钉机器人限制为每分钟20条）
+
+
+# 断线重连
+reconnect_base_delay = 1  # 第一次重试前等待的秒数
+reconnect_max_delay = 60  # 重试间隔上限（秒）
+reconnect_multiplier = 2  # 每次失败后重试间隔的倍数
+reconnect_jitter = 0.5  # 随机抖动比例，实际间隔在 [(1 - jitter) * 间隔, 间隔] 之间
+reconnect_stable_time = 30  # 连接保持超过该秒数后再断开，重试间隔才从头开始
+
+
+# 发送限速
+outbox_group_rate = 1  # 每个群（私聊按QQ号）每秒最多发送的消息条数
+outbox_group_burst = 5  # 每个群允许连续突发发送的条数
+outbox_global_rate = 10  # 所有目标合计每秒最多发送的消息条数
+outbox_global_burst = 20  # 所有目标合计允许连续突发发送的条数
+outbox_queue_size = 1000  # 普通消息最多排队的条数，超过时丢弃新消息
+
+
+# 群消息合并
+coalesce_enabled = False  # 是否把短时间内发往同一个群的文本消息合并发送
+coalesce_window = 0.5  # 合并窗口（秒），窗口内发往同一个群的消息合并成一条
+coalesce_max_messages = 20  # 缓存达到该条数时立即发送，不等窗口结束
+coalesce_forward_threshold = 1500  # 合并后超过该字数时改用合并转发消息发送
+coalesce_forward_name = "机器人"  # 合并转发消息中每个节点显示的发送者名称
+
+
+# API 查询缓存
+# 各类查询结果的缓存时间（秒），成员变动、管理员变动、群名片变动的通知到达时会提前删除相关缓存
+api_cache_ttl = {
+    "member_info": 300,
+    "member_list": 120,
+    "group_info": 300,
+    "stranger_info": 600,
+}
+# 各类查询结果最多缓存的条数，超过时淘汰最久未使用的
+api_cache_max_size = {
+    "member_info": 5000,
+    "member_list": 200,
+    "group_info": 500,
+    "stranger_info": 2000,
+}
+
+
+# 批量查询
+batch_lookup_concurrency = 10  # iter_group_member_info 同时进行的查询数
+batch_lookup_timeout = 5  # iter_group_member_info 单个成员查询的超时时间（秒）
+
+
+# 功能模块
+scripts_disabled = ["Example"]  # 不加载的 app/scripts 下的模块名
+scripts_reload_interval = 0  # 检查模块文件修改并重新加载的间隔（秒），0 为不检查
+
+
+# 运行指标
+metrics_http_host = "127.0.0.1"  # 导出 Prometheus 指标的 HTTP 地址
+metrics_http_port = None  # 导出 Prometheus 指标的 HTTP 端口，None 表示不开启
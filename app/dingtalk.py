@@ -1,33 +1,67 @@
 # 用于发送钉钉通知
-import requests
-import json
+# 通知先放进后台队列，由单独的任务通过复用的 aiohttp 会话发送，不会阻塞事件循环
+# 同一告警在合并窗口内只立即发送第一条，其余合并成一条汇总，发送频率不超过钉钉每分钟的限制
 import time
 import hmac
 import hashlib
 import urllib
 import base64
 import urllib.parse
+from collections import deque
 from logger import logging
 import asyncio
+import codec
 from secret import dingtalk_token, dingtalk_secret
+from config import dingtalk_coalesce_window, dingtalk_rate_limit
+from lazyimport import lazy_import
 
+# aiohttp 导入较慢，第一次发送通知时才导入，不拖慢启动
+aiohttp = lazy_import("aiohttp")
 
-# 推送到钉钉
-async def dingtalk(text, desp):
-    try:
-        # 这里替换为你自己的TOKEN，不要直接用我的，我的有IP验证，用我的也没用
-        DD_BOT_TOKEN = dingtalk_token
-        # 这里替换为你自己的SECRET，不要直接用我的，我的有IP验证，用我的也没用
-        DD_BOT_SECRET = dingtalk_secret
+DINGTALK_URL = "https://oapi.dingtalk.com/robot/send"
 
-        url = f"https://oapi.dingtalk.com/robot/send?access_token={DD_BOT_TOKEN}"
-        headers = {"Content-Type": "application/json"}
-        payload = {"msgtype": "text", "text": {"content": f"{text}\n{desp}"}}
 
-        if DD_BOT_TOKEN and DD_BOT_SECRET:
+class DingTalkNotifier:
+    def __init__(
+        self,
+        token,
+        secret,
+        base_url=DINGTALK_URL,
+        coalesce_window=60,
+        rate_limit=20,
+        queue_size=100,
+        timeout=10,
+    ):
+        self.token = token
+        self.secret = secret
+        self.base_url = base_url  # 测试时可以指向本地的 HTTP 服务
+        self.coalesce_window = coalesce_window  # 同一标题的告警合并窗口（秒）
+        self.rate_limit = rate_limit  # 每分钟最多发送的条数
+        self.queue_size = queue_size
+        self.timeout = timeout
+
+        self._session = None
+        self._queue = None
+        self._sender = None
+        self._sent_times = deque()  # 最近一分钟内的发送时间
+        self._alerts = {}  # 合并用的键 -> 合并状态
+
+    # 获取复用的会话，连接在多次发送之间保持
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=4),
+            )
+        return self._session
+
+    # 计算带签名的请求地址
+    def _signed_url(self):
+        url = f"{self.base_url}?access_token={self.token}"
+        if self.token and self.secret:
             timestamp = str(round(time.time() * 1000))
-            secret_enc = DD_BOT_SECRET.encode("utf-8")
-            string_to_sign = f"{timestamp}\n{DD_BOT_SECRET}"
+            secret_enc = self.secret.encode("utf-8")
+            string_to_sign = f"{timestamp}\n{self.secret}"
             string_to_sign_enc = string_to_sign.encode("utf-8")
             hmac_code = hmac.new(
                 secret_enc, string_to_sign_enc, digestmod=hashlib.sha256
@@ -36,24 +70,128 @@ async def dingtalk(text, desp):
                 base64.b64encode(hmac_code).decode("utf-8").strip()
             )
             url = f"{url}&timestamp={timestamp}&sign={sign}"
+        return url
 
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+    # 等到最近一分钟内的发送次数低于限制
+    async def _wait_rate_limit(self):
+        while True:
+            now = time.monotonic()
+            while self._sent_times and now - self._sent_times[0] >= 60:
+                self._sent_times.popleft()
+            if len(self._sent_times) < self.rate_limit:
+                self._sent_times.append(now)
+                return
+            await asyncio.sleep(60 - (now - self._sent_times[0]))
 
+    # 立即发送一条通知（受频率限制），返回钉钉的响应
+    async def send(self, text, desp):
+        await self._wait_rate_limit()
+        payload = {"msgtype": "text", "text": {"content": f"{text}\n{desp}"}}
         try:
-            data = response.json()
-            if response.status_code == 200 and data.get("errcode") == 0:
+            async with self._get_session().post(
+                self._signed_url(),
+                data=codec.dumps(payload),
+                headers={"Content-Type": "application/json"},
+            ) as response:
+                data = await response.json(content_type=None)
+            if response.status == 200 and data.get("errcode") == 0:
                 logging.info("钉钉发送通知消息成功🎉")
             else:
                 logging.error(f"钉钉发送通知消息失败😞\n{data.get('errmsg')}")
+            return data
         except Exception as e:
             logging.error(f"钉钉发送通知消息失败😞\n{e}")
 
-        return response.json()
+    # 提交一条通知，放入后台队列后立即返回
+    # key 为合并告警用的键，默认为标题；标题中带有当前时间等每次都不同的内容时需要传入固定的 key
+    async def notify(self, text, desp, key=None):
+        key = text if key is None else key
+        alert = self._alerts.get(key)
+        if alert is None:
+            self._alerts[key] = {"text": text, "desp": desp, "repeats": 0}
+            self._enqueue(text, desp)
+            self._schedule_flush(key)
+            return
+
+        # 合并窗口内的重复告警，窗口结束时汇总发送一条
+        alert["repeats"] += 1
+        alert["text"] = text
+        alert["desp"] = desp
+
+    def _schedule_flush(self, key):
+        asyncio.get_running_loop().call_later(
+            self.coalesce_window, self._flush_alert, key
+        )
+
+    # 合并窗口结束：有重复告警时发送汇总并开始新的窗口，没有时删除该告警的记录
+    def _flush_alert(self, key):
+        alert = self._alerts.get(key)
+        if alert is None:
+            return
+        if not alert["repeats"]:
+            del self._alerts[key]
+            return
+        self._enqueue(
+            f"{alert['text']}（{self.coalesce_window}秒内重复{alert['repeats']}次）",
+            alert["desp"],
+        )
+        alert["repeats"] = 0
+        self._schedule_flush(key)
+
+    def _enqueue(self, text, desp):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._send_loop())
+        try:
+            self._queue.put_nowait((text, desp))
+        except asyncio.QueueFull:
+            logging.error(f"钉钉通知队列已满，丢弃通知: {text}")
+
+    async def _send_loop(self):
+        while True:
+            text, desp = await self._queue.get()
+            try:
+                await self.send(text, desp)
+            finally:
+                self._queue.task_done()
+
+    # 等待队列中的通知发送完毕
+    async def flush(self):
+        if self._queue is not None:
+            await self._queue.join()
+
+    # 发送完剩余通知并关闭会话
+    async def close(self):
+        await self.flush()
+        if self._sender is not None:
+            self._sender.cancel()
+            self._sender = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+notifier = DingTalkNotifier(
+    dingtalk_token,
+    dingtalk_secret,
+    coalesce_window=dingtalk_coalesce_window,
+    rate_limit=dingtalk_rate_limit,
+)
+
+
+# 推送到钉钉，只负责入队，不等待发送结果；key 见 DingTalkNotifier.notify
+async def dingtalk(text, desp, key=None):
+    try:
+        await notifier.notify(text, desp, key)
     except Exception as e:
         logging.error(f"钉钉发送通知消息失败😞\n{e}")
 
 
 if __name__ == "__main__":
-    DD_BOT_SECRET = "x"
-    DD_BOT_TOKEN = "x"
-    asyncio.run(dingtalk("test", "test"))
+
+    async def test():
+        await dingtalk("test", "test")
+        await notifier.close()
+
+    asyncio.run(test())
@@ -0,0 +1,173 @@
+# dispatcher.py
+# 事件分发工作池：读循环把消息放进有界队列，由固定数量的 worker 取出处理
+# 队列满时读循环会等待，从而对上游形成背压，避免消息风暴时无限制地创建任务
+# 每个 worker 是一个分片，按 group_id（没有则按 user_id）哈希选择分片：
+# 同一个群的事件在同一分片内按到达顺序串行处理，不同分片之间并发
+
+import asyncio
+import logging
+import time
+
+from metrics import metrics
+
+# 事件从进入队列到开始处理的等待时间，以及处理耗时，按 post_type 统计
+EVENT_COUNT = metrics.counter("bot_events_total", "收到的事件数", ("post_type",))
+EVENT_QUEUE_WAIT = metrics.histogram(
+    "bot_event_queue_wait_seconds", "事件排队耗时", ("post_type",)
+)
+EVENT_HANDLE_TIME = metrics.histogram(
+    "bot_event_handle_seconds", "事件处理耗时", ("post_type",)
+)
+
+
+# 分片满载时，每隔多少秒重新检查一次是否有在途 API 调用
+BUSY_CHECK_INTERVAL = 0.05
+
+
+class EventDispatcher:
+    def __init__(
+        self, handler, workers, queue_size, put_timeout=None, busy_put_timeout=0
+    ):
+        self.handler = handler  # 处理函数，签名为 handler(websocket, msg)
+        self.workers = workers  # 分片数量
+        self.queue_size = queue_size  # 所有分片队列容量之和
+        self.put_timeout = put_timeout  # 队列满时最多等待的秒数，None 表示一直等待
+        self.busy_put_timeout = busy_put_timeout  # 有在途 API 调用时最多等待的秒数
+
+        self._queues = []
+        self._tasks = set()
+        self._websocket = None
+        self._next_shard = 0  # 没有群号和QQ号的事件（如心跳）轮流分配
+
+        # 统计数据，跨重连累计
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    # 连接建立后启动 worker
+    def start(self, websocket):
+        self._websocket = websocket
+        shard_size = max(1, self.queue_size // self.workers)
+        self._queues = [asyncio.Queue(maxsize=shard_size) for _ in range(self.workers)]
+        for index, queue in enumerate(self._queues):
+            task = asyncio.create_task(
+                self._worker(queue), name=f"dispatch-shard-{index}"
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    # 计算消息所属分片
+    def shard_of(self, msg):
+        key = msg.get("group_id") or msg.get("user_id")
+        if key is None:
+            self._next_shard = (self._next_shard + 1) % self.workers
+            return self._next_shard
+        return hash(key) % self.workers
+
+    # 提交一条已解析的消息，所属分片满时等待；被丢弃时返回 False
+    # busy() 为真表示有在途 API 调用：读循环还要继续读取它们的回应，
+    # 这时阻塞读循环会让等待回应的 worker 和读循环互相等待，所以分片满时最多再等 busy_put_timeout 秒
+    async def submit(self, msg, busy=None):
+        queue = self._queues[self.shard_of(msg)]
+        item = (msg, time.perf_counter())
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if not await self._wait_put(queue, item, busy):
+                return False
+        self.submitted += 1
+        return True
+
+    # 等待分片腾出位置；等待期间定时检查 busy()，开始等待后才发出的 API 调用也能及时发现
+    async def _wait_put(self, queue, item, busy):
+        loop = asyncio.get_running_loop()
+        deadline = None
+        if self.put_timeout is not None:
+            deadline = loop.time() + self.put_timeout
+        busy_deadline = None
+        while True:
+            now = loop.time()
+            if busy is not None and busy():
+                if busy_deadline is None:
+                    busy_deadline = now + self.busy_put_timeout
+                if now >= busy_deadline:
+                    self._drop("事件分片已满且有等待回应的 API 调用")
+                    return False
+            else:
+                busy_deadline = None
+            if deadline is not None and now >= deadline:
+                self._drop(f"事件队列持续满载超过 {self.put_timeout} 秒")
+                return False
+
+            wake_times = [t for t in (deadline, busy_deadline) if t is not None]
+            if busy is not None:
+                wake_times.append(now + BUSY_CHECK_INTERVAL)
+            try:
+                if wake_times:
+                    await asyncio.wait_for(queue.put(item), min(wake_times) - now)
+                else:
+                    await queue.put(item)
+                return True
+            except asyncio.TimeoutError:
+                continue
+
+    def _drop(self, reason):
+        self.dropped += 1
+        logging.warning(f"{reason}，已丢弃一条消息，累计丢弃 {self.dropped} 条")
+
+    # 连接断开后停止 worker，未处理的消息计为丢弃
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        remaining = self.queue_depth()
+        if remaining:
+            self.dropped += remaining
+            logging.warning(f"连接断开，丢弃 {remaining} 条未处理的消息")
+        self._queues = []
+        self._websocket = None
+
+    # 每个分片一个 worker，分片内的消息严格按顺序处理
+    async def _worker(self, queue):
+        while True:
+            msg, enqueued_at = await queue.get()
+            post_type = msg.get("post_type") or "response"
+            started = time.perf_counter()
+            EVENT_COUNT.inc(post_type)
+            EVENT_QUEUE_WAIT.observe(started - enqueued_at, post_type)
+            self.in_flight += 1
+            try:
+                await self.handler(self._websocket, msg)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"处理ws消息失败: {e}")
+            finally:
+                self.in_flight -= 1
+                EVENT_HANDLE_TIME.observe(time.perf_counter() - started, post_type)
+                queue.task_done()
+
+    # 当前所有分片的队列深度之和
+    def queue_depth(self):
+        return sum(queue.qsize() for queue in self._queues)
+
+    # 各分片的队列深度
+    def shard_depths(self):
+        return [queue.qsize() for queue in self._queues]
+
+    # 统计信息
+    def stats(self):
+        return {
+            "workers": len(self._tasks),
+            "queue_depth": self.queue_depth(),
+            "max_shard_depth": max(self.shard_depths(), default=0),
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,69 @@
+# echo.py
+# 回应消息的 echo 关联：每个需要返回值的 API 调用登记一个唯一 echo，
+# 由 bot.connect_to_bot 中唯一的读循环收到回应后完成对应的 future，
+# 避免各个 API 函数各自 websocket.recv() 抢消息
+
+import asyncio
+import itertools
+
+import codec
+
+# echo -> future
+_pending = {}
+
+# 自增序号，保证同一进程内 echo 唯一
+_counter = itertools.count(1)
+
+
+# 生成唯一 echo，保留 action 前缀便于日志排查
+def new_echo(action):
+    return f"{action}#{next(_counter)}"
+
+
+# 登记一个等待回应的 echo
+def register(echo):
+    future = asyncio.get_running_loop().create_future()
+    _pending[echo] = future
+    return future
+
+
+# 取消登记（超时或发送失败时调用）
+def discard(echo):
+    future = _pending.pop(echo, None)
+    if future is not None and not future.done():
+        future.cancel()
+
+
+# 当前在途的请求数量
+def pending_count():
+    return len(_pending)
+
+
+# 尝试用收到的回应完成等待中的请求，命中返回 True
+def resolve(message):
+    # 事件消息里不会出现未转义的 "echo" 键，先做一次字符串预判，避免为每个事件多解析一次
+    if isinstance(message, str) and '"echo"' not in message:
+        return False
+    try:
+        msg = codec.loads(message) if isinstance(message, (str, bytes)) else message
+    except codec.DecodeError:
+        return False
+    if not isinstance(msg, dict):
+        return False
+    echo = msg.get("echo")
+    if not isinstance(echo, str):
+        return False
+    future = _pending.pop(echo, None)
+    if future is None:
+        return False
+    if not future.done():
+        future.set_result(msg)
+    return True
+
+
+# 连接断开时让所有等待中的请求立即失败
+def fail_all(exc):
+    while _pending:
+        _, future = _pending.popitem()
+        if not future.done():
+            future.set_exception(exc)
@@ -0,0 +1,181 @@
+# events.py
+# OneBot 11 事件对象：包装读循环解析好的字典，不复制数据
+# 常用字段以属性访问，第一次访问时计算并缓存在 __slots__ 里，多个处理函数共用同一次计算结果
+# 仍然支持 msg.get("xxx")、msg["xxx"] 和 "xxx" in msg，旧的处理函数不用修改
+# user_id、group_id 等 QQ 号属性统一为字符串，没有该字段时为 None；按键访问得到的仍是原始值
+
+from config import owner_id
+
+
+# 延迟计算的属性，结果缓存在同名加下划线前缀的槽里
+class lazy_field:
+    __slots__ = ("func", "slot")
+
+    def __init__(self, func):
+        self.func = func
+        self.slot = "_" + func.__name__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.slot)
+        except AttributeError:
+            value = self.func(obj)
+            setattr(obj, self.slot, value)
+            return value
+
+
+def _str_or_none(value):
+    return None if value is None else str(value)
+
+
+class Event:
+    __slots__ = ("data", "post_type", "_self_id", "_user_id", "_group_id")
+
+    def __init__(self, data):
+        self.data = data  # 原始字典
+        self.post_type = data.get("post_type")
+
+    # 兼容字典的访问方式
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.data!r})"
+
+    @property
+    def time(self):
+        return self.data.get("time")
+
+    @lazy_field
+    def self_id(self):
+        return _str_or_none(self.data.get("self_id"))
+
+    @lazy_field
+    def user_id(self):
+        return _str_or_none(self.data.get("user_id"))
+
+    @lazy_field
+    def group_id(self):
+        return _str_or_none(self.data.get("group_id"))
+
+    @property
+    def sub_type(self):
+        return self.data.get("sub_type")
+
+    # 是否是root管理员
+    @property
+    def is_owner(self):
+        return self.user_id in owner_id
+
+
+class MessageEvent(Event):
+    __slots__ = ("_raw_message", "_role", "_is_authorized")
+
+    @property
+    def message_type(self):
+        return self.data.get("message_type")
+
+    @property
+    def message_id(self):
+        return self.data.get("message_id")
+
+    @property
+    def message(self):
+        return self.data.get("message")
+
+    @lazy_field
+    def raw_message(self):
+        raw_message = self.data.get("raw_message")
+        return "" if raw_message is None else str(raw_message)
+
+    @property
+    def sender(self):
+        return self.data.get("sender") or {}
+
+    # 发送者在群里的身份：owner、admin 或 member，私聊时为 None
+    @lazy_field
+    def role(self):
+        return self.sender.get("role")
+
+    @property
+    def nickname(self):
+        return self.sender.get("nickname")
+
+    @property
+    def card(self):
+        return self.sender.get("card")
+
+    # 是否有权限（管理员、群主或root管理员），与 api.is_authorized 一致
+    @lazy_field
+    def is_authorized(self):
+        return self.role in ("owner", "admin") or self.is_owner
+
+
+class NoticeEvent(Event):
+    __slots__ = ("_operator_id",)
+
+    @property
+    def notice_type(self):
+        return self.data.get("notice_type")
+
+    @lazy_field
+    def operator_id(self):
+        return _str_or_none(self.data.get("operator_id"))
+
+
+class RequestEvent(Event):
+    __slots__ = ()
+
+    @property
+    def request_type(self):
+        return self.data.get("request_type")
+
+    @property
+    def comment(self):
+        return self.data.get("comment")
+
+    @property
+    def flag(self):
+        return self.data.get("flag")
+
+
+class MetaEvent(Event):
+    __slots__ = ()
+
+    @property
+    def meta_event_type(self):
+        return self.data.get("meta_event_type")
+
+    @property
+    def status(self):
+        return self.data.get("status")
+
+    @property
+    def interval(self):
+        return self.data.get("interval")
+
+
+EVENT_CLASSES = {
+    "message": MessageEvent,
+    "message_sent": MessageEvent,
+    "notice": NoticeEvent,
+    "request": RequestEvent,
+    "meta_event": MetaEvent,
+}
+
+
+# 把解析好的字典包装成事件对象，未知的 post_type 包装成基础的 Event
+# 没有 post_type 的消息（如 API 回应）不是事件，原样返回字典
+def from_dict(data):
+    post_type = data.get("post_type")
+    if post_type is None:
+        return data
+    return EVENT_CLASSES.get(post_type, Event)(data)
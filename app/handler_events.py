@@ -17,7 +17,7 @@ from app.switch import handle_GroupSwitch_group_message
 from app.menu import handle_Menu_group_message
 
 # 系统
-from app.sysyem import handle_System_group_message
+from app.sysyem import handle_System_group_message, SYSTEM_COMMANDS
 
 # api
 from app.api import *
@@ -25,27 +25,65 @@ from app.api import *
 # 配置
 from app.config import *
 
+# 事件日志，按配置截断和抽样
+from logger import log_event
+
+# API 查询缓存，全局单例
+from cache import api_cache
+
+# 处理函数注册表，全局单例
+from handler_registry import registry
+
+# 功能模块加载器和定时任务调度器
+from loader import script_loader
+from scheduler import scheduler
+
+# 系统必需功能，声明各自关心的事件类型和命令
+registry.register(
+    handle_System_group_message,  # 处理系统消息
+    post_type="message",
+    message_type="group",
+    commands=SYSTEM_COMMANDS,
+)
+registry.register(
+    handle_GroupSwitch_group_message,  # 处理群组开关
+    post_type="message",
+    message_type="group",
+    commands=["groupswitch"],
+)
+registry.register(
+    handle_Menu_group_message,  # 处理菜单
+    post_type="message",
+    message_type="group",
+    commands=["menu"],
+)
+
+# 自动发现 app/scripts 下的功能模块，模块在第一次用到时才导入
+script_loader.discover()
+if scripts_reload_interval:
+    # 定时检查模块文件修改，原地重新加载
+    scheduler.every(
+        scripts_reload_interval,
+        script_loader.check_reload,
+        name="loader.check_reload",
+        requires_connection=False,
+    )
+
 
 # 处理消息事件的逻辑
 async def handle_message_event(websocket, msg):
     try:
-        # 处理群消息
-        if msg.get("message_type") == "group":
-
-            # 系统必需功能
-            await handle_System_group_message(websocket, msg)  # 处理系统消息
-            await handle_GroupSwitch_group_message(websocket, msg)  # 处理群组开关
-            await handle_Menu_group_message(websocket, msg)  # 处理菜单
-
-            # 依次执行scripts功能
+        # 处理群消息，只调用声明了匹配事件和命令的处理函数
+        if msg.message_type == "group":
+            await registry.dispatch(websocket, msg)
 
         # 处理私聊消息
-        elif msg.get("message_type") == "private":
-            # 由于私聊风险较大，不处理私聊消息，仅占位
-            pass
+        elif msg.message_type == "private":
+            # 由于私聊风险较大，只调用明确声明了 message_type="private" 的处理函数
+            await registry.dispatch(websocket, msg)
 
         else:
-            logging.info(f"收到未知消息类型: {msg}")
+            log_event("message", "收到未知消息类型: ", msg.data)
 
     except KeyError as e:
         logging.error(f"处理消息事件的逻辑错误: {e}")
@@ -55,19 +93,22 @@ async def handle_message_event(websocket, msg):
 async def handle_notice_event(websocket, msg):
 
     # 处理群通知
-    if msg.get("post_type") == "notice":
-        group_id = msg["group_id"]
+    if msg.post_type == "notice":
+        group_id = msg.group_id
         logging.info(f"处理群通知事件, 群ID: {group_id}")
+        # 成员变动等通知会让缓存的群成员信息过期，先删除再交给处理函数
+        api_cache.invalidate_for_notice(msg)
+        await registry.dispatch(websocket, msg)
 
 
 # 处理请求事件的逻辑
 async def handle_request_event(websocket, msg):
-    pass
+    await registry.dispatch(websocket, msg)
 
 
 # 处理元事件的逻辑
 async def handle_meta_event(websocket, msg):
-    pass
+    await registry.dispatch(websocket, msg)
 
 
 # 处理定时任务，每个心跳周期检查一次
@@ -79,35 +120,32 @@ async def handle_cron_task(websocket):
 
 
 # 处理回应消息
-async def handle_response_message(websocket, message):
-    msg = json.loads(message)
+async def handle_response_message(websocket, msg):
     if msg.get("status") == "ok":
-        pass
-
+        await script_loader.dispatch_response(websocket, msg)
 
-# 处理ws消息
-async def handle_message(websocket, message):
 
-    msg = json.loads(message)
+# 处理ws消息，事件为 events 中的事件对象，没有 post_type 的回应消息为字典
+async def handle_message(websocket, msg):
 
     # 处理回应消息
     if msg.get("status") == "ok":
-        logging.info(f"收到回应消息：{msg}")
-        await handle_response_message(websocket, message)
+        log_event("response", "收到回应消息：", msg)
+        await handle_response_message(websocket, msg)
 
     # 处理事件
     if "post_type" in msg:
-        logging.info(f"收到事件消息：{msg}")
-        if msg["post_type"] == "message":
+        log_event(msg.post_type, "收到事件消息：", msg.data)
+        if msg.post_type == "message":
             # 处理消息事件
             await handle_message_event(websocket, msg)
-        elif msg["post_type"] == "notice":
+        elif msg.post_type == "notice":
             # 处理通知事件
             await handle_notice_event(websocket, msg)
-        elif msg["post_type"] == "request":
+        elif msg.post_type == "request":
             # 处理请求事件
             await handle_request_event(websocket, msg)
-        elif msg["post_type"] == "meta_event" and msg["meta_event_type"] == "heartbeat":
+        elif msg.post_type == "meta_event" and msg.meta_event_type == "heartbeat":
             # 处理元事件
             await handle_meta_event(websocket, msg)
             # 处理定时任务，每个心跳周期检查一次
@@ -0,0 +1,211 @@
+# handler_registry.py
+# 声明式的事件处理函数注册表
+# 模块声明自己关心的 post_type、message_type/notice_type/request_type 以及命令，
+# 注册表预先按事件类型建立索引，每个事件只调用匹配的处理函数，且并发执行
+
+import asyncio
+import inspect
+import logging
+import re
+import time
+
+from command import CommandMatcher
+from metrics import metrics
+
+# 各处理函数的耗时和失败次数
+HANDLER_TIME = metrics.histogram("bot_handler_seconds", "处理函数耗时", ("handler",))
+HANDLER_FAILURES = metrics.counter(
+    "bot_handler_failures_total", "处理函数失败次数", ("handler",)
+)
+
+# 各 post_type 下用于细分事件的字段
+DETAIL_FIELDS = {
+    "message": "message_type",
+    "notice": "notice_type",
+    "request": "request_type",
+    "meta_event": "meta_event_type",
+}
+
+
+# 处理函数在注册表中的名字：完整模块名.函数名
+# 同一个模块可能被以 app.xxx 和 xxx 两个名字各导入一次，去掉开头的 app. 后两次注册为同一个名字
+def handler_name(module, qualname):
+    if module.startswith("app."):
+        module = module[len("app.") :]
+    return f"{module}.{qualname}"
+
+
+class Handler:
+    __slots__ = (
+        "name",
+        "func",
+        "post_type",
+        "detail_type",
+        "commands",
+        "accepts_command",
+    )
+
+    def __init__(self, name, func, post_type, detail_type, commands):
+        self.name = name
+        self.func = func
+        self.post_type = post_type
+        self.detail_type = detail_type  # None 表示该 post_type 下的所有事件
+        self.commands = commands  # None 表示不限命令，否则为 {命令名: 参数正则}
+        # 处理函数声明了 command 参数时，把匹配结果传给它，省得再解析一次
+        self.accepts_command = (
+            "command" in inspect.signature(func).parameters
+            if commands is not None
+            else False
+        )
+
+
+class HandlerRegistry:
+    def __init__(self):
+        self._handlers = {}
+        self._index = None
+
+    # 注册处理函数，同名（见 handler_name）的处理函数会替换旧的
+    def register(
+        self,
+        func,
+        post_type,
+        message_type=None,
+        notice_type=None,
+        request_type=None,
+        meta_event_type=None,
+        commands=None,
+    ):
+        detail_type = message_type or notice_type or request_type or meta_event_type
+        name = handler_name(func.__module__, func.__qualname__)
+        # commands 可以是命令名列表（消息需与命令完全相同），也可以是 {命令名: 参数正则}
+        if commands is not None:
+            if isinstance(commands, dict):
+                commands = {
+                    command: pattern or "" for command, pattern in commands.items()
+                }
+            else:
+                commands = {command: "" for command in commands}
+            self._check_commands(name, post_type, detail_type, commands)
+        self._handlers[name] = Handler(name, func, post_type, detail_type, commands)
+        self._index = None
+        return func
+
+    # 在注册时检查命令：参数正则必须能编译，会进入同一个索引的处理函数不能把同一个命令注册成不同的参数格式
+    # 否则建立索引时才报错，每个事件都会失败
+    def _check_commands(self, name, post_type, detail_type, commands):
+        for command, pattern in commands.items():
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"命令 {command} 的参数正则无效: {e}") from None
+        for other in self._handlers.values():
+            if (
+                other.name == name
+                or other.commands is None
+                or other.post_type != post_type
+            ):
+                continue
+            # 细分类型为 None 的处理函数会出现在该 post_type 的所有索引里
+            if None not in (other.detail_type, detail_type) and (
+                other.detail_type != detail_type
+            ):
+                continue
+            for command, pattern in commands.items():
+                if other.commands.get(command, pattern) != pattern:
+                    raise ValueError(
+                        f"命令 {command} 已被 {other.name} 注册为不同的参数格式"
+                    )
+
+    # 装饰器形式的注册
+    def on(self, post_type, **kwargs):
+        def decorator(func):
+            return self.register(func, post_type, **kwargs)
+
+        return decorator
+
+    # 取消注册
+    def unregister(self, name):
+        if self._handlers.pop(name, None) is not None:
+            self._index = None
+
+    # 已注册的处理函数
+    def handlers(self):
+        return list(self._handlers.values())
+
+    # 按 (post_type, 细分类型) 建立索引：
+    # 每个键对应 (不限命令的处理函数列表, 编译好的命令匹配器, {命令名: 处理函数列表})
+    def _build_index(self):
+        grouped = {}
+        for handler in self._handlers.values():
+            grouped.setdefault((handler.post_type, handler.detail_type), []).append(
+                handler
+            )
+
+        compiled = {}
+        for key, handlers in grouped.items():
+            # 细分类型为 None 的处理函数也要出现在具体细分类型的索引里
+            if key[1] is not None:
+                handlers = handlers + grouped.get((key[0], None), [])
+            always = [h for h in handlers if h.commands is None]
+            matcher = None
+            by_command = {}
+            for handler in handlers:
+                if handler.commands is None:
+                    continue
+                if matcher is None:
+                    matcher = CommandMatcher()
+                matcher.update(handler.commands)
+                for command in handler.commands:
+                    by_command.setdefault(command, []).append(handler)
+            if matcher is not None:
+                matcher.compile()
+            compiled[key] = (always, matcher, by_command)
+        self._index = compiled
+        return compiled
+
+    # 找出匹配当前事件的处理函数，返回 (处理函数列表, 命令匹配结果)
+    def match(self, msg):
+        index = self._index if self._index is not None else self._build_index()
+        post_type = msg.get("post_type")
+        detail_field = DETAIL_FIELDS.get(post_type)
+        detail_type = msg.get(detail_field) if detail_field else None
+
+        entry = index.get((post_type, detail_type)) or index.get((post_type, None))
+        if entry is None:
+            return [], None
+        always, matcher, by_command = entry
+        if matcher is None:
+            return always, None
+
+        # 不是命令的消息由前缀树直接排除，不会调用任何带命令的处理函数
+        command = matcher.match(msg.get("raw_message"))
+        if command is None:
+            return always, None
+        return always + by_command[command.name], command
+
+    # 并发调用所有匹配的处理函数，单个处理函数出错不影响其他处理函数
+    async def dispatch(self, websocket, msg):
+        handlers, command = self.match(msg)
+        if not handlers:
+            return
+        if len(handlers) == 1:
+            await self._run(handlers[0], websocket, msg, command)
+            return
+        await asyncio.gather(*(self._run(h, websocket, msg, command) for h in handlers))
+
+    async def _run(self, handler, websocket, msg, command):
+        started = time.perf_counter()
+        try:
+            if handler.accepts_command and command is not None:
+                await handler.func(websocket, msg, command=command)
+            else:
+                await handler.func(websocket, msg)
+        except Exception as e:
+            HANDLER_FAILURES.inc(handler.name)
+            logging.error(f"处理函数 {handler.name} 执行失败: {e}")
+        finally:
+            HANDLER_TIME.observe(time.perf_counter() - started, handler.name)
+
+
+# 全局注册表
+registry = HandlerRegistry()
@@ -0,0 +1,59 @@
+# lazyimport.py
+# 延迟导入体积大的依赖（如 aiohttp、pandas、jieba）：先返回一个代理，第一次访问属性时才真正导入
+# 每个延迟导入的依赖的导入耗时都会记录下来，由 import_report 汇总
+# 全局单例，按顶层模块名导入（见 dev.md 的“全局单例”一节）
+
+import importlib
+import sys
+import time
+
+# 延迟导入的依赖 -> 导入耗时（秒）
+_import_times = {}
+
+
+# 延迟导入的模块代理，第一次访问属性时才真正导入
+class LazyModule:
+    __slots__ = ("_name", "_module")
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            started = time.perf_counter()
+            module = importlib.import_module(self._name)
+            _import_times[self._name] = time.perf_counter() - started
+            self._module = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "已导入" if self._module is not None else "未导入"
+        return f"<LazyModule {self._name} {state}>"
+
+
+# 延迟导入模块，例如 pd = lazy_import("pandas")，之后照常使用 pd.DataFrame
+# 模块已经导入过时直接返回模块本身
+def lazy_import(name):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+# 已导入的延迟依赖的导入耗时报告，按耗时从高到低排列，没有时返回空字符串
+def import_report(limit=20):
+    if not _import_times:
+        return ""
+    lines = ["延迟导入的依赖:"]
+    lines += [
+        f"{name}: {seconds * 1000:.1f} 毫秒"
+        for name, seconds in sorted(
+            _import_times.items(), key=lambda item: item[1], reverse=True
+        )[:limit]
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,228 @@
+# loader.py
+# 功能模块加载器：按约定自动发现 app/scripts/<Name>/main.py 中的处理函数并注册到注册表
+# 约定的处理函数名为 handle_<Name>_group_message、handle_<Name>_group_notice、handle_<Name>_response_message
+# 发现时只读源码找出声明了哪些处理函数，模块在第一次需要调用处理函数时才导入
+# 已导入的模块文件修改后会在原地重新加载，不用重启，也不会断开 websocket
+# 每个功能模块的导入耗时都会记录下来，由 import_report 和 lazyimport 记录的依赖导入耗时一起汇总
+# 全局单例，按顶层模块名导入（见 dev.md 的“全局单例”一节）
+
+import asyncio
+import importlib
+import logging
+import os
+import re
+import time
+
+import lazyimport
+from config import scripts_disabled
+from handler_registry import handler_name, registry
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts")
+
+# 处理函数后缀 -> 注册参数，response_message 不走注册表，由 dispatch_response 调用
+HANDLER_KINDS = {
+    "group_message": {"post_type": "message", "message_type": "group"},
+    "group_notice": {"post_type": "notice"},
+    "response_message": None,
+}
+
+
+class Script:
+    __slots__ = (
+        "name",
+        "path",
+        "module_name",
+        "module",
+        "mtime",
+        "handlers",
+        "import_time",
+    )
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.module_name = f"app.scripts.{name}.main"
+        self.module = None  # 第一次用到时才导入
+        self.mtime = None
+        self.handlers = {}  # 处理函数后缀 -> 函数名
+        self.import_time = None  # 最近一次导入或重新加载的耗时（秒）
+
+
+class ScriptLoader:
+    def __init__(self, scripts_dir, disabled=()):
+        self.scripts_dir = scripts_dir
+        self.disabled = set(disabled)  # 不加载的模块名
+        self._scripts = {}
+
+        # 统计数据
+        self.imports = 0
+        self.reloads = 0
+        self.failures = 0
+
+    # 从源码中找出约定的处理函数名，不导入模块
+    def _scan_handlers(self, name, path):
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        kinds = "|".join(HANDLER_KINDS)
+        pattern = rf"^async def (handle_{re.escape(name)}_({kinds}))\s*\("
+        return {
+            match.group(2): match.group(1)
+            for match in re.finditer(pattern, source, re.MULTILINE)
+        }
+
+    # 列出 scripts 目录下要加载的模块及其 main.py 的修改时间
+    def _snapshot(self):
+        found = {}
+        if os.path.isdir(self.scripts_dir):
+            for name in sorted(os.listdir(self.scripts_dir)):
+                path = os.path.join(self.scripts_dir, name, "main.py")
+                if name in self.disabled:
+                    continue
+                try:
+                    found[name] = os.path.getmtime(path)
+                except OSError:
+                    continue
+        return found
+
+    # 扫描 scripts 目录，注册新模块、更新有变化的模块、移除已删除的模块
+    def discover(self, found=None):
+        if found is None:
+            found = self._snapshot()
+        for name, mtime in found.items():
+            path = os.path.join(self.scripts_dir, name, "main.py")
+            try:
+                self._refresh(name, path, mtime)
+            except Exception as e:
+                self.failures += 1
+                logging.error(f"加载功能模块 {name} 失败: {e}")
+        for name in [name for name in self._scripts if name not in found]:
+            self._remove(self._scripts[name])
+
+    # 首次发现时注册处理函数；文件有修改时重新扫描，已导入的模块原地重新加载
+    def _refresh(self, name, path, mtime):
+        script = self._scripts.get(name)
+        if script is not None and script.mtime == mtime:
+            return
+        if script is None:
+            script = self._scripts[name] = Script(name, path)
+        # 先记下修改时间，重新加载失败时等文件再次修改后再试，不会反复报错
+        script.mtime = mtime
+        if script.module is not None:
+            started = time.perf_counter()
+            script.module = importlib.reload(script.module)
+            script.import_time = time.perf_counter() - started
+            self.reloads += 1
+            logging.info(f"已重新加载功能模块 {name}")
+
+        handlers = self._scan_handlers(name, path)
+        for kind, func_name in script.handlers.items():
+            if handlers.get(kind) != func_name and HANDLER_KINDS[kind] is not None:
+                registry.unregister(handler_name(script.module_name, func_name))
+        script.handlers = handlers
+        for kind, func_name in handlers.items():
+            options = HANDLER_KINDS[kind]
+            if options is not None:
+                registry.register(self._proxy(script, func_name), **options)
+
+    def _remove(self, script):
+        for kind, func_name in script.handlers.items():
+            if HANDLER_KINDS[kind] is not None:
+                registry.unregister(handler_name(script.module_name, func_name))
+        del self._scripts[script.name]
+        logging.info(f"已移除功能模块 {script.name}")
+
+    # 导入模块，失败时返回 None，下次用到时再试
+    def _load(self, script):
+        if script.module is None:
+            started = time.perf_counter()
+            try:
+                script.module = importlib.import_module(script.module_name)
+                script.import_time = time.perf_counter() - started
+                self.imports += 1
+                logging.info(
+                    f"已加载功能模块 {script.name}，耗时 {script.import_time * 1000:.1f} 毫秒"
+                )
+            except Exception as e:
+                self.failures += 1
+                logging.error(f"导入功能模块 {script.name} 失败: {e}")
+                return None
+        return script.module
+
+    # 注册到注册表的代理函数，调用时才导入模块，并总是调用模块当前版本的函数
+    def _proxy(self, script, func_name):
+        async def proxy(websocket, msg):
+            module = self._load(script)
+            func = getattr(module, func_name, None) if module is not None else None
+            if func is not None:
+                await func(websocket, msg)
+
+        # 注册表按 模块名.函数名 命名处理函数，与直接注册模块里的函数同名
+        proxy.__module__ = script.module_name
+        proxy.__name__ = proxy.__qualname__ = func_name
+        return proxy
+
+    # 把回应消息交给各模块的 handle_<Name>_response_message
+    async def dispatch_response(self, websocket, msg):
+        handlers = []
+        for script in list(self._scripts.values()):
+            func_name = script.handlers.get("response_message")
+            if func_name is None:
+                continue
+            module = self._load(script)
+            func = getattr(module, func_name, None) if module is not None else None
+            if func is not None:
+                handlers.append(self._run_response(script, func, websocket, msg))
+        if handlers:
+            await asyncio.gather(*handlers)
+
+    async def _run_response(self, script, func, websocket, msg):
+        try:
+            await func(websocket, msg)
+        except Exception as e:
+            logging.error(f"功能模块 {script.name} 处理回应消息失败: {e}")
+
+    # 检查文件修改，供定时任务调用
+    # 遍历目录和读取修改时间放到线程里做，不阻塞事件循环，有变化时才重新扫描
+    async def check_reload(self):
+        found = await asyncio.to_thread(self._snapshot)
+        known = {name: script.mtime for name, script in self._scripts.items()}
+        if found != known:
+            self.discover(found)
+
+    def scripts(self):
+        return list(self._scripts.values())
+
+    # 导入耗时报告，按耗时从高到低列出功能模块和延迟导入的依赖
+    def import_report(self, limit=20):
+        loaded = sorted(
+            (script for script in self._scripts.values() if script.module is not None),
+            key=lambda script: script.import_time or 0,
+            reverse=True,
+        )
+        lines = [f"功能模块导入耗时（共 {len(loaded)} 个）:"]
+        lines += [
+            f"{script.name}: {(script.import_time or 0) * 1000:.1f} 毫秒"
+            for script in loaded[:limit]
+        ]
+        not_loaded = [
+            script.name for script in self._scripts.values() if script.module is None
+        ]
+        if not_loaded:
+            lines.append("尚未导入: " + ", ".join(not_loaded))
+        dependencies = lazyimport.import_report(limit)
+        if dependencies:
+            lines += ["", dependencies]
+        return "\n".join(lines)
+
+    # 统计信息
+    def stats(self):
+        return {
+            "scripts": len(self._scripts),
+            "loaded": sum(1 for script in self._scripts.values() if script.module),
+            "imports": self.imports,
+            "reloads": self.reloads,
+            "failures": self.failures,
+        }
+
+
+script_loader = ScriptLoader(SCRIPTS_DIR, scripts_disabled)
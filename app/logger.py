@@ -1,14 +1,378 @@
 # logger.py
 
+import atexit
+import bisect
+import json
 import logging
+import queue
+import random
+import threading
 import colorlog
 import os
+from collections import deque
 from datetime import datetime, timezone, timedelta
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+
+from config import (
+    log_queue_size,
+    log_buffer_size,
+    log_max_bytes,
+    log_index_interval,
+    event_log_enabled,
+    event_log_max_field_length,
+    event_log_max_items,
+    event_log_sample_rates,
+)
+
+# 后台写日志的监听线程
+_listener = None
+
+# 内存中的最近日志
+_log_buffer = None
+
+# 写日志文件的处理器
+_file_handler = None
+
+# 日志文件目录索引
+_log_catalog = None
+
+# 日志文件名使用东八区时间
+LOG_TZ = timezone(timedelta(hours=8))
+LOG_NAME_FORMAT = "%Y-%m-%d_%H-%M-%S"
+
+
+# 把日志记录放进有界队列，由后台线程格式化并写入控制台和文件
+# 事件循环线程只做一次入队，队列满时丢弃并计数，不会被磁盘或控制台拖慢
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._reported = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        # 队列恢复后补一条警告，说明期间丢了多少日志
+        if self.dropped > self._reported:
+            lost = self.dropped - self._reported
+            self._reported = self.dropped
+            warning = logging.LogRecord(
+                "logger",
+                logging.WARNING,
+                __file__,
+                0,
+                f"日志队列已满，丢弃了 {lost} 条日志，累计丢弃 {self.dropped} 条",
+                None,
+                None,
+            )
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                pass
+
+    # 和标准库一样在调用线程里把消息和参数合成文本，参数之后被修改或在别的线程里读取都不会影响日志内容
+    # 异常堆栈也在这里转成文本，只把处理器和格式化器的输出交给后台线程
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# 截断过长的字段，字典和列表递归处理
+def truncate_for_log(value, max_length, max_items):
+    if isinstance(value, str):
+        if len(value) > max_length:
+            return f"{value[:max_length]}...(共{len(value)}字)"
+        return value
+    if isinstance(value, dict):
+        return {
+            key: truncate_for_log(item, max_length, max_items)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        items = [
+            truncate_for_log(item, max_length, max_items) for item in value[:max_items]
+        ]
+        if len(value) > max_items:
+            items.append(f"...(共{len(value)}项)")
+        return items
+    return value
+
+
+# 按 event_log_max_field_length 和 event_log_max_items 截断事件或消息
+# 返回新建的字典和列表，之后再修改原来的事件不会影响日志
+def truncate_event(value):
+    return truncate_for_log(value, event_log_max_field_length, event_log_max_items)
+
+
+# 记录事件或回应日志，kind 为 post_type 或 "response"，按 event_log_sample_rates 抽样
+# 关闭或未被抽中时不做任何格式化；抽中时在调用线程里截断，处理函数随后修改事件也不影响日志
+def log_event(kind, prefix, msg):
+    if not event_log_enabled or not logging.root.isEnabledFor(logging.INFO):
+        return
+    rate = event_log_sample_rates.get(kind, 1.0)
+    if rate < 1.0 and (rate <= 0.0 or random.random() >= rate):
+        return
+    logging.info("%s%s", prefix, truncate_event(msg))
+
+
+# 在内存中按级别保存最近的日志，供 logs/errorlog/debuglog 命令直接读取，不用读文件
+# 挂在后台监听线程上，格式化也在后台线程完成
+class RingBufferHandler(logging.Handler):
+    def __init__(self, capacity):
+        super().__init__()
+        self.capacity = capacity  # 每个缓冲区最多保存的条数
+        self._all = deque(maxlen=capacity)
+        self._by_level = {}
+
+    def emit(self, record):
+        try:
+            entry = (record.levelname, record.name, self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        self._all.append(entry)
+        buffer = self._by_level.get(record.levelname)
+        if buffer is None:
+            buffer = self._by_level[record.levelname] = deque(maxlen=self.capacity)
+        buffer.append(entry)
+
+    # 最近的 n 条日志，返回 [(级别名, 日志行)]，最新的在最后
+    # levelname 为空时从所有级别中取，logger_name 用于只取某个日志记录器的日志
+    def recent(self, n, levelname=None, logger_name=None):
+        with self.lock:
+            if levelname is None:
+                entries = list(self._all)
+            else:
+                entries = list(self._by_level.get(levelname, ()))
+        if logger_name is not None:
+            entries = [entry for entry in entries if entry[1] == logger_name]
+        return [(level, line) for level, _, line in entries[-n:]] if n > 0 else []
+
+
+# 日志文件目录索引：记录每个日志文件的起止时间、大小和稀疏的 (时间, 字节偏移) 索引
+# 由写文件的处理器在写入和切换文件时维护，保存在 logs/catalog.json
+# 查询最新文件或某个时间段的日志时，只需要打开相关的文件并从索引的偏移处开始读
+class LogCatalog:
+    def __init__(self, log_dir, index_interval):
+        self.log_dir = log_dir
+        self.path = os.path.join(log_dir, "catalog.json")
+        self.index_interval = index_interval  # 每隔多少字节记录一个索引点
+        self._lock = threading.Lock()
+        self._entries = {}  # 文件名 -> 目录项
+        self._current = None
+        self._load()
+
+    # 读取已保存的目录，并补上目录里没有记录的旧日志文件
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = []
+        except Exception as e:
+            logging.error(f"读取日志目录索引失败: {e}")
+            entries = []
+        for entry in entries:
+            if os.path.exists(os.path.join(self.log_dir, entry["file"])):
+                self._entries[entry["file"]] = entry
+        for filename in os.listdir(self.log_dir):
+            if filename.endswith(".log") and filename not in self._entries:
+                self._entries[filename] = self._scan_untracked(filename)
+
+    # 没有记录的文件（如上次异常退出时正在写的文件）用文件名和修改时间估算起止时间
+    def _scan_untracked(self, filename):
+        path = os.path.join(self.log_dir, filename)
+        try:
+            start = (
+                datetime.strptime(filename[:19], LOG_NAME_FORMAT)
+                .replace(tzinfo=LOG_TZ)
+                .timestamp()
+            )
+        except ValueError:
+            start = None
+        stat = os.stat(path)
+        return {
+            "file": filename,
+            "start": start,
+            "end": stat.st_mtime,
+            "size": stat.st_size,
+            "index": [[start, 0]] if start is not None else [],
+        }
+
+    # 开始写一个新文件
+    def open_file(self, path):
+        filename = os.path.basename(path)
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is None:
+                entry = {
+                    "file": filename,
+                    "start": None,
+                    "end": None,
+                    "size": 0,
+                    "index": [],
+                }
+                self._entries[filename] = entry
+            self._current = entry
+
+    # 记录一条写入的日志：created 为日志时间，offset 为写入前的字节偏移，size 为写入后的文件大小
+    def record(self, created, offset, size):
+        entry = self._current
+        if entry is None:
+            return
+        with self._lock:
+            if entry["start"] is None:
+                entry["start"] = created
+            entry["end"] = created
+            entry["size"] = size
+            index = entry["index"]
+            if not index or offset - index[-1][1] >= self.index_interval:
+                index.append([created, offset])
+
+    # 保存目录，先写临时文件再重命名
+    def save(self):
+        with self._lock:
+            data = sorted(self._entries.values(), key=lambda e: e["start"] or 0)
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                logging.error(f"保存日志目录索引失败: {e}")
+
+    # 当前正在写入的文件，没有时返回最新的文件
+    def latest_file(self):
+        with self._lock:
+            entry = self._current
+            if entry is None and self._entries:
+                entry = max(self._entries.values(), key=lambda e: e["start"] or 0)
+        return os.path.join(self.log_dir, entry["file"]) if entry else None
+
+    # 所有日志文件，最新的在前
+    def files(self):
+        with self._lock:
+            entries = sorted(
+                self._entries.values(), key=lambda e: e["start"] or 0, reverse=True
+            )
+        return [os.path.join(self.log_dir, e["file"]) for e in entries]
+
+    # 与 [start, end] 时间段有交集的文件及开始读取的字节偏移，按时间从旧到新
+    def files_between(self, start, end):
+        result = []
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e["start"] or 0)
+            for entry in entries:
+                if entry["start"] is None or entry["start"] > end:
+                    continue
+                if entry["end"] is not None and entry["end"] < start:
+                    continue
+                index = entry["index"]
+                position = bisect.bisect_right([point[0] for point in index], start)
+                offset = index[position - 1][1] if position > 0 else 0
+                result.append((os.path.join(self.log_dir, entry["file"]), offset))
+        return result
+
+
+# 写日志文件的处理器：超过大小后切换到以当前时间命名的新文件，并维护日志目录索引
+# 标准 RotatingFileHandler 在 backupCount=0 时不会真正切换文件，超过大小后每条日志都会重新打开文件
+class CatalogFileHandler(RotatingFileHandler):
+    def __init__(self, log_dir, catalog, max_bytes):
+        self.log_dir = log_dir
+        self.catalog = catalog
+        filename = self._new_filename()
+        super().__init__(filename, maxBytes=max_bytes, encoding="utf-8")
+        catalog.open_file(self.baseFilename)
+
+    def _new_filename(self):
+        name = datetime.now(LOG_TZ).strftime(LOG_NAME_FORMAT)
+        path = os.path.join(self.log_dir, f"{name}.log")
+        number = 1
+        while os.path.exists(path):
+            path = os.path.join(self.log_dir, f"{name}_{number}.log")
+            number += 1
+        return path
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self.catalog.save()
+        self.baseFilename = os.path.abspath(self._new_filename())
+        self.catalog.open_file(self.baseFilename)
+        self.stream = self._open()
+
+    # 写入前按当前文件大小判断是否切换，不像父类那样为判断大小再格式化一次日志
+    def shouldRollover(self, record):
+        return self.stream is not None and self.stream.tell() >= self.maxBytes
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            elif self.shouldRollover(record):
+                self.doRollover()
+            offset = self.stream.tell()
+            logging.StreamHandler.emit(self, record)
+            self.catalog.record(record.created, offset, self.stream.tell())
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        super().close()
+        self.catalog.save()
+
+
+# 内存日志缓冲区，setup_logger 之前为 None
+def get_log_buffer():
+    return _log_buffer
+
+
+# 日志文件目录索引，setup_logger 之前为 None
+def get_log_catalog():
+    return _log_catalog
+
+
+# 当前写入的日志文件路径
+def get_log_filename():
+    return _file_handler.baseFilename if _file_handler is not None else None
+
+
+# 已丢弃的日志数量
+def get_dropped_log_count():
+    root_logger = logging.getLogger()
+    return sum(
+        handler.dropped
+        for handler in root_logger.handlers
+        if isinstance(handler, DroppingQueueHandler)
+    )
+
+
+# 停止后台线程，写完队列中剩余的日志
+def stop_logger():
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            # 队列满时放不进结束标记，后台线程是守护线程，随进程退出
+            pass
+        _listener = None
 
 
 def setup_logger():
+    global _listener, _log_buffer, _file_handler, _log_catalog
+
     # 清除之前的处理器
+    stop_logger()
     root_logger = logging.getLogger()
     root_logger.handlers = []
 
@@ -31,35 +395,42 @@ def setup_logger():
     if not os.path.exists("logs"):
         os.makedirs("logs")
 
-    # 以当前启动时间为文件名，使用东八区时间
-    tz = timezone(timedelta(hours=8))
-    log_filename = datetime.now(tz).strftime("logs/%Y-%m-%d_%H-%M-%S.log")
-
-    # 添加 RotatingFileHandler 将日志保存到本地文件，并在超过1MB时新建文件
-    file_handler = RotatingFileHandler(
-        log_filename, maxBytes=1024 * 1024, backupCount=0, encoding="utf-8"
+    # 以当前时间为文件名（东八区时间），超过大小后新建以新时间命名的文件，并记录到日志目录索引
+    if _file_handler is not None:
+        _file_handler.close()
+    _log_catalog = LogCatalog(os.path.abspath("logs"), log_index_interval)
+    file_handler = _file_handler = CatalogFileHandler(
+        os.path.abspath("logs"), _log_catalog, log_max_bytes
     )
+    log_filename = file_handler.baseFilename
     file_handler.setFormatter(
         logging.Formatter(
             "%(asctime)s %(levelname)s:%(name)s:%(message)s",  # 添加日期
             datefmt="%Y-%m-%d %H:%M:%S",  # 日期格式
         )
     )
-    file_handler.namer = lambda name: name.replace(
-        ".log", f"_{datetime.now(tz).strftime('%Y-%m-%d_%H-%M-%S')}.log"
-    )
-    file_handler.rotator = lambda source, dest: os.rename(source, dest)
 
     # 设置根日志记录器的级别和处理器
     root_logger.setLevel(logging.DEBUG)  # 显示DEBUG及以上级别的日志
     handler.setLevel(logging.DEBUG)  # 设置StreamHandler的级别
     file_handler.setLevel(logging.DEBUG)  # 设置FileHandler的级别
-    root_logger.addHandler(handler)
-    root_logger.addHandler(file_handler)
 
-    # 确保日志及时刷新
-    for handler in root_logger.handlers:
-        handler.flush()
+    # 内存日志缓冲区，和文件使用相同的格式
+    _log_buffer = RingBufferHandler(log_buffer_size)
+    _log_buffer.setFormatter(file_handler.formatter)
+    _log_buffer.setLevel(logging.DEBUG)
+
+    # 根日志记录器只挂队列处理器，控制台、文件和内存缓冲区由后台线程写入
+    log_queue = queue.Queue(maxsize=log_queue_size)
+    root_logger.addHandler(DroppingQueueHandler(log_queue))
+    _listener = QueueListener(
+        log_queue, handler, file_handler, _log_buffer, respect_handler_level=True
+    )
+    _listener.start()
 
     logging.info("初始化日志器")
     logging.info(f"日志文件名: {log_filename}")
+
+
+# 退出时写完剩余日志
+atexit.register(stop_logger)
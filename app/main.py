@@ -2,30 +2,29 @@
 
 import asyncio
 from bot import connect_to_bot
-from dingtalk import dingtalk
-import logging
-import datetime
 from logger import setup_logger
+from switch_store import switch_store
+from supervisor import supervisor
+from scheduler import scheduler
+from metrics import metrics
+from config import switch_flush_interval, metrics_http_host, metrics_http_port
 
 setup_logger()
 
 
 async def main():
-    while True:
-        try:
-            result = await connect_to_bot()
-            if result is None:
-                raise ValueError("连接返回None")
-        except Exception as e:
-            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            logging.error(f"连接失败，正在重试: {e} 当前时间: {current_time}")
-            if not hasattr(main, "notified"):
-                await dingtalk(
-                    f"机器人断开连接，当前时间:{current_time}", f"错误信息: {e}"
-                )
-                main.notified = True
-
-            await asyncio.sleep(1)  # 每秒重试一次
+    # 定时把群组开关的修改写回文件
+    switch_store.start_flusher(switch_flush_interval)
+
+    # 定时任务随进程运行，不依赖心跳和连接状态
+    scheduler.start()
+
+    # 配置了端口时在本地导出 Prometheus 指标
+    if metrics_http_port:
+        await metrics.start_http_server(metrics_http_host, metrics_http_port)
+
+    # 断线后按指数退避重连
+    await supervisor.run(connect_to_bot)
 
 
 if __name__ == "__main__":
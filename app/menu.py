@@ -37,9 +37,9 @@ Version：{VERSION}"""
 # 群消息处理函数
 async def handle_Menu_group_message(websocket, msg):
     try:
-        group_id = str(msg.get("group_id"))
-        raw_message = msg.get("raw_message")
-        message_id = msg.get("message_id")
+        group_id = msg.group_id
+        raw_message = msg.raw_message
+        message_id = msg.message_id
 
         if raw_message == "menu":
             await menu(websocket, group_id, message_id)
@@ -0,0 +1,239 @@
+# metrics.py
+# 进程内的指标注册表：计数器、耗时直方图和按需读取的仪表
+# 指标可以按标签（如 post_type、处理函数名、API 动作）分开统计
+# 由 metrics 系统命令汇总发到群里，也可以开启本地 HTTP 端口以 Prometheus 文本格式导出
+# 全局单例，按顶层模块名导入（见 dev.md 的“全局单例”一节）
+
+import asyncio
+import bisect
+import logging
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+# 标签值中的反斜杠、双引号和换行需要转义
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_names, values, extra=None):
+    pairs = list(zip(label_names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+# 汇总中显示的标签，多个标签值用 / 连接
+def _label_text(label_values):
+    return "/".join(map(str, label_values)) or "总计"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}  # 标签值元组 -> 计数
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def values(self):
+        return dict(self._values)
+
+    def render(self):
+        for label_values, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class HistogramSeries:
+    __slots__ = ("counts", "count", "sum", "max")
+
+    def __init__(self, bucket_count):
+        self.counts = [0] * (bucket_count + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # 标签值元组 -> HistogramSeries
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = HistogramSeries(len(self.buckets))
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.count += 1
+        series.sum += value
+        if value > series.max:
+            series.max = value
+
+    def series(self):
+        return dict(self._series)
+
+    # 按分桶估算分位数，返回所在桶的上限
+    def quantile(self, series, q):
+        target = series.count * q
+        seen = 0
+        for bound, count in zip(self.buckets, series.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return series.max
+
+    def render(self):
+        for label_values, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, ("le", bound))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values, ("le", "+Inf"))
+            yield f"{self.name}_bucket{labels} {series.count}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {series.sum}"
+            yield f"{self.name}_count{labels} {series.count}"
+
+
+class Gauge:
+    kind = "gauge"
+
+    # func 返回一个数值，或 {标签值: 数值} 字典（只有一个标签时）
+    def __init__(self, name, help_text, func, labels=()):
+        self.name = name
+        self.help = help_text
+        self.func = func
+        self.labels = tuple(labels)
+
+    def value(self):
+        return self.func()
+
+    def render(self):
+        value = self.func()
+        if isinstance(value, dict):
+            for label_value, item in sorted(value.items()):
+                yield f"{self.name}{_format_labels(self.labels, (label_value,))} {float(item)}"
+        elif value is not None:
+            yield f"{self.name} {float(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._server = None
+
+    # 同名指标只创建一次，模块被以两个名字导入或重新加载时不会重复注册
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, *args, **kwargs)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labels, buckets)
+
+    # 仪表在读取时才调用 func 取值，重复注册时以最后一次为准
+    def gauge(self, name, help_text, func, labels=()):
+        metric = self._metrics[name] = Gauge(name, help_text, func, labels)
+        return metric
+
+    def metrics(self):
+        return list(self._metrics.values())
+
+    # Prometheus 文本格式
+    def render_prometheus(self):
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = list(metric.render())
+            except Exception as e:
+                logging.error(f"读取指标 {metric.name} 失败: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    # 适合发到群里的简短汇总，直方图显示次数、平均、P95 和最大耗时
+    def summary(self, limit=10):
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                if isinstance(metric, Gauge):
+                    value = metric.value()
+                    if isinstance(value, dict):
+                        value = ", ".join(f"{k}={v}" for k, v in sorted(value.items()))
+                    lines.append(f"{metric.help}: {value}")
+                elif isinstance(metric, Counter):
+                    top = sorted(metric.values().items(), key=lambda i: -i[1])[:limit]
+                    if top:
+                        text = ", ".join(f"{_label_text(k)}={v}" for k, v in top)
+                        lines.append(f"{metric.help}: {text}")
+                else:
+                    series = metric.series()
+                    if not series:
+                        continue
+                    lines.append(f"{metric.help}:")
+                    for label_values, item in sorted(
+                        series.items(), key=lambda i: -i[1].sum
+                    )[:limit]:
+                        lines.append(
+                            f"  {_label_text(label_values)}: {item.count} 次, 平均 {item.sum / item.count * 1000:.1f}ms, "
+                            f"P95≤{metric.quantile(item, 0.95) * 1000:.0f}ms, 最大 {item.max * 1000:.1f}ms"
+                        )
+            except Exception as e:
+                lines.append(f"{metric.name}: 读取失败 {e}")
+        return "\n".join(lines) or "暂无指标数据"
+
+    # 开启本地 HTTP 端口，GET /metrics 返回 Prometheus 文本格式
+    async def start_http_server(self, host, port):
+        if self._server is not None:
+            return
+        self._server = await asyncio.start_server(self._handle_http, host, port)
+        logging.info(f"指标 HTTP 服务已启动: http://{host}:{port}/metrics")
+
+    async def _handle_http(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            # 读掉请求头
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1] in ("/metrics", "/"):
+                status = "200 OK"
+                body = self.render_prometheus().encode("utf-8")
+            else:
+                status = "404 Not Found"
+                body = b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logging.error(f"处理指标 HTTP 请求失败: {e}")
+        finally:
+            writer.close()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,235 @@
+# outbox.py
+# 发送队列：所有发消息的动作先进入队列，由一个发送任务按令牌桶限速写到 websocket
+# 每个群（私聊按QQ号）一个令牌桶，另外还有一个全局令牌桶，
+# 有待发消息的群之间轮流发送，一个群刷屏不会挤占其他群的额度；
+# root管理员和系统消息进入优先队列，只受全局令牌桶限制
+# 全局单例，按顶层模块名导入（见 dev.md 的“全局单例”一节）
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from config import (
+    outbox_group_rate,
+    outbox_group_burst,
+    outbox_global_rate,
+    outbox_global_burst,
+    outbox_queue_size,
+)
+from metrics import metrics
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate  # 每秒补充的令牌数
+        self.capacity = capacity  # 桶容量，即允许的突发条数
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+    # 距离有可用令牌还要等待的秒数，0 表示现在就可以发送
+    def wait_time(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    # 桶是否已经补满，补满的桶可以删掉，下次用到时重新创建
+    def is_full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class Outbox:
+    def __init__(
+        self, group_rate, group_burst, global_rate, global_burst, queue_size=1000
+    ):
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.queue_size = queue_size  # 普通消息最多排队的条数，优先消息不受限制
+
+        self._global_bucket = TokenBucket(global_rate, global_burst)
+        self._buckets = {}  # 目标 -> 令牌桶
+        self._queues = {}  # 目标 -> 待发送消息
+        self._ready = deque()  # 有待发送消息的目标，按轮转顺序排列
+        self._priority = deque()  # 优先发送的消息
+        self._depth = 0  # 普通消息的排队条数
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+        # 统计数据
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    # 把一条已编码的消息放进队列，立即返回一个 future，发出后结果为 True，未能发出为 False
+    # key 为限速的目标（如 group_123、private_456），priority 为 True 时优先发送
+    def send(self, websocket, frame, key, priority=False):
+        future = asyncio.get_running_loop().create_future()
+        item = (websocket, frame, time.monotonic(), future)
+        if priority:
+            self._priority.append(item)
+        else:
+            if self._depth >= self.queue_size:
+                self.dropped += 1
+                logging.warning(
+                    f"发送队列已满，丢弃发往 {key} 的消息，累计丢弃 {self.dropped} 条"
+                )
+                future.set_result(False)
+                return future
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = deque()
+                self._ready.append(key)
+            queue.append(item)
+            self._depth += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="outbox-sender")
+        self._wakeup.set()
+        return future
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.group_rate, self.group_burst)
+        return bucket
+
+    # 取出下一条可以发送的消息，没有可发送的消息时返回 (None, 需要等待的秒数)
+    def _next(self, now):
+        global_wait = self._global_bucket.wait_time(now)
+        if global_wait:
+            return None, global_wait
+        if self._priority:
+            return self._priority.popleft(), 0
+
+        wait = None
+        # 从上次发送的下一个目标开始轮转，找到第一个有令牌的目标
+        for _ in range(len(self._ready)):
+            key = self._ready[0]
+            self._ready.rotate(-1)
+            bucket_wait = self._bucket(key).wait_time(now)
+            if bucket_wait:
+                wait = bucket_wait if wait is None else min(wait, bucket_wait)
+                continue
+            self._buckets[key].consume()
+            queue = self._queues[key]
+            item = queue.popleft()
+            self._depth -= 1
+            if not queue:
+                del self._queues[key]
+                self._ready.remove(key)
+            return item, 0
+        return None, wait
+
+    async def _run(self):
+        while True:
+            item, wait = self._next(time.monotonic())
+            if item is None:
+                # 等令牌补充，期间有新消息（尤其是优先消息）到达时提前醒来
+                self._wakeup.clear()
+                if wait is None:
+                    self._prune()
+                    await self._wakeup.wait()
+                else:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+
+            websocket, frame, enqueued_at, future = item
+            self._global_bucket.consume()
+            waited = time.monotonic() - enqueued_at
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            try:
+                await websocket.send(frame)
+                self.sent += 1
+                if not future.done():
+                    future.set_result(True)
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"[API]发送消息失败: {e}")
+                if not future.done():
+                    future.set_result(False)
+
+    # 队列空闲时删掉已经补满的令牌桶，避免群多时令牌桶无限增长
+    def _prune(self):
+        now = time.monotonic()
+        for key in [
+            key for key, bucket in self._buckets.items() if bucket.is_full(now)
+        ]:
+            if key not in self._queues:
+                del self._buckets[key]
+
+    # 连接断开后丢弃还没发出的消息
+    def discard(self, websocket):
+        removed = 0
+        kept = deque()
+        for item in self._priority:
+            if item[0] is websocket:
+                item[3].set_result(False)
+                removed += 1
+            else:
+                kept.append(item)
+        self._priority = kept
+        for key in list(self._queues):
+            queue = self._queues[key]
+            kept = deque()
+            for item in queue:
+                if item[0] is websocket:
+                    item[3].set_result(False)
+                    removed += 1
+                    self._depth -= 1
+                else:
+                    kept.append(item)
+            if kept:
+                self._queues[key] = kept
+            else:
+                del self._queues[key]
+                self._ready.remove(key)
+        if removed:
+            self.dropped += removed
+            logging.warning(f"连接断开，丢弃 {removed} 条未发出的消息")
+
+    # 当前排队的消息条数（含优先消息）
+    def queue_depth(self):
+        return self._depth + len(self._priority)
+
+    # 统计信息
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth(),
+            "priority_depth": len(self._priority),
+            "pending_targets": len(self._queues),
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "avg_wait": self.total_wait / self.sent if self.sent else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+outbox = Outbox(
+    group_rate=outbox_group_rate,
+    group_burst=outbox_group_burst,
+    global_rate=outbox_global_rate,
+    global_burst=outbox_global_burst,
+    queue_size=outbox_queue_size,
+)
+
+metrics.gauge("bot_outbox_queue_depth", "发送队列长度", outbox.queue_depth)
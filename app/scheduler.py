@@ -0,0 +1,310 @@
+# scheduler.py
+# 定时任务调度器：所有任务按下次运行时间放在一个最小堆里，调度循环只睡到最早的任务到期
+# 支持固定间隔、cron 表达式和一次性三种任务，可以加随机抖动
+# 任务在独立的任务中运行，不会阻塞事件分发；上一次还没跑完时默认跳过本次，避免重叠
+# 调度器随进程启动，不依赖心跳，断线期间也照常计时
+# 全局单例，按顶层模块名导入（见 dev.md 的“全局单例”一节）
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+from handler_registry import handler_name
+
+
+# cron 表达式：分 时 日 月 周，支持 *、*/n、a-b、a-b/n 和逗号分隔的列表，周日为 0 或 7
+class CronExpression:
+    FIELDS = (
+        ("minute", 0, 59),
+        ("hour", 0, 23),
+        ("day", 1, 31),
+        ("month", 1, 12),
+        ("weekday", 0, 7),
+    )
+
+    def __init__(self, expression):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron 表达式需要 5 个字段: {expression}")
+        self.expression = expression
+        values = [
+            self._parse_field(part, low, high)
+            for part, (_, low, high) in zip(parts, self.FIELDS)
+        ]
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        self.weekdays = {0 if day == 7 else day for day in weekdays}
+        # 日和周都有限制时，满足其一即可（与标准 cron 一致）
+        self.day_restricted = parts[2] != "*"
+        self.weekday_restricted = parts[4] != "*"
+
+    @staticmethod
+    def _parse_field(field, low, high):
+        values = set()
+        for item in field.split(","):
+            step = 1
+            if "/" in item:
+                item, step_text = item.split("/", 1)
+                step = int(step_text)
+                if step <= 0:
+                    raise ValueError(f"cron 步长必须大于 0: {field}")
+            if item == "*":
+                start, end = low, high
+            elif "-" in item:
+                start_text, end_text = item.split("-", 1)
+                start, end = int(start_text), int(end_text)
+            else:
+                start = int(item)
+                end = high if step != 1 else start
+            if start < low or end > high or start > end:
+                raise ValueError(f"cron 字段超出范围 {low}-{high}: {field}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment):
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    # 计算 after 之后（不含）的下一个触发时间
+    def next_after(self, after):
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                year = moment.year + (moment.month == 12)
+                month = moment.month % 12 + 1
+                moment = moment.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+                continue
+            if moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+                continue
+            return moment
+        raise ValueError(f"cron 表达式没有可触发的时间: {self.expression}")
+
+
+class Job:
+    __slots__ = (
+        "name",
+        "func",
+        "kind",
+        "interval",
+        "cron",
+        "jitter",
+        "allow_overlap",
+        "requires_connection",
+        "pass_websocket",
+        "base_time",
+        "next_run",
+        "cancelled",
+        "running",
+        "runs",
+        "failures",
+        "skipped",
+        "last_run",
+        "last_duration",
+        "total_duration",
+        "max_duration",
+    )
+
+    def __init__(
+        self,
+        name,
+        func,
+        kind,
+        base_time,
+        interval=None,
+        cron=None,
+        jitter=0,
+        allow_overlap=False,
+        requires_connection=True,
+    ):
+        self.name = name
+        self.func = func
+        self.kind = kind  # interval、cron 或 once
+        self.interval = interval
+        self.cron = cron
+        self.jitter = jitter  # 每次运行随机推迟 0 ~ jitter 秒
+        self.allow_overlap = allow_overlap  # 上一次还没跑完时是否照常运行
+        self.requires_connection = requires_connection  # 断线时是否跳过
+        # 任务函数声明了参数时传入当前 websocket
+        self.pass_websocket = bool(inspect.signature(func).parameters)
+        self.base_time = base_time  # 不含抖动的计划运行时间
+        self.next_run = base_time + self._jitter()
+        self.cancelled = False
+        self.running = 0
+
+        # 统计数据
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_run = None
+        self.last_duration = None
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+
+    def _jitter(self):
+        return random.uniform(0, self.jitter) if self.jitter else 0
+
+    # 计算下一次计划运行时间，一次性任务返回 False
+    def advance(self, now):
+        if self.kind == "once":
+            return False
+        if self.kind == "interval":
+            self.base_time += self.interval
+            # 落后太多（例如进程被挂起）时不补跑，直接从现在开始计
+            if self.base_time <= now:
+                self.base_time = now + self.interval
+        else:
+            self.base_time = self.cron.next_after(
+                datetime.fromtimestamp(max(now, self.base_time))
+            ).timestamp()
+        self.next_run = self.base_time + self._jitter()
+        return True
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "next_run": self.next_run,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "avg_duration": self.total_duration / self.runs if self.runs else 0.0,
+            "max_duration": self.max_duration,
+        }
+
+
+class Scheduler:
+    def __init__(self):
+        self._heap = []  # (运行时间, 序号, 任务)
+        self._counter = itertools.count()
+        self._jobs = {}
+        self._wakeup = asyncio.Event()
+        self._loop_task = None
+        self._running = set()
+        self.websocket = None  # 当前连接，断线时为 None
+
+    # 任务名默认与处理函数的命名方式相同（见 handler_name），同名任务会替换旧任务，重新加载模块时不会重复注册
+    def _add(self, func, kind, base_time, name=None, **kwargs):
+        if name is None:
+            name = handler_name(func.__module__, func.__qualname__)
+        self.cancel(name)
+        job = Job(name, func, kind, base_time, **kwargs)
+        self._jobs[name] = job
+        self._push(job)
+        return job
+
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.next_run, next(self._counter), job))
+        self._wakeup.set()
+
+    # 每隔 seconds 秒运行一次，first_delay 为第一次运行前的等待时间，默认等一个间隔
+    def every(self, seconds, func, first_delay=None, **kwargs):
+        if seconds <= 0:
+            raise ValueError("任务间隔必须大于 0")
+        first_delay = seconds if first_delay is None else first_delay
+        return self._add(
+            func, "interval", time.time() + first_delay, interval=seconds, **kwargs
+        )
+
+    # 按 cron 表达式运行，例如 "0 8 * * *" 为每天 8 点
+    def cron(self, expression, func, **kwargs):
+        cron = CronExpression(expression)
+        base_time = cron.next_after(datetime.now()).timestamp()
+        return self._add(func, "cron", base_time, cron=cron, **kwargs)
+
+    # 只运行一次，when 为延迟秒数或 datetime
+    def once(self, when, func, **kwargs):
+        base_time = (
+            when.timestamp() if isinstance(when, datetime) else time.time() + when
+        )
+        return self._add(func, "once", base_time, **kwargs)
+
+    # 取消任务
+    def cancel(self, name):
+        job = self._jobs.pop(name, None)
+        if job is not None:
+            job.cancelled = True  # 堆里的条目在到期时丢弃
+
+    def jobs(self):
+        return list(self._jobs.values())
+
+    # 启动调度循环，随进程运行
+    def start(self):
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._loop(), name="scheduler")
+
+    async def _loop(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, job = heapq.heappop(self._heap)
+                if job.cancelled:
+                    continue
+                self._run(job)
+                if job.advance(now):
+                    heapq.heappush(self._heap, (job.next_run, next(self._counter), job))
+                elif self._jobs.get(job.name) is job:
+                    del self._jobs[job.name]
+
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    # 在独立的任务中运行，不等待结果
+    def _run(self, job):
+        if job.running and not job.allow_overlap:
+            job.skipped += 1
+            logging.warning(f"定时任务 {job.name} 上一次还没有结束，跳过本次运行")
+            return
+        if job.requires_connection and self.websocket is None:
+            job.skipped += 1
+            return
+        task = asyncio.create_task(self._execute(job), name=f"job-{job.name}")
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _execute(self, job):
+        job.running += 1
+        job.last_run = time.time()
+        started = time.perf_counter()
+        try:
+            if job.pass_websocket:
+                await job.func(self.websocket)
+            else:
+                await job.func()
+        except Exception as e:
+            job.failures += 1
+            logging.error(f"定时任务 {job.name} 执行失败: {e}")
+        finally:
+            duration = time.perf_counter() - started
+            job.running -= 1
+            job.runs += 1
+            job.last_duration = duration
+            job.total_duration += duration
+            job.max_duration = max(job.max_duration, duration)
+
+    # 统计信息
+    def stats(self):
+        return {name: job.stats() for name, job in self._jobs.items()}
+
+
+scheduler = Scheduler()
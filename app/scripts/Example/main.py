@@ -61,11 +61,13 @@ async def handle_Example_group_message(websocket, msg):
     # 确保数据目录存在
     os.makedirs(DATA_DIR, exist_ok=True)
     try:
-        user_id = str(msg.get("user_id"))
-        group_id = str(msg.get("group_id"))
-        raw_message = str(msg.get("raw_message"))
-        role = str(msg.get("sender", {}).get("role"))
-        message_id = str(msg.get("message_id"))
+        # msg 为 events.MessageEvent，QQ号等属性已经是字符串，权限判断在第一次访问时计算
+        user_id = msg.user_id
+        group_id = msg.group_id
+        raw_message = msg.raw_message
+        role = msg.role
+        message_id = str(msg.message_id)
+        authorized = msg.is_authorized
 
     except Exception as e:
         logging.error(f"处理Example群消息失败: {e}")
@@ -82,11 +84,10 @@ async def handle_Example_group_notice(websocket, msg):
     # 确保数据目录存在
     os.makedirs(DATA_DIR, exist_ok=True)
     try:
-        user_id = str(msg.get("user_id"))
-        group_id = str(msg.get("group_id"))
-        raw_message = str(msg.get("raw_message"))
-        role = str(msg.get("sender", {}).get("role"))
-        message_id = str(msg.get("message_id"))
+        # msg 为 events.NoticeEvent
+        user_id = msg.user_id
+        group_id = msg.group_id
+        operator_id = msg.operator_id
 
     except Exception as e:
         logging.error(f"处理Example群通知失败: {e}")
@@ -98,11 +99,9 @@ async def handle_Example_group_notice(websocket, msg):
         return
 
 
-# 回应事件处理函数
-async def handle_Example_response_message(websocket, message):
+# 回应事件处理函数，msg 为读循环解析好的字典
+async def handle_Example_response_message(websocket, msg):
     try:
-        msg = json.loads(message)
-
         if msg.get("status") == "ok":
             echo = msg.get("echo")
 
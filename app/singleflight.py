@@ -0,0 +1,42 @@
+# singleflight.py
+# 相同请求合并：同一个键的请求还没返回时，后来的调用方直接等待同一个结果，不再重复发请求
+# 请求在独立的任务中执行，个别调用方被取消不会影响其他等待方
+# 全局单例，按顶层模块名导入（见 dev.md 的“全局单例”一节）
+
+import asyncio
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}  # 键 -> 执行中的任务
+
+        # 统计数据
+        self.calls = 0  # 实际发出的请求数
+        self.shared = 0  # 直接复用在途请求的调用数
+
+    # 执行 factory() 返回的协程；同一个键已有在途请求时等待它的结果
+    async def do(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    # 当前在途的请求数
+    def inflight_count(self):
+        return len(self._inflight)
+
+    # 统计信息
+    def stats(self):
+        return {
+            "inflight": len(self._inflight),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
+
+
+single_flight = SingleFlight()
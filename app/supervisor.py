@@ -0,0 +1,147 @@
+# supervisor.py
+# 连接守护：连接断开或失败后按指数退避加随机抖动重连，退避时间有上限
+# 同时记录连接状态（本次连接时长、重连次数、断线到恢复所用时间），
+# 断线时只告警一次，连接恢复后发送恢复通知并重置告警状态
+# 全局单例，按顶层模块名导入（见 dev.md 的“全局单例”一节）
+
+import asyncio
+import datetime
+import logging
+import random
+import time
+
+from config import (
+    reconnect_base_delay,
+    reconnect_max_delay,
+    reconnect_multiplier,
+    reconnect_jitter,
+    reconnect_stable_time,
+)
+from dingtalk import dingtalk
+from metrics import metrics
+
+# 断线后重新连上的次数，只增不减，以计数器导出
+RECONNECTS = metrics.counter("bot_reconnects_total", "累计重连次数")
+
+
+class ConnectionSupervisor:
+    def __init__(
+        self, base_delay=1, max_delay=60, multiplier=2, jitter=0.5, stable_time=30
+    ):
+        self.base_delay = base_delay  # 第一次重试前等待的秒数
+        self.max_delay = max_delay  # 退避时间上限（秒）
+        self.multiplier = multiplier  # 每次失败后等待时间的倍数
+        self.jitter = jitter  # 随机抖动比例，0.5 表示在 [50%, 100%] 之间随机
+        self.stable_time = stable_time  # 连接保持超过该秒数后断开，才重新从头退避
+
+        self.connected = False
+        self.connected_at = None  # 本次连接建立的时间（monotonic）
+        self.disconnected_at = None  # 本次断线的时间（monotonic）
+        self.attempts = 0  # 连续失败次数
+        self.connect_count = 0  # 成功建立连接的次数
+        self.reconnect_count = 0  # 断线后重新连上的次数
+        self.last_reconnect_time = None  # 最近一次从断线到恢复所用的秒数
+        self.alerted = False  # 本次断线是否已经告警
+
+    # 第 attempts 次失败后应等待的秒数
+    def next_delay(self):
+        delay = min(
+            self.max_delay,
+            self.base_delay * self.multiplier ** max(0, self.attempts - 1),
+        )
+        return delay * random.uniform(1 - self.jitter, 1)
+
+    # 连接建立后由 connect_to_bot 回调
+    async def on_connected(self):
+        now = time.monotonic()
+        self.connected = True
+        self.connected_at = now
+        self.connect_count += 1
+        if self.disconnected_at is None:
+            return
+
+        self.reconnect_count += 1
+        RECONNECTS.inc()
+        self.last_reconnect_time = now - self.disconnected_at
+        self.disconnected_at = None
+        logging.info(
+            f"连接已恢复，断线 {self.last_reconnect_time:.1f} 秒，累计重连 {self.reconnect_count} 次"
+        )
+        if self.alerted:
+            self.alerted = False
+            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            await dingtalk(
+                f"机器人已恢复连接，当前时间:{current_time}",
+                f"断线时长: {self.last_reconnect_time:.1f} 秒",
+                key="reconnected",
+            )
+
+    # 连接断开或连接失败
+    # 握手成功后马上又断开的连接不算恢复，退避时间继续增长，避免不停地重连
+    async def on_disconnected(self, error):
+        now = time.monotonic()
+        if self.connected:
+            lasted = now - self.connected_at
+            logging.warning(f"连接已断开，本次连接持续 {lasted:.1f} 秒")
+            if lasted >= self.stable_time:
+                self.attempts = 0
+        self.connected = False
+        self.connected_at = None
+        if self.disconnected_at is None:
+            self.disconnected_at = now
+        self.attempts += 1
+
+        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if not self.alerted:
+            self.alerted = True
+            await dingtalk(
+                f"机器人断开连接，当前时间:{current_time}",
+                f"错误信息: {error}",
+                key="disconnected",
+            )
+        return current_time
+
+    # 持续保持连接，connect 为 connect_to_bot，连接断开后返回或抛出异常
+    async def run(self, connect):
+        while True:
+            try:
+                result = await connect(on_connected=self.on_connected)
+                if result is None:
+                    raise ValueError("连接返回None")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                current_time = await self.on_disconnected(e)
+                delay = self.next_delay()
+                logging.error(
+                    f"连接失败，{delay:.1f} 秒后进行第 {self.attempts} 次重试: {e} 当前时间: {current_time}"
+                )
+                await asyncio.sleep(delay)
+
+    # 当前连接时长（秒），未连接时为 0
+    def uptime(self):
+        if not self.connected:
+            return 0
+        return time.monotonic() - self.connected_at
+
+    # 统计信息
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "uptime": self.uptime(),
+            "connect_count": self.connect_count,
+            "reconnect_count": self.reconnect_count,
+            "last_reconnect_time": self.last_reconnect_time,
+            "failed_attempts": self.attempts,
+        }
+
+
+supervisor = ConnectionSupervisor(
+    base_delay=reconnect_base_delay,
+    max_delay=reconnect_max_delay,
+    multiplier=reconnect_multiplier,
+    jitter=reconnect_jitter,
+    stable_time=reconnect_stable_time,
+)
+
+metrics.gauge("bot_connected", "是否已连接", lambda: int(supervisor.connected))
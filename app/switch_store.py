@@ -0,0 +1,250 @@
+# switch_store.py
+# 群组开关存储：所有群的开关保存在一个 WAL 模式的 SQLite 数据库里，主键为 (group_id, switch_name)
+# 每个群的开关只在第一次用到时查询一次，之后都从内存读
+# 修改只记录到脏集合，由定时任务和退出时在一个事务里批量写回
+# 开关的值以 JSON 文本保存，save_switch 存入什么类型，load_switch 就取回什么类型
+# 第一次启动时会把旧版 data/GroupSwitch/<group_id>.json 文件一次性导入数据库
+# 全局单例，按顶层模块名导入（见 dev.md 的“全局单例”一节）
+
+import asyncio
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+import codec
+
+# 旧版每个群一个 JSON 文件的目录，只用于一次性导入
+SWITCH_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "app",
+    "data",
+    "GroupSwitch",
+)
+
+# 开关数据库目录
+SWITCH_DB_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "data",
+    "Switch",
+)
+
+# 语句保持为常量字符串，sqlite3 会缓存编译好的语句，重复执行时不用重新解析
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS switches (
+        group_id TEXT NOT NULL,
+        switch_name TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (group_id, switch_name)
+    ) WITHOUT ROWID
+"""
+CREATE_META_SQL = """
+    CREATE TABLE IF NOT EXISTS switch_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+"""
+SELECT_GROUP_SQL = "SELECT switch_name, value FROM switches WHERE group_id = ?"
+SELECT_ALL_SQL = "SELECT group_id, switch_name, value FROM switches"
+UPSERT_SQL = (
+    "INSERT OR REPLACE INTO switches (group_id, switch_name, value) VALUES (?, ?, ?)"
+)
+
+
+# 数据库中保存的 JSON 文本 -> 开关的值，无法解析时按关闭处理
+def _decode_value(text):
+    try:
+        return codec.loads(text)
+    except codec.DecodeError:
+        logging.error(f"无法解析开关的值: {text!r}")
+        return False
+
+
+class SwitchStore:
+    def __init__(self, db_path, legacy_dir):
+        self.db_path = db_path
+        self.legacy_dir = legacy_dir
+        self._conn = None
+        self._lock = threading.Lock()  # 定时写回在线程中执行，连接需要加锁
+        self._groups = {}  # group_id -> {开关名: 状态}，None 表示该群没有开关
+        self._dirty = set()  # 待写回的 (group_id, 开关名)
+        self._scanned = False  # 是否已经把所有群加载进内存
+        self._flusher = None
+
+    # 打开数据库，第一次打开时建表、迁移旧表并导入旧版 JSON 文件
+    def connect(self):
+        if self._conn is not None:
+            return self._conn
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            self._migrate_legacy_table(conn)
+            conn.execute(CREATE_TABLE_SQL)
+            conn.execute(CREATE_META_SQL)
+        self._import_json_files(conn)
+        self._conn = conn
+        return conn
+
+    # 旧表以 0/1 整数保存开关（旧版 api.init_switch_database 建的表还把 group_id 设为 UNIQUE），
+    # 重建为以 JSON 文本保存的新表，原来的 0/1 转成 false/true
+    def _migrate_legacy_table(self, conn):
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(switches)")]
+        if not columns or "value" in columns:
+            return
+        logging.info("重建旧版开关表 switches")
+        conn.execute("ALTER TABLE switches RENAME TO switches_legacy")
+        conn.execute(CREATE_TABLE_SQL)
+        conn.execute(
+            "INSERT OR REPLACE INTO switches (group_id, switch_name, value) "
+            "SELECT group_id, switch_name, "
+            "CASE WHEN status THEN 'true' ELSE 'false' END FROM switches_legacy"
+        )
+        conn.execute("DROP TABLE switches_legacy")
+
+    # 一次性导入旧版每个群一个 JSON 文件的开关数据，导入后在 switch_meta 中记录，不会重复导入
+    def _import_json_files(self, conn):
+        if conn.execute(
+            "SELECT 1 FROM switch_meta WHERE key = 'json_imported'"
+        ).fetchone():
+            return
+        rows = []
+        if os.path.isdir(self.legacy_dir):
+            for filename in os.listdir(self.legacy_dir):
+                if not filename.endswith(".json"):
+                    continue
+                group_id = filename[:-5]  # 移除 '.json' 后缀
+                try:
+                    with open(
+                        os.path.join(self.legacy_dir, filename), "r", encoding="utf-8"
+                    ) as f:
+                        switches = json.load(f)
+                except Exception as e:
+                    logging.error(f"导入开关 {filename} 时发生错误: {e}")
+                    continue
+                if not isinstance(switches, dict):
+                    logging.error(f"开关文件 {filename} 的内容不是对象，已跳过")
+                    continue
+                for key, value in switches.items():
+                    rows.append((group_id, key, codec.dumps_text(value)))
+        with conn:
+            conn.executemany(UPSERT_SQL, rows)
+            conn.execute(
+                "INSERT OR REPLACE INTO switch_meta (key, value) VALUES ('json_imported', '1')"
+            )
+        if rows:
+            logging.info(f"已从 {self.legacy_dir} 导入 {len(rows)} 条群组开关")
+
+    # 读取某个群的开关，只在第一次访问时查询数据库
+    def _load(self, group_id):
+        try:
+            return self._groups[group_id]
+        except KeyError:
+            pass
+        conn = self.connect()
+        with self._lock:
+            rows = conn.execute(SELECT_GROUP_SQL, (group_id,)).fetchall()
+        switches = {name: _decode_value(value) for name, value in rows} or None
+        self._groups[group_id] = switches
+        return switches
+
+    # 查询单个开关
+    def get(self, group_id, key, default=False):
+        switches = self._load(str(group_id))
+        if not switches:
+            return default
+        return switches.get(key, default)
+
+    # 查询某个群的全部开关，没有开关时返回 None
+    def get_group(self, group_id):
+        switches = self._load(str(group_id))
+        return dict(switches) if switches is not None else None
+
+    # 修改开关，只改内存并标记为待写回；数据库中以 JSON 文本保存
+    def set(self, group_id, key, value):
+        group_id = str(group_id)
+        switches = self._load(group_id)
+        if switches is None:
+            switches = self._groups[group_id] = {}
+        codec.dumps_text(value)  # 无法保存为 JSON 的值在这里就报错，不留到写回时
+        switches[key] = value
+        self._dirty.add((group_id, key))
+
+    # 所有群的开关状态，第一次调用时一次性查询全表
+    def all_groups(self):
+        if not self._scanned:
+            conn = self.connect()
+            with self._lock:
+                rows = conn.execute(SELECT_ALL_SQL).fetchall()
+            loaded = {}
+            for group_id, name, value in rows:
+                loaded.setdefault(group_id, {})[name] = _decode_value(value)
+            # 已经在内存里的群以内存为准，里面可能有还没写回的修改
+            for group_id, switches in loaded.items():
+                if self._groups.get(group_id) is None:
+                    self._groups[group_id] = switches
+            self._scanned = True
+        return {
+            group_id: dict(switches)
+            for group_id, switches in self._groups.items()
+            if switches is not None
+        }
+
+    # 取出待写回的数据快照并清空脏集合
+    def _take_dirty(self):
+        rows = [
+            (group_id, key, codec.dumps_text(self._groups[group_id][key]))
+            for group_id, key in self._dirty
+        ]
+        self._dirty.clear()
+        return rows
+
+    # 在一个事务中批量写入
+    def _write(self, rows):
+        conn = self.connect()
+        try:
+            with self._lock, conn:
+                conn.executemany(UPSERT_SQL, rows)
+        except Exception as e:
+            logging.error(f"写入群组开关失败: {e}")
+            # 写入失败的开关重新标记，下次再试
+            self._dirty.update((group_id, key) for group_id, key, _ in rows)
+
+    # 同步写回所有修改，退出时调用
+    def flush(self):
+        if self._dirty:
+            self._write(self._take_dirty())
+
+    # 在线程中写回，避免磁盘 I/O 阻塞事件循环
+    async def flush_async(self):
+        if self._dirty:
+            await asyncio.to_thread(self._write, self._take_dirty())
+
+    # 启动定时写回任务
+    def start_flusher(self, interval):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop(interval))
+
+    async def _flush_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush_async()
+            except Exception as e:
+                logging.error(f"定时写回群组开关失败: {e}")
+
+    # 写回并关闭数据库
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+switch_store = SwitchStore(os.path.join(SWITCH_DB_PATH, "switch.db"), SWITCH_DATA_DIR)
+
+# 进程退出时写回尚未保存的修改
+atexit.register(switch_store.close)
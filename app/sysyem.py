@@ -3,15 +3,34 @@
 import logging
 import os
 import sys
+import time
 from datetime import datetime
-import re
-from collections import deque
+from itertools import islice
 import asyncio
 
 # 添加项目根目录到sys.path
 sys.path.append((os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from app.api import *
+from command import CommandMatcher
+from logger import get_log_buffer, get_log_catalog, get_log_filename
+from loader import script_loader
+from metrics import metrics
+
+# 系统命令及其参数格式，数字为要查看的日志条数
+SYSTEM_COMMANDS = {
+    "logs": r"(\d+)?",
+    "errorlog": r"(\d+)?",
+    "debuglog": r"(\d+)?",
+    "importprofile": "",  # 查看功能模块和延迟导入依赖的导入耗时
+    "metrics": "",  # 查看事件、处理函数、API 的耗时和队列长度
+    # 例如 errorrange 2024-01-01 12:00~2024-01-01 13:30
+    "errorrange": r"\s*(\d{4}-\d{2}-\d{2} \d{2}:\d{2}(?::\d{2})?)\s*~\s*(\d{4}-\d{2}-\d{2} \d{2}:\d{2}(?::\d{2})?)",
+}
+
+# 直接调用 handle_System_group_message 且没有传入匹配结果时使用
+system_command_matcher = CommandMatcher()
+system_command_matcher.update(SYSTEM_COMMANDS)
 
 # 该机器人系统的日志目录
 LOG_DIR = os.path.join((os.path.dirname(os.path.abspath(__file__))), "logs")
@@ -23,47 +42,132 @@ if not os.path.exists(LOG_DIR):
 
 def get_latest_log_file(log_dir):
     """获取日志目录内最新的日志文件"""
-    try:
-        return max(
-            [
-                os.path.join(log_dir, f)
-                for f in os.listdir(log_dir)
-                if f.endswith(".log")
-            ],
-            key=lambda x: datetime.strptime(
-                os.path.basename(x), "%Y-%m-%d_%H-%M-%S.log"
-            ),
-        )
-    except ValueError:
+    # 日志目录索引由写日志的处理器维护，不用每次列目录和解析文件名
+    log_catalog = get_log_catalog()
+    if log_catalog is not None:
+        latest_log_file = log_catalog.latest_file()
+        if latest_log_file is not None:
+            return latest_log_file
+    log_files = get_log_files(log_dir)
+    if not log_files:
         logging.error("日志目录中没有找到日志文件")
         return None
+    return log_files[0]
+
+
+# 从文件末尾开始按块向前读取，逐行倒序产出（最新的行在前）
+# 每块只切分一次，跨块的半行留到下一块拼接，整体耗时与读取的字节数成正比
+def iter_lines_reversed(file_path, block_size=64 * 1024):
+    """倒序逐行读取文件，不含空行"""
+    with open(file_path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            file.seek(position)
+            lines = (file.read(read_size) + remainder).split(b"\n")
+            # 第一段可能是不完整的行，留到读取前一块时再处理
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                line = line.rstrip(b"\r")
+                if line:
+                    yield line
+        remainder = remainder.rstrip(b"\r")
+        if remainder:
+            yield remainder
+
+
+# 日志目录中的日志文件，从新到旧排列
+def get_log_files(log_dir):
+    """获取日志目录内所有日志文件，最新的在前"""
+    log_catalog = get_log_catalog()
+    if log_catalog is not None:
+        return log_catalog.files()
+    try:
+        files = [
+            os.path.join(log_dir, f) for f in os.listdir(log_dir) if f.endswith(".log")
+        ]
+    except FileNotFoundError:
+        return []
+    return sorted(files, key=os.path.getmtime, reverse=True)
+
+
+# 倒序读取多个日志文件，当前文件读完后继续读更早的文件
+# levelname 和 logger_name 在扫描时直接过滤，不符合的行不会解码
+def iter_log_lines_reversed(log_files, levelname=None, logger_name=None):
+    """倒序逐行读取日志，产出 (级别名, 日志行)"""
+    prefix = None
+    if levelname is not None:
+        prefix = f"{levelname}:{logger_name}:" if logger_name else f"{levelname}:"
+        prefix = prefix.encode("utf-8")
+    for log_file in log_files:
+        try:
+            for line in iter_lines_reversed(log_file):
+                # 日志行格式为 "日期 时间 级别:名称:内容"，日期时间固定占 20 个字节
+                if prefix is not None and not line.startswith(prefix, 20):
+                    continue
+                line = line.decode("utf-8", errors="replace")
+                line_level, line_name = parse_log_line(line)
+                if logger_name is not None and line_name != logger_name:
+                    continue
+                yield line_level, line
+        except OSError as e:
+            logging.error(f"读取文件失败: {e}")
+
+
+# 判断是否是带时间的日志行，异常堆栈等续行不带时间
+def is_log_record_line(line):
+    return len(line) > 20 and line[4:5] == b"-" and line[19:20] == b" "
+
+
+# 按时间顺序读取 [start_time, end_time] 时间段内的日志，时间为时间戳
+# 只打开与时间段有交集的文件，并从日志目录索引中的字节偏移处开始读
+def iter_log_lines_between(start_time, end_time, levelname=None):
+    """按时间顺序读取时间段内的日志，产出日志行"""
+    log_catalog = get_log_catalog()
+    if log_catalog is not None:
+        log_files = log_catalog.files_between(start_time, end_time)
+    else:
+        log_files = [(f, 0) for f in reversed(get_log_files(LOG_DIR))]
+
+    # 日志行开头的时间格式固定，直接按字符串比较，不用逐行解析时间
+    start = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start_time)).encode()
+    end = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(end_time)).encode()
+    prefix = f"{levelname}:".encode() if levelname else None
+
+    for log_file, offset in log_files:
+        try:
+            with open(log_file, "rb") as file:
+                file.seek(offset)
+                included = False
+                for line in file:
+                    line = line.rstrip(b"\r\n")
+                    if not is_log_record_line(line):
+                        # 续行跟随它所属的日志
+                        if included:
+                            yield line.decode("utf-8", errors="replace")
+                        continue
+                    timestamp = line[:19]
+                    if timestamp > end:
+                        break
+                    included = timestamp >= start and (
+                        prefix is None or line.startswith(prefix, 20)
+                    )
+                    if included:
+                        yield line.decode("utf-8", errors="replace")
+        except OSError as e:
+            logging.error(f"读取文件失败: {e}")
 
 
 # 获取指定文件的最后的指定行内容
 def get_last_n_lines(file_path, n):
     """从文件中获取最后n行"""
     try:
-        with open(file_path, "rb") as file:
-            # 使用seek从文件末尾开始读取
-            file.seek(0, os.SEEK_END)
-            file_size = file.tell()
-            buffer_size = 1024
-            buffer = deque()
-            lines = []
-
-            while file_size > 0 and len(lines) <= n:
-                # 计算要读取的字节数
-                read_size = min(buffer_size, file_size)
-                file_size -= read_size
-                file.seek(file_size)
-                data = file.read(read_size)
-                buffer.appendleft(data)  # 直接添加数据
-
-                # 将缓冲区转换为字节串并分割行
-                lines = b"".join(buffer).splitlines()
-
-            # 返回最后n行
-            return lines[-n:]
+        lines = list(islice(iter_lines_reversed(file_path), n))
+        lines.reverse()
+        return lines
     except Exception as e:
         logging.error(f"读取文件失败: {e}")
         return []
@@ -87,82 +191,129 @@ def filter_debug_logs(log_content):
         return log_content  # 返回原始内容以防止数据丢失
 
 
-# 群消息处理函数
-async def handle_System_group_message(websocket, msg):
+# 解析日志行的级别和日志记录器名，格式为 "日期 时间 级别:名称:内容"
+def parse_log_line(line):
+    parts = line.split(" ", 2)
+    if len(parts) < 3:
+        return None, None
+    fields = parts[2].split(":", 2)
+    if len(fields) < 3:
+        return None, None
+    return fields[0], fields[1]
+
+
+# 获取最近的日志，返回 [(级别名, 日志行)]，最新的在最后
+# 优先从内存缓冲区读取，缓冲区不可用或请求条数超过缓冲区容量时才读日志文件
+def get_recent_logs(num_lines, levelname=None, logger_name=None):
+    log_buffer = get_log_buffer()
+    if log_buffer is not None and num_lines <= log_buffer.capacity:
+        return log_buffer.recent(num_lines, levelname, logger_name)
+
+    # 边扫描边过滤，当前文件不够时继续读更早的日志文件
+    entries = list(
+        islice(
+            iter_log_lines_reversed(get_log_files(LOG_DIR), levelname, logger_name),
+            num_lines,
+        )
+    )
+    entries.reverse()
+    return entries
+
+
+# 群消息处理函数，command 为注册表传入的命令匹配结果
+async def handle_System_group_message(websocket, msg, command=None):
 
     try:
-        user_id = str(msg.get("user_id"))
-        group_id = str(msg.get("group_id"))
-        raw_message = str(msg.get("raw_message"))
-        role = str(msg.get("sender", {}).get("role"))
-        message_id = str(msg.get("message_id"))
-        latest_log_file = get_latest_log_file(LOG_DIR)
-
-        if user_id not in owner_id:
+        group_id = msg.group_id
+        raw_message = msg.raw_message
+
+        if not msg.is_owner:
             return
 
-        match_logs = re.search(r"logs(\d+)?", raw_message)
-        match_errorlog = re.search(r"errorlog(\d+)?", raw_message)
-        match_debuglog = re.search(r"debuglog(\d+)?", raw_message)
-
-        if match_logs:
-            num_lines = int(match_logs.group(1) or 50)  # 默认50条
-            last_n_lines = get_last_n_lines(latest_log_file, num_lines)
-            last_n_lines_str = "\n".join(line.decode("utf-8") for line in last_n_lines)
-            last_n_lines_filter_debug_logs = filter_debug_logs(last_n_lines_str)
-            latest_log_file = latest_log_file or "未知日志文件"
-            last_n_lines_filter_debug_logs = (
-                last_n_lines_filter_debug_logs or "无日志内容"
+        if command is None:
+            command = system_command_matcher.match(raw_message)
+            if command is None:
+                return
+
+        if command.name == "errorrange":
+            start_time, end_time = (
+                datetime.strptime(
+                    arg,
+                    "%Y-%m-%d %H:%M:%S" if arg.count(":") == 2 else "%Y-%m-%d %H:%M",
+                ).timestamp()
+                for arg in command.args
             )
-            message = (
-                "日志文件: " + latest_log_file + "\n\n" + last_n_lines_filter_debug_logs
+            error_lines = list(iter_log_lines_between(start_time, end_time, "ERROR"))
+            if error_lines:
+                # 只发送最近的50条，避免消息过长
+                error_message = (
+                    f"{command.args[0]} ~ {command.args[1]} 共 {len(error_lines)} 条错误日志:\n"
+                    + "\n".join(error_lines[-50:])
+                )
+                await send_group_msg(websocket, group_id, error_message, priority=True)
+            else:
+                await send_group_msg(
+                    websocket, group_id, "该时间段内没有找到错误日志", priority=True
+                )
+            return
+
+        if command.name == "importprofile":
+            await send_group_msg(
+                websocket, group_id, script_loader.import_report(), priority=True
             )
-            await send_group_msg(websocket, group_id, message)
+            return
 
-            error_lines = [
-                line for line in last_n_lines_str.splitlines() if "ERROR" in line
-            ]
+        if command.name == "metrics":
+            await send_group_msg(websocket, group_id, metrics.summary(), priority=True)
+            return
+
+        num_lines = int(command.args[0] or 50)  # 默认50条
+
+        if command.name == "logs":
+            entries = get_recent_logs(num_lines)
+            log_file = get_log_filename() or get_latest_log_file(LOG_DIR)
+            log_file = log_file or "未知日志文件"
+            log_content = (
+                "\n".join(line for level, line in entries if level != "DEBUG")
+                or "无日志内容"
+            )
+            message = "日志文件: " + log_file + "\n\n" + log_content
+            await send_group_msg(websocket, group_id, message, priority=True)
+
+            error_lines = [line for level, line in entries if level == "ERROR"]
             if error_lines:
                 error_message = "错误日志:\n" + "\n".join(error_lines)
-                await send_group_msg(websocket, group_id, error_message)
+                await send_group_msg(websocket, group_id, error_message, priority=True)
             return
 
-        if match_errorlog:
-            num_lines = int(match_errorlog.group(1) or 50)  # 默认50条
-            all_lines = get_last_n_lines(latest_log_file, 1000)  # 假设读取足够多的行
-            all_lines_str = "\n".join(line.decode("utf-8") for line in all_lines)
-            error_lines = [
-                line for line in all_lines_str.splitlines() if "ERROR" in line
-            ]
-
+        if command.name == "errorlog":
             # 取最近的指定数量的错误日志
-            recent_error_lines = error_lines[-num_lines:]
+            recent_error_lines = [
+                line for _, line in get_recent_logs(num_lines, "ERROR")
+            ]
 
             if recent_error_lines:
                 error_message = "错误日志:\n" + "\n".join(recent_error_lines)
-                await send_group_msg(websocket, group_id, error_message)
+                await send_group_msg(websocket, group_id, error_message, priority=True)
             else:
-                await send_group_msg(websocket, group_id, "没有找到错误日志")
+                await send_group_msg(
+                    websocket, group_id, "没有找到错误日志", priority=True
+                )
             return
 
-        if match_debuglog:
-            num_lines = int(match_debuglog.group(1) or 50)  # 默认50条
-            all_lines = get_last_n_lines(latest_log_file, 1000)  # 假设读取足够多的行
-            all_lines_str = "\n".join(line.decode("utf-8") for line in all_lines)
-            debug_lines = [
-                line
-                for line in all_lines_str.splitlines()
-                if "DEBUG" in line and "DEBUG:root:" in line
+        if command.name == "debuglog":
+            # 取最近的指定数量的调试日志，只看根日志记录器，不看第三方库的调试日志
+            recent_debug_lines = [
+                line for _, line in get_recent_logs(num_lines, "DEBUG", "root")
             ]
 
-            # 取最近的指定数量的错误日志
-            recent_debug_lines = debug_lines[-num_lines:]
-
             if recent_debug_lines:
                 debug_message = "调试日志:\n" + "\n".join(recent_debug_lines)
-                await send_group_msg(websocket, group_id, debug_message)
+                await send_group_msg(websocket, group_id, debug_message, priority=True)
             else:
-                await send_group_msg(websocket, group_id, "没有找到调试日志")
+                await send_group_msg(
+                    websocket, group_id, "没有找到调试日志", priority=True
+                )
             return
 
     except Exception as e:
@@ -171,5 +322,6 @@ async def handle_System_group_message(websocket, msg):
             websocket,
             group_id,
             "处理System群消息失败，错误信息：" + str(e),
+            priority=True,
         )
         return
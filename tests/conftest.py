@@ -0,0 +1,12 @@
+# 测试时的导入路径
+# 机器人从 app 目录启动，模块之间按顶层模块名互相导入，测试也要能这样导入
+
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT_DIR, "app")
+
+for path in (APP_DIR, ROOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
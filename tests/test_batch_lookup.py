@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import api
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    state = {"lists": {}, "delays": {}, "queried": [], "running": 0, "peak": 0}
+
+    async def get_group_member_list(websocket, group_id):
+        return state["lists"].get(str(group_id), [])
+
+    async def get_group_member_info(websocket, group_id, user_id):
+        state["queried"].append((group_id, user_id))
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        try:
+            await asyncio.sleep(state["delays"].get(user_id, 0.01))
+        finally:
+            state["running"] -= 1
+        return {"status": "ok", "retcode": 0, "data": {"user_id": user_id}}
+
+    monkeypatch.setattr(api, "get_group_member_list", get_group_member_list)
+    monkeypatch.setattr(api, "get_group_member_info", get_group_member_info)
+    return state
+
+
+def collect(pairs, **options):
+    async def main():
+        return [
+            item async for item in api.iter_group_member_info(None, pairs, **options)
+        ]
+
+    return asyncio.run(main())
+
+
+def test_members_in_member_list_are_not_queried(lookups):
+    lookups["lists"]["1"] = [{"user_id": 10, "card": "列表里的"}]
+    results = collect([(1, 10), (1, 20)])
+
+    assert results[0] == (
+        1,
+        10,
+        {"status": "ok", "retcode": 0, "data": {"user_id": 10, "card": "列表里的"}},
+    )
+    assert results[1][:2] == (1, 20)
+    assert lookups["queried"] == [(1, 20)]
+
+
+def test_results_come_back_in_completion_order(lookups):
+    lookups["delays"] = {1: 0.05, 2: 0.01, 3: 0.03}
+    results = collect([(1, 1), (1, 2), (1, 3)], use_member_list=False)
+    assert [user_id for _, user_id, _ in results] == [2, 3, 1]
+
+
+def test_concurrency_is_limited(lookups):
+    results = collect([(1, i) for i in range(10)], concurrency=3, use_member_list=False)
+    assert len(results) == 10
+    assert lookups["peak"] == 3
+
+
+def test_timed_out_lookup_yields_empty_info(lookups):
+    lookups["delays"] = {1: 1}
+    results = collect([(1, 1), (1, 2)], timeout=0.05, use_member_list=False)
+    assert results == [
+        (1, 2, {"status": "ok", "retcode": 0, "data": {"user_id": 2}}),
+        (1, 1, {}),
+    ]
+
+
+def test_leaving_early_cancels_pending_lookups(lookups):
+    lookups["delays"] = {1: 0.01, 2: 1, 3: 1}
+
+    async def main():
+        lookup = api.iter_group_member_info(None, [(1, 1), (1, 2), (1, 3)])
+        async for _, user_id, _ in lookup:
+            break
+        await lookup.aclose()
+        await asyncio.sleep(0.05)
+        # 还在等待的查询已经被取消，不用等到它们超时或事件循环结束
+        return user_id, lookups["running"]
+
+    assert asyncio.run(main()) == (1, 0)
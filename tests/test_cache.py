@@ -0,0 +1,79 @@
+import cache
+from cache import ApiCache, TTLCache
+
+
+def test_get_set_and_stats():
+    ttl_cache = TTLCache(max_size=10, ttl=60)
+    assert ttl_cache.get("a") is None
+    ttl_cache.set("a", 1)
+    assert ttl_cache.get("a") == 1
+    stats = ttl_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_evicts_least_recently_used():
+    ttl_cache = TTLCache(max_size=2, ttl=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")
+    ttl_cache.set("c", 3)
+    assert ttl_cache.get("b") is None
+    assert ttl_cache.get("a") == 1
+    assert ttl_cache.get("c") == 3
+    assert ttl_cache.stats()["evictions"] == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    ttl_cache = TTLCache(max_size=10, ttl=5)
+    ttl_cache.set("a", 1)
+    now[0] += 4.9
+    assert ttl_cache.get("a") == 1
+    now[0] += 0.2
+    assert ttl_cache.get("a", "gone") == "gone"
+    assert len(ttl_cache) == 0
+
+
+def make_api_cache():
+    sizes = dict.fromkeys(("member_info", "member_list", "group_info", "stranger_info"))
+    return ApiCache(dict.fromkeys(sizes, 60), dict.fromkeys(sizes, 100))
+
+
+def test_member_notice_invalidates_member_entries():
+    api_cache = make_api_cache()
+    api_cache.member_info.set(("1", "7"), {"role": "member"})
+    api_cache.member_info.set(("1", "8"), {"role": "member"})
+    api_cache.member_list.set("1", [])
+    api_cache.group_info.set("1", {"member_count": 2})
+
+    api_cache.invalidate_for_notice(
+        {"notice_type": "group_admin", "group_id": 1, "user_id": 7}
+    )
+    assert api_cache.member_info.get(("1", "7")) is None
+    assert api_cache.member_info.get(("1", "8")) is not None
+    assert api_cache.member_list.get("1") is None
+    assert api_cache.group_info.get("1") is not None
+
+    api_cache.invalidate_for_notice(
+        {"notice_type": "group_decrease", "group_id": 1, "user_id": 8}
+    )
+    assert api_cache.group_info.get("1") is None
+
+
+def test_bot_leaving_group_clears_the_whole_group():
+    api_cache = make_api_cache()
+    api_cache.member_info.set(("1", "7"), {})
+    api_cache.member_info.set(("2", "7"), {})
+    api_cache.invalidate_for_notice(
+        {"notice_type": "group_decrease", "group_id": 1, "user_id": 5, "self_id": 5}
+    )
+    assert api_cache.member_info.get(("1", "7")) is None
+    assert api_cache.member_info.get(("2", "7")) == {}
+
+
+def test_other_notices_are_ignored():
+    api_cache = make_api_cache()
+    api_cache.member_info.set(("1", "7"), {})
+    api_cache.invalidate_for_notice({"notice_type": "group_recall", "group_id": 1})
+    assert api_cache.member_info.get(("1", "7")) == {}
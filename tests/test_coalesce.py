@@ -0,0 +1,98 @@
+import asyncio
+
+import api
+import codec
+from coalesce import MessageCoalescer
+
+
+def run_coalescer(steps, self_id="10000", **options):
+    sent = []
+
+    def flush(websocket, group_id, contents, forward, priority):
+        sent.append((group_id, list(contents), forward, priority))
+
+    async def main():
+        coalescer = MessageCoalescer(
+            window=options.get("window", 0.05),
+            max_messages=options.get("max_messages", 10),
+            forward_threshold=options.get("forward_threshold", 100),
+        )
+        coalescer.self_id = self_id
+        for group_id, content, priority in steps:
+            added = coalescer.add("ws", group_id, content, flush, priority)
+            if not added:
+                sent.append((group_id, content, "direct"))
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    return sent
+
+
+def test_messages_in_window_are_merged_per_group():
+    sent = run_coalescer([(1, "a", False), (2, "x", False), (1, "b", False)])
+    assert sorted(sent) == [(1, ["a", "b"], False, False), (2, ["x"], False, False)]
+
+
+def test_buffer_is_flushed_when_full():
+    sent = run_coalescer([(1, str(i), False) for i in range(3)], max_messages=2)
+    assert sent == [(1, ["0", "1"], False, False), (1, ["2"], False, False)]
+
+
+def test_priority_message_skips_buffer_after_flushing_group():
+    sent = run_coalescer([(1, "a", False), (1, "系统回复", True)])
+    # 缓存的消息也作为优先消息发出，不会被系统回复插队
+    assert sent == [(1, ["a"], False, True), (1, "系统回复", "direct")]
+
+
+def test_reply_message_is_not_merged():
+    reply = "[CQ:reply,id=5]收到"
+    sent = run_coalescer([(1, "a", False), (1, reply, False), (1, "b", False)])
+    assert sent == [
+        (1, ["a"], False, False),
+        (1, reply, "direct"),
+        (1, ["b"], False, False),
+    ]
+
+
+def test_buffered_messages_are_sent_before_priority_message(monkeypatch):
+    queued = []
+    monkeypatch.setattr(
+        api.outbox,
+        "send",
+        lambda ws, frame, key, priority: queued.append(
+            (codec.loads(frame)["params"]["message"], priority)
+        ),
+    )
+    coalescer = MessageCoalescer(window=10, max_messages=10, forward_threshold=100)
+    monkeypatch.setattr(api, "coalescer", coalescer)
+
+    async def main():
+        await api.send_group_msg("ws", 1, "a")
+        await api.send_group_msg("ws", 1, "b")
+        await api.send_group_msg("ws", 1, "系统回复", priority=True)
+
+    asyncio.run(main())
+    assert queued == [("a\nb", True), ("系统回复", True)]
+
+
+def test_long_merges_become_forward_only_when_self_id_is_known():
+    long_steps = [(1, "a" * 80, False), (1, "b" * 80, False)]
+    assert run_coalescer(long_steps)[0][2] is True
+    assert run_coalescer(long_steps, self_id=None)[0][2] is False
+
+
+def test_forward_nodes_carry_sender(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        api, "enqueue_message", lambda ws, message, priority=False: sent.append(message)
+    )
+    monkeypatch.setattr(api.coalescer, "self_id", "10000")
+    api.send_coalesced_group_msg("ws", 1, ["a", "b"], True)
+
+    nodes = sent[0]["params"]["message"]
+    assert sent[0]["action"] == "send_forward_msg"
+    assert [node["data"]["content"] for node in nodes] == ["a", "b"]
+    for node in nodes:
+        assert node["type"] == "node"
+        assert node["data"]["user_id"] == node["data"]["uin"] == "10000"
+        assert node["data"]["nickname"] == node["data"]["name"]
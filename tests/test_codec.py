@@ -0,0 +1,58 @@
+import importlib.util
+import sys
+
+import pytest
+
+import codec
+
+EVENT = {
+    "post_type": "message",
+    "group_id": 123456,
+    "raw_message": "你好 [CQ:face,id=1]",
+    "message": [{"type": "text", "data": {"text": "你好"}}],
+    "sender": {"nickname": "测试", "card": ""},
+    "time": 1700000000,
+    "self": None,
+    "ratio": 0.5,
+}
+
+
+# 屏蔽 orjson 和 msgspec 后单独加载一份 codec，测试标准库 json 后端
+@pytest.fixture
+def json_codec(monkeypatch):
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    monkeypatch.setitem(sys.modules, "msgspec", None)
+    spec = importlib.util.spec_from_file_location("codec_json", codec.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(params=["installed", "json"])
+def any_codec(request):
+    if request.param == "json":
+        return request.getfixturevalue("json_codec")
+    return codec
+
+
+def test_fallback_backend_is_json(json_codec):
+    assert json_codec.BACKEND == "json"
+    assert codec.BACKEND in ("orjson", "msgspec", "json")
+
+
+def test_round_trip(any_codec):
+    data = any_codec.dumps(EVENT)
+    assert isinstance(data, bytes)
+    assert any_codec.loads(data) == EVENT
+    assert any_codec.loads(data.decode("utf-8")) == EVENT
+
+
+def test_dumps_text_is_compact_utf8_text(any_codec):
+    text = any_codec.dumps_text({"message": "你好", "id": 1})
+    assert text == '{"message":"你好","id":1}'
+
+
+@pytest.mark.parametrize("frame", ["", "{", "not json", b"\xff"])
+def test_invalid_frame_raises_decode_error(any_codec, frame):
+    with pytest.raises(any_codec.DecodeError):
+        any_codec.loads(frame)
@@ -0,0 +1,59 @@
+import pytest
+
+from command import CommandMatcher
+
+
+def make_matcher():
+    matcher = CommandMatcher()
+    matcher.update(
+        {
+            "logs": r"(\d+)?",
+            "errorlog": r"(\d+)?",
+            "errorrange": r"\s*(\S+)~(\S+)",
+            "menu": "",
+        }
+    )
+    return matcher
+
+
+def test_matches_command_and_arguments():
+    matcher = make_matcher()
+    command = matcher.match("  logs20 ")
+    assert (command.name, command.args, command.text) == ("logs", ("20",), "logs20")
+    assert matcher.match("logs").args == (None,)
+    assert matcher.match("errorrange a~b").args == ("a", "b")
+    assert matcher.match("menu").args == ()
+
+
+def test_longer_prefix_wins():
+    matcher = make_matcher()
+    assert matcher.match("errorlog5").name == "errorlog"
+    assert matcher.match("errorrange x~y").name == "errorrange"
+
+
+def test_non_commands_do_not_match():
+    matcher = make_matcher()
+    for text in ["hello", "logsabc", "menu please", "", None, 5, "记录logs"]:
+        assert matcher.match(text) is None
+
+
+def test_list_commands_must_match_exactly():
+    matcher = CommandMatcher()
+    matcher.update(["菜单", "帮助"])
+    assert matcher.match("菜单").name == "菜单"
+    assert matcher.match("菜单1") is None
+    assert sorted(matcher.names()) == ["帮助", "菜单"]
+
+
+def test_registering_again_recompiles():
+    matcher = make_matcher()
+    assert matcher.match("ping") is None
+    matcher.register("ping")
+    assert matcher.match("ping").name == "ping"
+
+
+def test_conflicting_pattern_is_rejected():
+    matcher = make_matcher()
+    matcher.register("logs", r"(\d+)?")
+    with pytest.raises(ValueError):
+        matcher.register("logs", r"\s+(\w+)")
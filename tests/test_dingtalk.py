@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+from aiohttp import web
+
+from dingtalk import DingTalkNotifier
+
+
+# 本地的钉钉机器人接口替身，记录收到的请求
+async def start_stand_in(received):
+    async def handle(request):
+        received.append(
+            {"query": dict(request.query), "body": json.loads(await request.read())}
+        )
+        return web.json_response({"errcode": 0, "errmsg": "ok"})
+
+    app = web.Application()
+    app.router.add_post("/robot/send", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/robot/send"
+
+
+def contents(received):
+    return [item["body"]["text"]["content"] for item in received]
+
+
+def test_send_signs_request():
+    async def main():
+        received = []
+        runner, url = await start_stand_in(received)
+        notifier = DingTalkNotifier("token", "secret", base_url=url)
+        data = await notifier.send("标题", "内容")
+        await notifier.close()
+        await runner.cleanup()
+        return data, received
+
+    data, received = asyncio.run(main())
+    assert data["errcode"] == 0
+    assert contents(received) == ["标题\n内容"]
+    query = received[0]["query"]
+    assert query["access_token"] == "token"
+    assert "timestamp" in query and "sign" in query
+
+
+def test_repeated_alerts_with_same_key_are_merged():
+    async def main():
+        received = []
+        runner, url = await start_stand_in(received)
+        notifier = DingTalkNotifier("token", "", base_url=url, coalesce_window=0.2)
+        for second in range(3):
+            await notifier.notify(f"断开连接 {second}", f"错误 {second}", key="down")
+        await notifier.flush()
+        first_batch = contents(received)
+
+        await asyncio.sleep(0.3)
+        await notifier.flush()
+        merged = contents(received)[len(first_batch) :]
+
+        # 窗口结束且没有新的告警后，记录会被删除
+        await asyncio.sleep(0.3)
+        leftover = dict(notifier._alerts)
+        await notifier.close()
+        await runner.cleanup()
+        return first_batch, merged, leftover
+
+    first_batch, merged, leftover = asyncio.run(main())
+    assert first_batch == ["断开连接 0\n错误 0"]
+    assert merged == ["断开连接 2（0.2秒内重复2次）\n错误 2"]
+    assert leftover == {}
+
+
+def test_different_keys_are_sent_separately():
+    async def main():
+        received = []
+        runner, url = await start_stand_in(received)
+        notifier = DingTalkNotifier("token", "", base_url=url, coalesce_window=10)
+        await notifier.notify("a", "1")
+        await notifier.notify("b", "2")
+        await notifier.notify("a", "3")
+        await notifier.flush()
+        await notifier.close()
+        await runner.cleanup()
+        return contents(received)
+
+    assert asyncio.run(main()) == ["a\n1", "b\n2"]
@@ -0,0 +1,136 @@
+import asyncio
+
+import codec
+import echo
+from dispatcher import EventDispatcher
+
+
+class FakeWebSocket:
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for frame in self.frames:
+            yield frame
+
+
+def test_events_of_one_group_are_handled_in_order():
+    handled = []
+
+    async def handler(websocket, msg):
+        await asyncio.sleep(0.001 * (msg["seq"] % 3))
+        handled.append((msg["group_id"], msg["seq"]))
+
+    async def main():
+        dispatcher = EventDispatcher(handler, workers=4, queue_size=100)
+        dispatcher.start(None)
+        for seq in range(30):
+            await dispatcher.submit({"group_id": seq % 3 + 1, "seq": seq})
+        while dispatcher.completed < 30:
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+
+    asyncio.run(main())
+    for group_id in (1, 2, 3):
+        seqs = [seq for gid, seq in handled if gid == group_id]
+        assert seqs == sorted(seqs)
+
+
+def test_put_timeout_drops_when_shard_stays_full():
+    async def main():
+        release = asyncio.Event()
+
+        async def handler(websocket, msg):
+            await release.wait()
+
+        dispatcher = EventDispatcher(handler, workers=1, queue_size=1, put_timeout=0.1)
+        dispatcher.start(None)
+        assert await dispatcher.submit({"group_id": 1})
+        await asyncio.sleep(0.01)  # worker 取走第一条
+        assert await dispatcher.submit({"group_id": 1})
+        assert not await dispatcher.submit({"group_id": 1})
+        dropped = dispatcher.dropped
+        release.set()
+        await dispatcher.stop()
+        return dropped
+
+    assert asyncio.run(main()) == 1
+
+
+# 读循环开始等待之后才出现的 API 调用也不能让读循环一直阻塞
+def test_call_started_while_waiting_bounds_the_wait():
+    async def main():
+        release = asyncio.Event()
+        pending = [0]
+
+        async def handler(websocket, msg):
+            await release.wait()
+
+        async def start_call_later():
+            await asyncio.sleep(0.1)
+            pending[0] = 1
+
+        dispatcher = EventDispatcher(
+            handler, workers=1, queue_size=1, put_timeout=None, busy_put_timeout=0.1
+        )
+        dispatcher.start(None)
+        await dispatcher.submit({"group_id": 1})
+        await asyncio.sleep(0.01)
+        await dispatcher.submit({"group_id": 1})
+        asyncio.create_task(start_call_later())
+        accepted = await asyncio.wait_for(
+            dispatcher.submit({"group_id": 1}, busy=lambda: pending[0]), 2
+        )
+        release.set()
+        await dispatcher.stop()
+        return accepted
+
+    assert asyncio.run(main()) is False
+
+
+def test_busy_wait_succeeds_when_shard_frees_up():
+    async def main():
+        release = asyncio.Event()
+
+        async def handler(websocket, msg):
+            await release.wait()
+
+        dispatcher = EventDispatcher(
+            handler, workers=1, queue_size=1, busy_put_timeout=1
+        )
+        dispatcher.start(None)
+        await dispatcher.submit({"group_id": 1})
+        await asyncio.sleep(0.01)
+        await dispatcher.submit({"group_id": 1})
+        asyncio.get_running_loop().call_later(0.1, release.set)
+        accepted = await dispatcher.submit({"group_id": 1}, busy=lambda: True)
+        await dispatcher.stop()
+        return accepted
+
+    assert asyncio.run(main()) is True
+
+
+def test_read_loop_skips_frames_that_are_not_objects(monkeypatch):
+    import bot
+
+    submitted = []
+
+    async def submit(msg, busy=None):
+        submitted.append(msg)
+        return True
+
+    async def noop(*args):
+        pass
+
+    monkeypatch.setattr(bot.dispatcher, "start", lambda websocket: None)
+    monkeypatch.setattr(bot.dispatcher, "submit", submit)
+    monkeypatch.setattr(bot.dispatcher, "stop", noop)
+    event = {"post_type": "meta_event", "meta_event_type": "heartbeat"}
+    frames = ["[]", '"x"', "5", "{broken", codec.dumps_text(event)]
+
+    asyncio.run(bot.receive_messages(FakeWebSocket(frames)))
+    assert [msg.data for msg in submitted] == [event]
+    assert echo.pending_count() == 0
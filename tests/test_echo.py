@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+import codec
+import echo
+
+
+def test_resolve_completes_the_matching_call():
+    async def main():
+        request_echo = echo.new_echo("get_group_info")
+        future = echo.register(request_echo)
+        response = {"status": "ok", "echo": request_echo, "data": {"group_id": 1}}
+        assert echo.resolve(codec.dumps_text(response))
+        assert echo.pending_count() == 0
+        return await future
+
+    assert asyncio.run(main())["data"] == {"group_id": 1}
+
+
+def test_echo_values_are_unique_and_keep_action():
+    first, second = echo.new_echo("send_msg"), echo.new_echo("send_msg")
+    assert first != second
+    assert first.startswith("send_msg#")
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        '{"post_type": "message"}',
+        '{"echo": "unknown#1"}',
+        '{"echo": 5}',
+        '["echo"]',
+        '"echo"',
+        "{broken echo",
+        [],
+        5,
+    ],
+)
+def test_resolve_ignores_other_frames(message):
+    assert echo.resolve(message) is False
+
+
+def test_discard_cancels_waiting_call():
+    async def main():
+        request_echo = echo.new_echo("x")
+        future = echo.register(request_echo)
+        echo.discard(request_echo)
+        assert not echo.resolve({"echo": request_echo})
+        return future.cancelled()
+
+    assert asyncio.run(main())
+
+
+def test_fail_all_fails_every_pending_call():
+    async def main():
+        futures = [echo.register(echo.new_echo("x")) for _ in range(3)]
+        echo.fail_all(ConnectionError("连接已断开"))
+        assert echo.pending_count() == 0
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ConnectionError) for result in results)
@@ -0,0 +1,85 @@
+import asyncio
+
+import events
+from events import Event
+
+
+def test_unknown_post_type_is_wrapped_and_handled():
+    from handler_events import handle_message
+
+    msg = events.from_dict({"post_type": "message_reaction", "user_id": 7})
+    assert type(msg) is Event
+    assert msg.post_type == "message_reaction"
+    assert msg.user_id == "7"
+    asyncio.run(handle_message(None, msg))
+
+
+def test_response_without_post_type_stays_a_dict():
+    response = {"status": "ok", "retcode": 0, "echo": "get_group_list"}
+    assert events.from_dict(response) is response
+
+
+def test_each_post_type_gets_its_class():
+    expected = {
+        "message": events.MessageEvent,
+        "message_sent": events.MessageEvent,
+        "notice": events.NoticeEvent,
+        "request": events.RequestEvent,
+        "meta_event": events.MetaEvent,
+    }
+    for post_type, cls in expected.items():
+        assert type(events.from_dict({"post_type": post_type})) is cls
+
+
+def test_message_event_fields():
+    data = {
+        "post_type": "message",
+        "message_type": "group",
+        "group_id": 100,
+        "user_id": 7,
+        "self_id": 1,
+        "raw_message": "hello",
+        "sender": {"role": "admin", "nickname": "n", "card": "c"},
+    }
+    msg = events.from_dict(data)
+    assert (msg.group_id, msg.user_id, msg.self_id) == ("100", "7", "1")
+    assert msg["group_id"] == 100  # 按键访问得到原始值
+    assert msg.get("missing", "x") == "x"
+    assert "raw_message" in msg
+    assert msg.raw_message == "hello"
+    assert (msg.role, msg.nickname, msg.card) == ("admin", "n", "c")
+    assert msg.is_authorized
+    assert msg.data is data  # 不复制数据
+
+
+def test_missing_fields_have_safe_defaults():
+    msg = events.from_dict({"post_type": "message", "message_type": "private"})
+    assert msg.group_id is None
+    assert msg.raw_message == ""
+    assert msg.sender == {}
+    assert msg.role is None
+    assert not msg.is_authorized
+
+
+def test_owner_check_uses_string_ids(monkeypatch):
+    monkeypatch.setattr(events, "owner_id", ["7"])
+    assert events.from_dict({"post_type": "notice", "user_id": 7}).is_owner
+    assert not events.from_dict({"post_type": "notice", "user_id": 8}).is_owner
+
+
+def test_lazy_fields_are_cached():
+    msg = events.from_dict({"post_type": "notice", "operator_id": 5})
+    assert msg.operator_id == "5"
+    msg.data["operator_id"] = 6
+    assert msg.operator_id == "5"
+
+
+def test_other_event_fields():
+    request = events.from_dict(
+        {"post_type": "request", "request_type": "group", "comment": "hi", "flag": "f"}
+    )
+    assert (request.request_type, request.comment, request.flag) == ("group", "hi", "f")
+    meta = events.from_dict(
+        {"post_type": "meta_event", "meta_event_type": "heartbeat", "interval": 5000}
+    )
+    assert (meta.meta_event_type, meta.interval) == ("heartbeat", 5000)
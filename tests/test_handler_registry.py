@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from handler_registry import HandlerRegistry
+
+
+def group_message(raw_message):
+    return {
+        "post_type": "message",
+        "message_type": "group",
+        "group_id": 1,
+        "raw_message": raw_message,
+    }
+
+
+def make_handler(name, calls):
+    async def handler(websocket, msg, command=None):
+        calls.append((name, command.args if command else None))
+
+    handler.__qualname__ = name
+    return handler
+
+
+def test_dispatches_only_matching_handlers():
+    calls = []
+    registry = HandlerRegistry()
+    registry.register(make_handler("always", calls), "message", message_type="group")
+    registry.register(
+        make_handler("logs", calls),
+        "message",
+        message_type="group",
+        commands={"logs": r"(\d+)?"},
+    )
+    registry.register(make_handler("private", calls), "message", message_type="private")
+    registry.register(make_handler("notice", calls), "notice")
+
+    asyncio.run(registry.dispatch(None, group_message("logs20")))
+    assert sorted(calls) == [("always", None), ("logs", ("20",))]
+
+    calls.clear()
+    asyncio.run(registry.dispatch(None, group_message("hello")))
+    assert calls == [("always", None)]
+
+
+def test_handler_without_detail_type_sees_every_detail_type():
+    calls = []
+    registry = HandlerRegistry()
+    registry.register(make_handler("any_message", calls), "message", commands=["menu"])
+    registry.register(make_handler("group", calls), "message", message_type="group")
+
+    asyncio.run(registry.dispatch(None, group_message("menu")))
+    assert sorted(calls) == [("any_message", ()), ("group", None)]
+
+
+def test_failing_handler_does_not_stop_others():
+    calls = []
+    registry = HandlerRegistry()
+
+    async def broken(websocket, msg):
+        raise RuntimeError("boom")
+
+    registry.register(broken, "message")
+    registry.register(make_handler("ok", calls), "message")
+    asyncio.run(registry.dispatch(None, group_message("hi")))
+    assert calls == [("ok", None)]
+
+
+def test_conflicting_command_is_rejected_at_registration():
+    calls = []
+    registry = HandlerRegistry()
+    registry.register(
+        make_handler("a", calls),
+        "message",
+        message_type="group",
+        commands={"logs": r"(\d+)?"},
+    )
+    with pytest.raises(ValueError, match="logs"):
+        registry.register(
+            make_handler("b", calls), "message", commands={"logs": r"\s+(\w+)"}
+        )
+    # 不同的细分类型互不影响，同一个处理函数重新注册时可以改参数格式
+    registry.register(
+        make_handler("c", calls),
+        "message",
+        message_type="private",
+        commands={"logs": r"\s+(\w+)"},
+    )
+    registry.register(
+        make_handler("a", calls),
+        "message",
+        message_type="group",
+        commands={"logs": r"\s+(\w+)"},
+    )
+
+    asyncio.run(registry.dispatch(None, group_message("logs abc")))
+    assert calls == [("a", ("abc",))]
+
+
+def test_invalid_pattern_is_rejected_at_registration():
+    registry = HandlerRegistry()
+    with pytest.raises(ValueError):
+        registry.register(make_handler("a", []), "message", commands={"x": "("})
+    asyncio.run(registry.dispatch(None, group_message("x")))
+
+
+def test_same_short_module_name_does_not_overwrite():
+    calls = []
+    registry = HandlerRegistry()
+    for module in ("scripts.A.main", "scripts.B.main"):
+        handler = make_handler(module, calls)
+        handler.__module__ = module
+        handler.__qualname__ = "handle_group_message"
+        registry.register(handler, "message")
+
+    asyncio.run(registry.dispatch(None, group_message("hi")))
+    assert sorted(name for name, _ in calls) == ["scripts.A.main", "scripts.B.main"]
+
+
+def test_module_imported_under_app_prefix_is_registered_once():
+    calls = []
+    registry = HandlerRegistry()
+    for module in ("app.sysyem", "sysyem"):
+        handler = make_handler(module, calls)
+        handler.__module__ = module
+        handler.__qualname__ = "handle_System_group_message"
+        registry.register(handler, "message")
+
+    assert [h.name for h in registry.handlers()] == [
+        "sysyem.handle_System_group_message"
+    ]
+    asyncio.run(registry.dispatch(None, group_message("hi")))
+    assert calls == [("sysyem", None)]
@@ -0,0 +1,35 @@
+import sys
+
+import lazyimport
+from lazyimport import LazyModule, lazy_import
+
+
+def test_already_imported_module_is_returned_directly():
+    assert lazy_import("os") is sys.modules["os"]
+
+
+def test_module_is_imported_on_first_attribute_access(tmp_path, monkeypatch):
+    (tmp_path / "heavy_dependency_for_test.py").write_text("VALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(lazyimport, "_import_times", {})
+
+    module = lazy_import("heavy_dependency_for_test")
+    assert isinstance(module, LazyModule)
+    assert "heavy_dependency_for_test" not in sys.modules
+    assert "未导入" in repr(module)
+    assert lazyimport.import_report() == ""
+
+    assert module.VALUE == 42
+    assert "heavy_dependency_for_test" in sys.modules
+    assert "已导入" in repr(module)
+    assert lazyimport.import_report().startswith(
+        "延迟导入的依赖:\nheavy_dependency_for_test: "
+    )
+    sys.modules.pop("heavy_dependency_for_test")
+
+
+def test_dingtalk_does_not_pull_in_the_script_loader():
+    import dingtalk
+
+    assert dingtalk.aiohttp is not None
+    assert "loader" not in dingtalk.__dict__
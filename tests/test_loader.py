@@ -0,0 +1,164 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+import app.scripts
+import loader as loader_module
+from handler_registry import HandlerRegistry
+from loader import ScriptLoader
+
+SOURCE = """
+calls = []
+
+
+async def handle_{name}_group_message(websocket, msg):
+    calls.append(("{version}", msg["raw_message"]))
+
+
+async def handle_{name}_response_message(websocket, msg):
+    calls.append(("response", msg["echo"]))
+"""
+
+RESPONSE_ONLY = """
+async def handle_{name}_response_message(websocket, msg):
+    pass
+"""
+
+
+def group_message(raw_message):
+    return {
+        "post_type": "message",
+        "message_type": "group",
+        "group_id": 1,
+        "raw_message": raw_message,
+    }
+
+
+@pytest.fixture
+def scripts_dir(tmp_path, monkeypatch):
+    # 让 app.scripts.<Name>.main 从临时目录导入
+    monkeypatch.setattr(app.scripts, "__path__", [str(tmp_path)])
+    monkeypatch.setattr(loader_module, "registry", HandlerRegistry())
+    yield tmp_path
+    for name in [name for name in sys.modules if name.startswith("app.scripts.")]:
+        del sys.modules[name]
+
+
+def write_script(scripts_dir, name, version="v1", source=SOURCE, mtime=None):
+    path = scripts_dir / name / "main.py"
+    path.parent.mkdir(exist_ok=True)
+    path.write_text(source.format(name=name, version=version), encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def handler_names():
+    return [handler.name for handler in loader_module.registry.handlers()]
+
+
+def test_discover_registers_handlers_without_importing(scripts_dir):
+    write_script(scripts_dir, "Alpha")
+    (scripts_dir / "NoMain").mkdir()
+    loader = ScriptLoader(str(scripts_dir))
+    loader.discover()
+
+    assert handler_names() == ["scripts.Alpha.main.handle_Alpha_group_message"]
+    assert [script.name for script in loader.scripts()] == ["Alpha"]
+    assert "app.scripts.Alpha.main" not in sys.modules
+    assert loader.stats()["loaded"] == 0
+
+
+def test_first_dispatch_imports_module(scripts_dir):
+    write_script(scripts_dir, "Beta")
+    loader = ScriptLoader(str(scripts_dir))
+    loader.discover()
+
+    asyncio.run(loader_module.registry.dispatch(None, group_message("hi")))
+    module = sys.modules["app.scripts.Beta.main"]
+    assert module.calls == [("v1", "hi")]
+    assert loader.stats()["imports"] == 1
+
+
+def test_modified_module_is_reloaded_in_place(scripts_dir):
+    write_script(scripts_dir, "Gamma", mtime=1000)
+    loader = ScriptLoader(str(scripts_dir))
+    loader.discover()
+    asyncio.run(loader_module.registry.dispatch(None, group_message("a")))
+
+    write_script(scripts_dir, "Gamma", version="v2", mtime=2000)
+    asyncio.run(loader.check_reload())
+    asyncio.run(loader_module.registry.dispatch(None, group_message("b")))
+
+    assert sys.modules["app.scripts.Gamma.main"].calls == [("v2", "b")]
+    assert loader.stats()["reloads"] == 1
+    assert handler_names() == ["scripts.Gamma.main.handle_Gamma_group_message"]
+
+
+def test_unchanged_module_is_not_rescanned(scripts_dir, monkeypatch):
+    write_script(scripts_dir, "Delta")
+    loader = ScriptLoader(str(scripts_dir))
+    loader.discover()
+
+    rescans = []
+    monkeypatch.setattr(loader, "discover", lambda found=None: rescans.append(found))
+    asyncio.run(loader.check_reload())
+    assert rescans == []
+
+
+def test_removed_module_is_unregistered(scripts_dir):
+    path = write_script(scripts_dir, "Epsilon")
+    loader = ScriptLoader(str(scripts_dir))
+    loader.discover()
+
+    path.unlink()
+    asyncio.run(loader.check_reload())
+    assert handler_names() == []
+    assert loader.scripts() == []
+
+
+def test_removed_handler_is_unregistered(scripts_dir):
+    write_script(scripts_dir, "Zeta", mtime=1000)
+    loader = ScriptLoader(str(scripts_dir))
+    loader.discover()
+
+    write_script(scripts_dir, "Zeta", source=RESPONSE_ONLY, mtime=2000)
+    loader.discover()
+    assert handler_names() == []
+    assert loader.scripts()[0].handlers == {
+        "response_message": "handle_Zeta_response_message"
+    }
+
+
+def test_disabled_module_is_skipped(scripts_dir):
+    write_script(scripts_dir, "Eta")
+    write_script(scripts_dir, "Theta")
+    loader = ScriptLoader(str(scripts_dir), disabled=["Eta"])
+    loader.discover()
+    assert handler_names() == ["scripts.Theta.main.handle_Theta_group_message"]
+
+
+def test_dispatch_response_calls_response_handlers(scripts_dir):
+    write_script(scripts_dir, "Iota")
+    loader = ScriptLoader(str(scripts_dir))
+    loader.discover()
+
+    asyncio.run(loader.dispatch_response(None, {"echo": "get_group_list"}))
+    assert sys.modules["app.scripts.Iota.main"].calls == [
+        ("response", "get_group_list")
+    ]
+
+
+def test_broken_module_is_retried_on_next_use(scripts_dir):
+    write_script(scripts_dir, "Kappa", source="raise RuntimeError\n" + SOURCE)
+    loader = ScriptLoader(str(scripts_dir))
+    loader.discover()
+
+    asyncio.run(loader_module.registry.dispatch(None, group_message("a")))
+    assert loader.stats()["failures"] == 1
+
+    write_script(scripts_dir, "Kappa")
+    asyncio.run(loader_module.registry.dispatch(None, group_message("b")))
+    assert sys.modules["app.scripts.Kappa.main"].calls == [("v1", "b")]
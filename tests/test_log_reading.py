@@ -0,0 +1,50 @@
+import pytest
+
+from sysyem import iter_lines_reversed, iter_log_lines_reversed
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 7, 64 * 1024])
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_lines_come_back_newest_first(tmp_path, block_size, newline):
+    lines = ["第一行", "", "second", "x" * 20, "最后一行"]
+    path = tmp_path / "a.log"
+    path.write_bytes((newline + newline.join(lines) + newline).encode("utf-8"))
+
+    result = [line.decode("utf-8") for line in iter_lines_reversed(path, block_size)]
+    assert result == [line for line in reversed(lines) if line]
+
+
+def test_file_without_trailing_newline(tmp_path):
+    path = tmp_path / "a.log"
+    path.write_bytes(b"a\nb")
+    assert list(iter_lines_reversed(path, 1)) == [b"b", b"a"]
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "a.log"
+    path.write_bytes(b"")
+    assert list(iter_lines_reversed(path)) == []
+
+
+def test_log_lines_are_filtered_across_files(tmp_path):
+    older = tmp_path / "older.log"
+    newer = tmp_path / "newer.log"
+    older.write_text(
+        "2024-01-01 10:00:00 ERROR:root:旧的错误\n"
+        "2024-01-01 10:00:01 INFO:root:旧的信息\n",
+        encoding="utf-8",
+    )
+    newer.write_text(
+        "2024-01-01 11:00:00 ERROR:websockets:连接错误\n"
+        "2024-01-01 11:00:01 ERROR:root:新的错误\n",
+        encoding="utf-8",
+    )
+
+    errors = list(iter_log_lines_reversed([newer, older], levelname="ERROR"))
+    assert [line[-4:] for _, line in errors] == ["新的错误", "连接错误", "旧的错误"]
+    assert {level for level, _ in errors} == {"ERROR"}
+
+    root_errors = list(
+        iter_log_lines_reversed([newer, older], levelname="ERROR", logger_name="root")
+    )
+    assert [line[-4:] for _, line in root_errors] == ["新的错误", "旧的错误"]
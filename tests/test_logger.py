@@ -0,0 +1,168 @@
+import logging
+import os
+import queue
+from datetime import datetime
+
+import logger
+from logger import (
+    LOG_TZ,
+    CatalogFileHandler,
+    DroppingQueueHandler,
+    LogCatalog,
+    truncate_for_log,
+)
+
+
+def make_logger(handler):
+    logger = logging.getLogger(f"test_logger_{id(handler)}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    return logger
+
+
+def test_message_is_formatted_in_the_calling_thread():
+    log_queue = queue.Queue()
+    logger = make_logger(DroppingQueueHandler(log_queue))
+    payload = {"raw_message": "hello"}
+    logger.info("收到事件消息：%s", payload)
+    payload["raw_message"] = "changed"
+    payload["extra"] = 1
+
+    record = log_queue.get_nowait()
+    assert record.args is None
+    assert record.getMessage() == "收到事件消息：{'raw_message': 'hello'}"
+
+
+def test_exception_text_is_prepared_before_queueing():
+    log_queue = queue.Queue()
+    logger = make_logger(DroppingQueueHandler(log_queue))
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("失败")
+
+    record = log_queue.get_nowait()
+    assert record.exc_info is None
+    assert "ValueError: boom" in record.exc_text
+
+
+def test_full_queue_drops_and_reports_once_it_drains():
+    log_queue = queue.Queue(maxsize=2)
+    handler = DroppingQueueHandler(log_queue)
+    logger = make_logger(handler)
+    for index in range(5):
+        logger.info("第 %d 条", index)
+    assert handler.dropped == 3
+
+    messages = [log_queue.get_nowait().getMessage() for _ in range(2)]
+    assert messages == ["第 0 条", "第 1 条"]
+    logger.info("恢复")
+    messages = [log_queue.get_nowait().getMessage() for _ in range(2)]
+    assert messages[0] == "恢复"
+    assert "丢弃了 3 条日志" in messages[1]
+
+
+def test_truncate_for_log_limits_strings_and_items():
+    value = {"text": "a" * 10, "items": list(range(5)), "nested": [{"b": "c" * 10}]}
+    assert truncate_for_log(value, 4, 2) == {
+        "text": "aaaa...(共10字)",
+        "items": [0, 1, "...(共5项)"],
+        "nested": [{"b": "cccc...(共10字)"}],
+    }
+
+
+def test_log_event_snapshots_the_event(monkeypatch, caplog):
+    monkeypatch.setattr(logger, "event_log_enabled", True)
+    monkeypatch.setattr(logger, "event_log_sample_rates", {"notice": 0.0})
+    payload = {"post_type": "message", "message": [{"type": "text"}]}
+    with caplog.at_level(logging.INFO, logger="root"):
+        logger.log_event("message", "收到事件消息：", payload)
+        logger.log_event("notice", "收到事件消息：", {"post_type": "notice"})
+    payload["message"].append({"type": "image"})
+    payload["changed"] = True
+
+    assert [record.getMessage() for record in caplog.records] == [
+        "收到事件消息：{'post_type': 'message', 'message': [{'type': 'text'}]}"
+    ]
+
+
+def write_log(path, size=10):
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_catalog_index_points_start_reading_near_the_requested_time(tmp_path):
+    catalog = LogCatalog(str(tmp_path), index_interval=10)
+    catalog.open_file(write_log(tmp_path / "a.log", 40))
+    for created, offset in [(100, 0), (110, 5), (120, 12), (130, 20), (140, 33)]:
+        catalog.record(created, offset, offset + 5)
+
+    path = str(tmp_path / "a.log")
+    assert catalog.files_between(0, 200) == [(path, 0)]
+    assert catalog.files_between(125, 200) == [(path, 12)]
+    assert catalog.files_between(135, 200) == [(path, 12)]
+    assert catalog.files_between(140, 200) == [(path, 33)]
+    assert catalog.files_between(150, 200) == []
+    assert catalog.files_between(0, 90) == []
+
+
+def test_catalog_lists_files_newest_first(tmp_path):
+    catalog = LogCatalog(str(tmp_path), index_interval=10)
+    for name, created in [("old.log", 100), ("new.log", 200)]:
+        catalog.open_file(write_log(tmp_path / name))
+        catalog.record(created, 0, 10)
+
+    assert catalog.files() == [str(tmp_path / "new.log"), str(tmp_path / "old.log")]
+    assert catalog.latest_file() == str(tmp_path / "new.log")
+    assert [path for path, _ in catalog.files_between(150, 250)] == [
+        str(tmp_path / "new.log")
+    ]
+
+
+def test_catalog_is_saved_and_reloaded(tmp_path):
+    catalog = LogCatalog(str(tmp_path), index_interval=10)
+    catalog.open_file(write_log(tmp_path / "a.log", 30))
+    catalog.record(100, 0, 10)
+    catalog.record(120, 20, 30)
+    catalog.open_file(write_log(tmp_path / "gone.log"))
+    catalog.record(130, 0, 10)
+    catalog.save()
+    os.remove(tmp_path / "gone.log")
+
+    reloaded = LogCatalog(str(tmp_path), index_interval=10)
+    assert reloaded.files() == [str(tmp_path / "a.log")]
+    assert reloaded.files_between(125, 200) == []
+    assert reloaded.files_between(110, 200) == [(str(tmp_path / "a.log"), 0)]
+
+
+def test_catalog_estimates_untracked_files_from_their_name(tmp_path):
+    write_log(tmp_path / "2026-01-02_03-04-05.log")
+    write_log(tmp_path / "unnamed.log")
+    catalog = LogCatalog(str(tmp_path), index_interval=10)
+
+    start = datetime(2026, 1, 2, 3, 4, 5, tzinfo=LOG_TZ).timestamp()
+    assert catalog.files_between(start, start + 1) == [
+        (str(tmp_path / "2026-01-02_03-04-05.log"), 0)
+    ]
+    assert len(catalog.files()) == 2
+
+
+def test_file_handler_switches_to_a_new_file_when_full(tmp_path):
+    catalog = LogCatalog(str(tmp_path), index_interval=1)
+    handler = CatalogFileHandler(str(tmp_path), catalog, max_bytes=20)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = make_logger(handler)
+    try:
+        for i in range(4):
+            logger.info("line %d %s", i, "x" * 20)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+    files = catalog.files()
+    assert len(files) == 4
+    contents = sorted(open(path, encoding="utf-8").read() for path in files)
+    assert contents == [f"line {i} {'x' * 20}\n" for i in range(4)]
+    assert os.path.exists(tmp_path / "catalog.json")
+    assert LogCatalog(str(tmp_path), index_interval=1).files() == files
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from metrics import MetricsRegistry
+from supervisor import RECONNECTS, ConnectionSupervisor
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total", "事件数", ("post_type",))
+    counter.inc("message")
+    counter.inc("message", amount=2)
+    histogram = registry.histogram("handle_seconds", "耗时", ("handler",), (0.1, 1))
+    histogram.observe(0.05, 'a"b')
+    histogram.observe(0.5, 'a"b')
+
+    text = registry.render_prometheus()
+    assert "# TYPE events_total counter" in text
+    assert 'events_total{post_type="message"} 3' in text
+    assert 'handle_seconds_bucket{handler="a\\"b",le="0.1"} 1' in text
+    assert 'handle_seconds_bucket{handler="a\\"b",le="1"} 2' in text
+    assert 'handle_seconds_bucket{handler="a\\"b",le="+Inf"} 2' in text
+    assert 'handle_seconds_count{handler="a\\"b"} 2' in text
+
+
+def test_same_name_returns_same_metric():
+    registry = MetricsRegistry()
+    assert registry.counter("a_total", "a") is registry.counter("a_total", "a")
+
+
+def test_histogram_quantile_uses_bucket_bounds():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("x_seconds", "x", buckets=(0.01, 0.1, 1))
+    for value in [0.005] * 90 + [0.5] * 10:
+        histogram.observe(value)
+    series = histogram.series()[()]
+    assert histogram.quantile(series, 0.5) == 0.01
+    assert histogram.quantile(series, 0.95) == 1
+
+
+def test_gauge_is_read_on_demand_and_errors_are_isolated():
+    registry = MetricsRegistry()
+    depth = [0]
+    registry.gauge("queue_depth", "队列长度", lambda: depth[0])
+    registry.gauge("broken", "坏掉的仪表", lambda: 1 / 0)
+    depth[0] = 7
+    assert "queue_depth 7.0" in registry.render_prometheus()
+    summary = registry.summary()
+    assert "队列长度: 7" in summary
+    assert "broken: 读取失败" in summary
+
+
+def test_http_endpoint_serves_metrics():
+    async def main():
+        registry = MetricsRegistry()
+        registry.counter("hits_total", "hits").inc()
+        await registry.start_http_server("127.0.0.1", 0)
+        port = registry._server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: test\r\n\r\n")
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        registry._server.close()
+        return response.decode()
+
+    response = asyncio.run(main())
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert "hits_total 1" in response
+
+
+def test_reconnects_are_counted():
+    async def main():
+        supervisor = ConnectionSupervisor()
+        before = RECONNECTS.values().get((), 0)
+        await supervisor.on_connected()  # 第一次连接不算重连
+        supervisor.connected = False
+        supervisor.disconnected_at = time.monotonic()
+        await supervisor.on_connected()
+        return RECONNECTS.values().get((), 0) - before
+
+    assert asyncio.run(main()) == 1
@@ -0,0 +1,80 @@
+import asyncio
+
+from outbox import Outbox, TokenBucket
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send(self, frame):
+        self.frames.append(frame)
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=2, capacity=2)
+    now = bucket.updated
+    for _ in range(2):
+        assert bucket.wait_time(now) == 0
+        bucket.consume()
+    assert bucket.wait_time(now) == 0.5
+    assert bucket.wait_time(now + 0.5) == 0
+    assert not bucket.is_full(now + 0.5)
+    assert bucket.is_full(now + 10)
+    assert bucket.tokens == 2  # 不会超过容量
+
+
+def test_groups_take_turns_and_priority_goes_first():
+    async def main():
+        outbox = Outbox(
+            group_rate=50, group_burst=1, global_rate=1000, global_burst=100
+        )
+        websocket = RecordingWebSocket()
+        futures = [outbox.send(websocket, f"a{i}", "group_a") for i in range(3)]
+        futures.append(outbox.send(websocket, "b0", "group_b"))
+        futures.append(outbox.send(websocket, "owner", "private_7", priority=True))
+        assert all(await asyncio.gather(*futures))
+        return websocket.frames
+
+    frames = asyncio.run(main())
+    assert frames[0] == "owner"
+    assert frames[1:3] == ["a0", "b0"]
+    assert frames[3:] == ["a1", "a2"]
+
+
+def test_group_rate_limits_sending():
+    async def main():
+        outbox = Outbox(
+            group_rate=20, group_burst=1, global_rate=1000, global_burst=100
+        )
+        websocket = RecordingWebSocket()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(outbox.send(websocket, i, "group_a") for i in range(4)))
+        return loop.time() - started
+
+    # 第一条立即发出，其余三条每条间隔 0.05 秒
+    assert asyncio.run(main()) >= 0.14
+
+
+def test_full_queue_and_discard_resolve_false():
+    async def main():
+        outbox = Outbox(
+            group_rate=1, group_burst=1, global_rate=1, global_burst=1, queue_size=2
+        )
+        websocket = RecordingWebSocket()
+        first = outbox.send(websocket, "a0", "group_a")
+        await first
+        queued = [outbox.send(websocket, f"a{i}", "group_a") for i in (1, 2)]
+        overflow = outbox.send(websocket, "a3", "group_a")
+        assert overflow.result() is False
+        outbox.discard(websocket)
+        results = [future.result() for future in queued]
+        stats = outbox.stats()
+        outbox._task.cancel()
+        return results, stats
+
+    results, stats = asyncio.run(main())
+    assert results == [False, False]
+    assert stats["dropped"] == 3
+    assert stats["queue_depth"] == 0
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from scheduler import CronExpression, Scheduler
+
+
+@pytest.mark.parametrize(
+    "expression, after, expected",
+    [
+        ("0 8 * * *", "2024-01-01 07:59", "2024-01-01 08:00"),
+        ("0 8 * * *", "2024-01-01 08:00", "2024-01-02 08:00"),
+        ("*/15 * * * *", "2024-01-01 10:07", "2024-01-01 10:15"),
+        ("30 9-17/4 * * *", "2024-01-01 13:31", "2024-01-01 17:30"),
+        ("0 0 1 * *", "2024-01-15 00:00", "2024-02-01 00:00"),
+        ("0 12 * * 0", "2024-01-01 00:00", "2024-01-07 12:00"),  # 周日
+        ("0 12 * * 7", "2024-01-01 00:00", "2024-01-07 12:00"),
+        ("0 0 29 2 *", "2024-03-01 00:00", "2028-02-29 00:00"),
+        ("0 0 31 12 *", "2024-12-31 00:00", "2025-12-31 00:00"),
+    ],
+)
+def test_cron_next_after(expression, after, expected):
+    cron = CronExpression(expression)
+    result = cron.next_after(datetime.strptime(after, "%Y-%m-%d %H:%M"))
+    assert result == datetime.strptime(expected, "%Y-%m-%d %H:%M")
+
+
+def test_day_and_weekday_match_either():
+    # 每月 10 号或每个周一
+    cron = CronExpression("0 0 10 * 1")
+    after = datetime(2024, 1, 1, 0, 0)  # 周一
+    assert cron.next_after(after) == datetime(2024, 1, 8)
+    assert cron.next_after(datetime(2024, 1, 8)) == datetime(2024, 1, 10)
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["* * * *", "60 * * * *", "* 24 * * *", "*/0 * * * *", "5-1 * * * *", "a * * * *"],
+)
+def test_invalid_cron_is_rejected(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_impossible_cron_is_rejected():
+    with pytest.raises(ValueError):
+        CronExpression("0 0 31 2 *").next_after(datetime(2024, 1, 1))
+
+
+def test_interval_and_once_jobs_run():
+    async def main():
+        scheduler = Scheduler()
+        scheduler.websocket = "ws"
+        calls = []
+
+        async def tick(websocket):
+            calls.append(("tick", websocket))
+
+        async def once():
+            calls.append(("once", None))
+
+        scheduler.every(0.02, tick, first_delay=0)
+        scheduler.once(0.03, once)
+        scheduler.start()
+        await asyncio.sleep(0.11)
+        names = [job.name.rsplit(".", 1)[-1] for job in scheduler.jobs()]
+        scheduler._loop_task.cancel()
+        return calls, names
+
+    calls, names = asyncio.run(main())
+    assert calls.count(("once", None)) == 1
+    assert calls.count(("tick", "ws")) >= 4
+    assert names == ["tick"]  # 一次性任务运行后移除
+
+
+def test_overlapping_and_disconnected_runs_are_skipped():
+    async def main():
+        scheduler = Scheduler()
+        scheduler.websocket = "ws"
+
+        async def slow():
+            await asyncio.sleep(0.1)
+
+        async def needs_connection():
+            pass
+
+        slow_job = scheduler.every(0.02, slow, first_delay=0, requires_connection=False)
+        offline_job = scheduler.every(
+            0.02, needs_connection, first_delay=0, name="offline"
+        )
+        scheduler.websocket = None
+        scheduler.start()
+        await asyncio.sleep(0.09)
+        scheduler._loop_task.cancel()
+        return slow_job.stats(), offline_job.stats()
+
+    slow_stats, offline_stats = asyncio.run(main())
+    assert slow_stats["running"] == 1 and slow_stats["runs"] == 0
+    assert slow_stats["skipped"] >= 2
+    assert offline_stats["runs"] == 0 and offline_stats["skipped"] >= 2
+
+
+def test_same_name_replaces_job():
+    async def main():
+        scheduler = Scheduler()
+
+        async def job():
+            pass
+
+        first = scheduler.every(10, job, name="job")
+        second = scheduler.every(20, job, name="job")
+        return first.cancelled, scheduler.jobs() == [second]
+
+    assert asyncio.run(main()) == (True, True)
+
+
+def test_default_name_uses_full_module_name():
+    async def tick():
+        pass
+
+    scheduler = Scheduler()
+    for module in ("scripts.A.main", "scripts.B.main", "app.scripts.B.main"):
+        tick.__module__ = module
+        scheduler.every(10, tick)
+    assert sorted(job.name for job in scheduler.jobs()) == [
+        "scripts.A.main.test_default_name_uses_full_module_name.<locals>.tick",
+        "scripts.B.main.test_default_name_uses_full_module_name.<locals>.tick",
+    ]
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_with_same_key_share_one_request():
+    async def main():
+        single_flight = SingleFlight()
+        requests = []
+
+        async def fetch(key):
+            requests.append(key)
+            await asyncio.sleep(0.01)
+            return f"result {key}"
+
+        results = await asyncio.gather(
+            *(single_flight.do(key, lambda key=key: fetch(key)) for key in "aaab")
+        )
+        return results, requests, single_flight.stats()
+
+    results, requests, stats = asyncio.run(main())
+    assert results == ["result a"] * 3 + ["result b"]
+    assert sorted(requests) == ["a", "b"]
+    assert stats == {"inflight": 0, "calls": 2, "shared": 2}
+
+
+def test_finished_key_starts_a_new_request():
+    async def main():
+        single_flight = SingleFlight()
+        counter = []
+
+        async def fetch():
+            counter.append(1)
+            return len(counter)
+
+        first = await single_flight.do("a", fetch)
+        second = await single_flight.do("a", fetch)
+        return first, second
+
+    assert asyncio.run(main()) == (1, 2)
+
+
+def test_errors_reach_every_waiter():
+    async def main():
+        single_flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        return await asyncio.gather(
+            single_flight.do("a", fetch),
+            single_flight.do("a", fetch),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+    assert [str(result) for result in results] == ["boom", "boom"]
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    async def main():
+        single_flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(single_flight.do("a", fetch))
+        second = asyncio.ensure_future(single_flight.do("a", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+import supervisor as supervisor_module
+from supervisor import ConnectionSupervisor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(supervisor_module.time, "monotonic", clock.monotonic)
+    return clock
+
+
+@pytest.fixture
+def alerts(monkeypatch):
+    sent = []
+
+    async def dingtalk(text, desp, key=None):
+        sent.append(key)
+
+    monkeypatch.setattr(supervisor_module, "dingtalk", dingtalk)
+    return sent
+
+
+# 运行 supervisor.run，connect 每次被调用时执行 on_attempt，记录每次重试前等待的秒数
+def run_attempts(supervisor, clock, on_attempt, attempts):
+    delays = []
+
+    async def connect(on_connected):
+        await on_attempt(on_connected)
+        raise ConnectionError("连接已断开")
+
+    async def sleep(delay):
+        delays.append(delay)
+        clock.now += delay
+        if len(delays) >= attempts:
+            raise asyncio.CancelledError
+
+    async def main():
+        original_sleep = supervisor_module.asyncio.sleep
+        supervisor_module.asyncio.sleep = sleep
+        try:
+            await supervisor.run(connect)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            supervisor_module.asyncio.sleep = original_sleep
+
+    asyncio.run(main())
+    return delays
+
+
+def test_delay_keeps_growing_when_connection_drops_right_away(clock, alerts):
+    supervisor = ConnectionSupervisor(
+        base_delay=1, max_delay=60, multiplier=2, jitter=0, stable_time=30
+    )
+
+    async def connect_then_drop(on_connected):
+        await on_connected()
+        clock.now += 0.1
+
+    delays = run_attempts(supervisor, clock, connect_then_drop, 8)
+    assert delays == [1, 2, 4, 8, 16, 32, 60, 60]
+    assert supervisor.reconnect_count == 7
+    # 每次断线和恢复都会通知，重复的通知由钉钉通知的合并窗口合并
+    assert alerts == ["disconnected", "reconnected"] * 7 + ["disconnected"]
+
+
+def test_stable_connection_resets_backoff(clock, alerts):
+    supervisor = ConnectionSupervisor(
+        base_delay=1, max_delay=60, multiplier=2, jitter=0, stable_time=30
+    )
+    lifetimes = iter([0.1, 0.1, 0.1, 100, 0.1])
+
+    async def connect(on_connected):
+        await on_connected()
+        clock.now += next(lifetimes)
+
+    delays = run_attempts(supervisor, clock, connect, 5)
+    assert delays == [1, 2, 4, 1, 2]
+
+
+def test_refused_connections_back_off_with_jitter_and_alert_once(clock, alerts):
+    supervisor = ConnectionSupervisor(
+        base_delay=2, max_delay=10, multiplier=3, jitter=0.5
+    )
+
+    async def refuse(on_connected):
+        pass
+
+    delays = run_attempts(supervisor, clock, refuse, 4)
+    for delay, full in zip(delays, [2, 6, 10, 10]):
+        assert full * 0.5 <= delay <= full
+    assert alerts == ["disconnected"]
+    assert supervisor.stats()["failed_attempts"] == 4
+    assert supervisor.reconnect_count == 0
+
+
+def test_recovery_is_recorded_and_notified(clock, alerts):
+    async def main():
+        supervisor = ConnectionSupervisor()
+        await supervisor.on_connected()
+        clock.now += 50
+        await supervisor.on_disconnected(ConnectionError("断开"))
+        clock.now += 3
+        await supervisor.on_connected()
+        clock.now += 2
+        return supervisor
+
+    supervisor = asyncio.run(main())
+    assert alerts == ["disconnected", "reconnected"]
+    assert supervisor.last_reconnect_time == 3
+    assert supervisor.uptime() == 2
+    assert supervisor.stats()["connect_count"] == 2
+    # 连接还没有保持到 stable_time，失败次数保留，再断开时继续退避
+    assert supervisor.stats()["failed_attempts"] == 1
@@ -0,0 +1,76 @@
+import json
+import sqlite3
+
+from switch_store import SwitchStore
+
+
+def make_store(tmp_path):
+    legacy_dir = tmp_path / "GroupSwitch"
+    legacy_dir.mkdir(exist_ok=True)
+    return SwitchStore(str(tmp_path / "Switch" / "switch.db"), str(legacy_dir))
+
+
+def test_values_keep_their_json_type(tmp_path):
+    store = make_store(tmp_path)
+    store.set(1, "flag", True)
+    store.set(1, "name", "hello")
+    store.set(1, "count", 3)
+    store.set(1, "items", [1, "a"])
+    store.close()
+
+    store = make_store(tmp_path)
+    assert store.get(1, "flag") is True
+    assert store.get(1, "name") == "hello"
+    assert store.get(1, "count") == 3
+    assert store.get(1, "items") == [1, "a"]
+    assert store.get(1, "missing") is False
+    assert store.all_groups() == {
+        "1": {"flag": True, "name": "hello", "count": 3, "items": [1, "a"]}
+    }
+    store.close()
+
+
+def test_unsaved_changes_win_over_database(tmp_path):
+    store = make_store(tmp_path)
+    store.set(1, "flag", True)
+    store.flush()
+    store.set(1, "flag", False)
+    assert store.all_groups() == {"1": {"flag": False}}
+    store.close()
+
+
+def test_imports_legacy_json_files_once(tmp_path):
+    legacy_dir = tmp_path / "GroupSwitch"
+    legacy_dir.mkdir()
+    (legacy_dir / "100.json").write_text(
+        json.dumps({"Example": True, "mode": "strict"}), encoding="utf-8"
+    )
+    (legacy_dir / "200.json").write_text("[1, 2]", encoding="utf-8")
+    (legacy_dir / "300.json").write_text("{broken", encoding="utf-8")
+
+    store = make_store(tmp_path)
+    assert store.all_groups() == {"100": {"Example": True, "mode": "strict"}}
+    store.set(100, "Example", False)
+    store.close()
+
+    # 第二次启动不会用旧文件覆盖数据库
+    store = make_store(tmp_path)
+    assert store.get(100, "Example") is False
+    store.close()
+
+
+def test_migrates_integer_status_table(tmp_path):
+    db_dir = tmp_path / "Switch"
+    db_dir.mkdir()
+    conn = sqlite3.connect(db_dir / "switch.db")
+    conn.execute(
+        "CREATE TABLE switches (group_id TEXT NOT NULL UNIQUE, "
+        "switch_name TEXT NOT NULL, status INTEGER NOT NULL)"
+    )
+    conn.execute("INSERT INTO switches VALUES ('1', 'on', 1), ('2', 'off', 0)")
+    conn.commit()
+    conn.close()
+
+    store = make_store(tmp_path)
+    assert store.all_groups() == {"1": {"on": True}, "2": {"off": False}}
+    store.close()